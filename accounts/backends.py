@@ -0,0 +1,57 @@
+"""
+Chargement de l'utilisateur connecté depuis le cache.
+
+`AuthenticationMiddleware` recharge l'utilisateur de la session à chaque
+requête. `CachedModelBackend` garde dans le cache partagé un instantané réduit
+de l'utilisateur (identité, statut, rôles, photo de profil et empreinte du
+mot de passe, nécessaire à la vérification de la session) et reconstruit
+l'instance sans requête ; les autres champs, comme `bio`, sont chargés à la
+demande. L'instantané est supprimé à chaque enregistrement ou suppression de
+l'utilisateur (voir `accounts.signals`).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+# Durée de vie d'un instantané utilisateur en cache (secondes)
+USER_SNAPSHOT_TIMEOUT = getattr(settings, 'USER_SNAPSHOT_TIMEOUT', 60 * 60)
+# Cache des instantanés : le cache partagé, pour qu'une invalidation soit vue par tous les processus
+USER_SNAPSHOT_CACHE = getattr(settings, 'USER_SNAPSHOT_CACHE', 'shared')
+
+SNAPSHOT_FIELDS = (
+    'id', 'password', 'last_login', 'is_superuser', 'username', 'first_name', 'last_name',
+    'email', 'is_staff', 'is_active', 'is_student', 'is_instructor', 'profile_picture',
+)
+
+
+def snapshot_key(user_id):
+    return f'user:snapshot:{user_id}'
+
+
+def invalidate_user_snapshot(user_id):
+    caches[USER_SNAPSHOT_CACHE].delete(snapshot_key(user_id))
+
+
+def _snapshot_fields(User):
+    # Model.from_db attend les valeurs dans l'ordre des champs du modèle
+    return [field.attname for field in User._meta.concrete_fields if field.attname in SNAPSHOT_FIELDS]
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend dont `get_user` lit un instantané en cache"""
+
+    def get_user(self, user_id):
+        User = get_user_model()
+        fields = _snapshot_fields(User)
+        cache = caches[USER_SNAPSHOT_CACHE]
+        key = snapshot_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            values = User._default_manager.filter(pk=user_id).values_list(*fields).first()
+            if values is None:
+                return None
+            cache.set(key, values, USER_SNAPSHOT_TIMEOUT)
+        # Instance chargée avec les seuls champs de l'instantané, les autres sont différés
+        user = User.from_db(User._default_manager.db, fields, values)
+        return user if self.user_can_authenticate(user) else None
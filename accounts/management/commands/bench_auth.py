@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from elearning_platform.benchmarks import scratch_database, summarize, format_summary
+
+User = get_user_model()
+
+CONFIGURATIONS = [
+    ("sessions en base + ModelBackend", {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    }),
+    ("cached_db + instantané utilisateur", {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'AUTHENTICATION_BACKENDS': ['accounts.backends.CachedModelBackend'],
+    }),
+]
+
+
+class Command(BaseCommand):
+    help = ("Compare les requêtes SQL et la latence d'une page vue par un utilisateur connecté, "
+            "avec les sessions en base et avec les sessions et l'utilisateur en cache (base jetable)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/courses/courses/',
+                            help="Page mesurée (défaut: /courses/courses/)")
+        parser.add_argument('--requests', type=int, default=500,
+                            help="Requêtes mesurées par configuration (défaut: 500)")
+
+    def handle(self, *args, **options):
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['*']):
+            student = User.objects.create_user('bench_student', password='bench', is_student=True)
+            for label, overrides in CONFIGURATIONS:
+                with override_settings(**overrides):
+                    self._run(label, student, options['path'], options['requests'])
+
+    def _run(self, label, user, path, count):
+        client = Client()
+        client.force_login(user)
+        client.get(path)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(path)
+        # Les requêtes remises à zéro par request_started doivent être comptées tout de suite
+        total_queries = len(queries)
+        auth_queries = [
+            query for query in queries
+            if 'FROM "django_session"' in query['sql'] or f'FROM "{User._meta.db_table}"' in query['sql']
+        ]
+        latencies = []
+        began = time.perf_counter()
+        for _ in range(count):
+            started = time.perf_counter()
+            client.get(path)
+            latencies.append(time.perf_counter() - started)
+        total = time.perf_counter() - began
+        self.stdout.write(f"\n{label}")
+        self.stdout.write(f"  requêtes SQL par page : {total_queries} dont {len(auth_queries)} "
+                          f"pour la session et l'utilisateur")
+        self.stdout.write(f"  {count / total:.0f} req/s  {format_summary(summarize(latencies))}")
@@ -0,0 +1,7 @@
+from django.contrib.auth import get_user_model
+
+from elearning_platform.cache import invalidate_on
+from .backends import snapshot_key, USER_SNAPSHOT_CACHE
+
+# L'instantané du cache partagé est supprimé à chaque écriture de l'utilisateur
+invalidate_on(get_user_model(), keys=lambda user: [snapshot_key(user.pk)], cache_alias=USER_SNAPSHOT_CACHE)
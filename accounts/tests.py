@@ -1,3 +1,81 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.urls import reverse
 
-# Create your tests here.
+from courses.dashboard import dashboard_key, get_student_dashboard
+from courses.models import Enrollment
+from courses.tests import CacheTestCase, make_course
+from .backends import USER_SNAPSHOT_CACHE, CachedModelBackend, snapshot_key
+
+User = get_user_model()
+
+
+class CachedModelBackendTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('alice', password='x', is_student=True, bio='Biographie')
+        self.backend = CachedModelBackend()
+
+    def test_user_is_loaded_from_the_snapshot(self):
+        self.backend.get_user(self.user.id)
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.user.id)
+        self.assertEqual((user.username, user.is_student), ('alice', True))
+        # Les champs hors instantané sont chargés à la demande
+        with self.assertNumQueries(1):
+            self.assertEqual(user.bio, 'Biographie')
+
+    def test_saving_the_user_drops_the_snapshot(self):
+        self.backend.get_user(self.user.id)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(caches[USER_SNAPSHOT_CACHE].get(snapshot_key(self.user.id)))
+        self.assertIsNone(self.backend.get_user(self.user.id))
+
+    def test_unknown_user(self):
+        self.assertIsNone(self.backend.get_user(self.user.id + 1000))
+
+
+class StudentDashboardTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.instructor = User.objects.create_user('prof', password='x', is_instructor=True,
+                                                   first_name='Marie', last_name='Curie')
+        self.student = User.objects.create_user('alice', password='x', is_student=True)
+        self.course = make_course(self.instructor, modules=2)
+        Enrollment.objects.create(student=self.student, course=self.course)
+
+    def test_profile_shows_the_dashboard(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('student_profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['course']['title'] for entry in response.context['in_progress_courses']],
+                         [self.course.title])
+        self.assertIsNotNone(cache.get(dashboard_key(self.student.id)))
+
+    def test_instructor_rename_invalidates_students_dashboards(self):
+        get_student_dashboard(self.student.id)
+        self.instructor.last_name = 'Sklodowska'
+        self.instructor.save()
+        self.assertIsNone(cache.get(dashboard_key(self.student.id)))
+        self.assertEqual(get_student_dashboard(self.student.id)['enrollments'][0]['course']['instructor_name'],
+                         'Marie Sklodowska')
+
+    def test_student_edit_keeps_other_dashboards(self):
+        other = User.objects.create_user('bob', password='x', is_student=True)
+        get_student_dashboard(self.student.id)
+        other.first_name = 'Bob'
+        other.save()
+        self.assertIsNotNone(cache.get(dashboard_key(self.student.id)))
+
+    def test_instructor_login_keeps_dashboards(self):
+        get_student_dashboard(self.student.id)
+        self.assertTrue(self.client.login(username='prof', password='x'))
+        self.instructor.bio = 'Physicienne'
+        self.instructor.save(update_fields=['bio'])
+        self.assertIsNotNone(cache.get(dashboard_key(self.student.id)))
+        self.instructor.first_name = 'Maria'
+        self.instructor.save(update_fields=['first_name'])
+        self.assertIsNone(cache.get(dashboard_key(self.student.id)))
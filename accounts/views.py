@@ -8,7 +8,10 @@ from django.db.models import Count
 
 from .models import User, InstructorProfile
 from .forms import StudentSignUpForm, InstructorSignUpForm, StudentProfileForm, InstructorProfileForm, InstructorExtraProfileForm
-from courses.models import Course, Enrollment
+from courses.models import Course
+from courses.dashboard import get_student_dashboard
+from courses.resume import continue_learning
+from elearning_platform.routers import use_replica
 
 def register(request):
     """Vue qui montre les options d'inscription (étudiant ou instructeur)"""
@@ -57,17 +60,13 @@ def student_profile(request):
         messages.error(request, "Vous n'avez pas l'autorisation d'accéder à cette page.")
         return redirect('home')
     
-    user = request.user
+    # Inscriptions, progression et certificats en une seule passe (mis en cache)
+    dashboard = get_student_dashboard(request.user.id)
+    enrollments = dashboard['enrollments']
     
-    # Récupérer toutes les inscriptions de l'utilisateur
-    enrollments = Enrollment.objects.filter(student=user).select_related('course')
-     
     # Séparer les inscriptions en cours et complétées
-    in_progress_courses = enrollments.filter(completed=False)
-    completed_courses = enrollments.filter(completed=True)
-    
-    # Récupérer les certificats de l'étudiant
-    certificates = request.user.certificates.all()
+    in_progress_courses = [entry for entry in enrollments if not entry['completed']]
+    completed_courses = [entry for entry in enrollments if entry['completed']]
     
     # Mettre à jour le profil de l'utilisateur
     if request.method == 'POST':
@@ -85,7 +84,8 @@ def student_profile(request):
         'enrolled_courses': enrollments,  # Tous les cours inscrits
         'in_progress_courses': in_progress_courses,
         'completed_courses': completed_courses,
-        'certificates': certificates
+        'certificates': dashboard['certificates'],
+        'continue_courses': continue_learning(request.user.id)
     })
 
 @login_required
@@ -103,21 +103,23 @@ def instructor_profile(request):
     total_students = 0
     total_completed = 0
     
-    for course in courses:
-        enrollments = course.enrollments.count()
-        completed = course.enrollments.filter(completed=True).count()
-        completion_rate = (completed / enrollments * 100) if enrollments > 0 else 0
-        
-        # Mise à jour des totaux
-        total_students += enrollments
-        total_completed += completed
-        
-        course_stats.append({
-            'course': course,
-            'students': enrollments,
-            'completed': completed,
-            'completion_rate': completion_rate
-        })
+    # Statistiques en lecture seule : servies par un réplica
+    with use_replica():
+        for course in courses:
+            enrollments = course.enrollments.count()
+            completed = course.enrollments.filter(completed=True).count()
+            completion_rate = (completed / enrollments * 100) if enrollments > 0 else 0
+            
+            # Mise à jour des totaux
+            total_students += enrollments
+            total_completed += completed
+            
+            course_stats.append({
+                'course': course,
+                'students': enrollments,
+                'completed': completed,
+                'completion_rate': completion_rate
+            })
     
     # Calculer le taux de complétion global
     overall_completion_rate = (total_completed / total_students * 100) if total_students > 0 else 0
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from certificates.tasks import CERTIFICATE_BATCH_SIZE, issue_pending_certificates
+
+
+class Command(BaseCommand):
+    help = ("Émet les certificats des inscriptions complétées qui n'en ont pas encore "
+            "(émission interrompue ou en échec)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=CERTIFICATE_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Afficher le nombre de certificats en attente sans les émettre")
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Répéter le rattrapage toutes les N secondes (0 : un seul passage)")
+
+    def handle(self, *args, **options):
+        verb = "en attente" if options['dry_run'] else "émis"
+        while True:
+            issued = issue_pending_certificates(options['batch_size'], options['dry_run'])
+            self.stdout.write(f"Certificats {verb} : {issued}")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
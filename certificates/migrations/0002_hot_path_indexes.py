@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-19 15:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0001_initial'),
+        ('courses', '0004_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['student', '-issued_date'], name='certificate_student_date_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-19 16:29
+
+from django.db import migrations, models
+
+
+def tombstone_stored_pdfs(apps, schema_editor):
+    """Confie les PDF déjà enregistrés à sweep_media : ils sont désormais rendus à la demande"""
+    Certificate = apps.get_model('certificates', 'Certificate')
+    MediaTombstone = apps.get_model('courses', 'MediaTombstone')
+    names = Certificate.objects.exclude(pdf_file='').exclude(pdf_file__isnull=True).values_list('pdf_file', flat=True)
+    MediaTombstone.objects.bulk_create((MediaTombstone(name=name) for name in names.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0002_hot_path_indexes'),
+        ('courses', '0010_media_tombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(tombstone_stored_pdfs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='certificate',
+            name='pdf_file',
+        ),
+        migrations.AddField(
+            model_name='certificatetemplate',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -12,11 +12,13 @@ class Certificate(models.Model):
     course = models.ForeignKey(Course, related_name='certificates', on_delete=models.CASCADE)
     certificate_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     issued_date = models.DateTimeField(default=timezone.now)
-    pdf_file = models.FileField(upload_to='certificates/', blank=True, null=True)
     is_valid = models.BooleanField(default=True)
     
     class Meta:
         unique_together = ['student', 'course']
+        indexes = [
+            models.Index(fields=['student', '-issued_date'], name='certificate_student_date_idx'),
+        ]
     
     def __str__(self):
         return f"Certificat de {self.student.username} pour {self.course.title}"
@@ -35,6 +37,13 @@ class CertificateTemplate(models.Model):
     body_text = models.TextField(default="Ce certificat est décerné à {student_name} pour avoir complété avec succès le cours {course_title}.")
     is_default = models.BooleanField(default=False)
     created = models.DateTimeField(auto_now_add=True)
+    # Incrémentée à chaque modification : les PDF rendus avec une version antérieure ne sont plus servis
+    version = models.PositiveIntegerField(default=1, editable=False)
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            self.version += 1
+        super().save(*args, **kwargs)
@@ -0,0 +1,153 @@
+"""
+Cache disque des PDF de certificats.
+
+Le PDF d'un certificat n'est plus conservé avec le certificat : c'est un
+artefact dérivé, rendu à la demande (certificates.rendering) à partir des
+données du certificat, du modèle en vigueur et de sa `version`. Ces données
+forment la clé du fichier dans `CERTIFICATE_PDF_CACHE_DIR` : modifier un
+modèle, renommer un étudiant ou un cours change la clé, et le PDF est rendu
+de nouveau au prochain téléchargement, sans réémission de tous les
+certificats. Les anciens fichiers ne sont plus lus et vieillissent jusqu'à
+leur éviction.
+
+Le répertoire est un LRU borné à `CERTIFICATE_PDF_CACHE_SIZE` octets : la
+date de modification d'un fichier est mise à jour à chaque lecture, et après
+chaque rendu les fichiers les moins récemment lus sont supprimés jusqu'à
+`CERTIFICATE_PDF_CACHE_LOW_WATER` de la taille maximale. Chaque nœud a son
+propre cache. Deux rendus simultanés du même certificat écrivent les mêmes
+octets, et le fichier est remplacé atomiquement : aucun verrou n'est
+nécessaire.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+
+from .models import CertificateTemplate
+
+logger = logging.getLogger(__name__)
+
+# Répertoire des PDF rendus, hors du cache fichier de Django dont clear() et
+# l'élagage suppriment tout ce qui se trouve dans son dossier
+CERTIFICATE_PDF_CACHE_DIR = getattr(settings, 'CERTIFICATE_PDF_CACHE_DIR',
+                                    os.path.join(settings.BASE_DIR, '.pdf-cache'))
+# Taille maximale du répertoire (octets)
+CERTIFICATE_PDF_CACHE_SIZE = getattr(settings, 'CERTIFICATE_PDF_CACHE_SIZE', 256 * 1024 * 1024)
+# Fraction de la taille maximale visée par une éviction
+CERTIFICATE_PDF_CACHE_LOW_WATER = getattr(settings, 'CERTIFICATE_PDF_CACHE_LOW_WATER', 0.9)
+
+# À incrémenter quand la mise en page de certificates.rendering change
+RENDERER_VERSION = 1
+
+
+def current_template():
+    """Modèle utilisé pour les certificats : celui par défaut, sinon le premier disponible"""
+    return (CertificateTemplate.objects.filter(is_default=True).first()
+            or CertificateTemplate.objects.first())
+
+
+def cache_key(certificate, template):
+    """Empreinte de tout ce dont dépend le PDF d'un certificat"""
+    data = [
+        RENDERER_VERSION,
+        str(certificate.certificate_id),
+        certificate.issued_date.isoformat(),
+        certificate.student.first_name,
+        certificate.student.last_name,
+        certificate.course.title,
+        settings.BASE_URL,
+        [template.pk, template.version] if template else None,
+    ]
+    return hashlib.sha256(json.dumps(data).encode()).hexdigest()
+
+
+def _path(key, directory):
+    return os.path.join(directory, f'{key}.pdf')
+
+
+def _open_cached(key, directory):
+    try:
+        pdf = open(_path(key, directory), 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        # Marque le fichier comme récemment lu ; le descripteur reste valide s'il est évincé entre-temps
+        os.utime(pdf.fileno())
+    except OSError:
+        pass
+    return pdf
+
+
+def store(key, content, directory=CERTIFICATE_PDF_CACHE_DIR, max_size=CERTIFICATE_PDF_CACHE_SIZE):
+    """Écrit un PDF rendu dans le cache, puis évince si le répertoire dépasse sa taille"""
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as destination:
+            destination.write(content)
+        os.replace(temporary, _path(key, directory))
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    evict(directory, max_size)
+
+
+def evict(directory=CERTIFICATE_PDF_CACHE_DIR, max_size=CERTIFICATE_PDF_CACHE_SIZE):
+    """
+    Supprime les PDF les moins récemment lus quand le répertoire dépasse
+    `max_size`. Retourne `(fichiers supprimés, octets libérés)`.
+    """
+    entries, total = [], 0
+    try:
+        with os.scandir(directory) as scan:
+            for entry in scan:
+                if entry.name.endswith('.pdf'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+    except FileNotFoundError:
+        return 0, 0
+    if total <= max_size:
+        return 0, 0
+
+    removed, freed = 0, 0
+    target = max_size * CERTIFICATE_PDF_CACHE_LOW_WATER
+    for _, size, path in sorted(entries):
+        if total - freed <= target:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            # Évincé par un autre processus
+            pass
+        removed += 1
+        freed += size
+    logger.info("Cache des certificats : %d PDF évincés (%d octets)", removed, freed)
+    return removed, freed
+
+
+def open_certificate_pdf(certificate, directory=CERTIFICATE_PDF_CACHE_DIR):
+    """Fichier PDF ouvert en lecture, rendu et mis en cache s'il est absent ou périmé"""
+    template = current_template()
+    key = cache_key(certificate, template)
+    pdf = _open_cached(key, directory)
+    if pdf is not None:
+        return pdf
+
+    from .rendering import render_certificate_pdf
+
+    content = render_certificate_pdf(certificate, template)
+    store(key, content, directory)
+    pdf = _open_cached(key, directory)
+    if pdf is None:
+        # Évincé aussitôt écrit (cache plus petit qu'un PDF) : servi depuis la mémoire
+        pdf = io.BytesIO(content)
+    return pdf
+
@@ -0,0 +1,100 @@
+"""
+Rendu des certificats au format PDF.
+
+ReportLab, Pillow et qrcode coûtent plusieurs dizaines de millisecondes à
+importer : ce module n'est importé qu'au premier rendu (voir
+certificates.pdfcache), et non par les URLs au démarrage de chaque processus.
+`importtime` vérifie qu'aucun de ces modules n'est chargé par
+`manage.py check` ni par l'application WSGI.
+
+Le rendu est déterministe : les mêmes données et le même modèle donnent
+exactement les mêmes octets (`invariant` fixe la date de création et
+l'identifiant du document).
+"""
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+def _image(field):
+    """Image lue par le stockage des médias, local ou objet"""
+    with field.open('rb') as source:
+        return ImageReader(BytesIO(source.read()))
+
+
+def render_certificate_pdf(certificate, template):
+    """Contenu PDF d'un certificat, avec `template` ou le texte par défaut si None"""
+    # Configurer le buffer pour le PDF
+    buffer = BytesIO()
+    
+    # Créer un objet PDF avec ReportLab
+    p = canvas.Canvas(buffer, pagesize=landscape(A4), invariant=1)
+    width, height = landscape(A4)
+    
+    # Si un fond d'image est disponible dans le modèle
+    if template and template.background_image:
+        p.drawImage(_image(template.background_image), 0, 0, width, height)
+    
+    # Titre
+    p.setFont("Helvetica-Bold", 24)
+    title = template.title_text if template else "Certificat d'Accomplissement"
+    p.drawCentredString(width/2, height-5*cm, title)
+    
+    # Corps du certificat
+    p.setFont("Helvetica", 16)
+    
+    # Utilisez la template si disponible, sinon texte par défaut
+    if template:
+        # Remplacer les placeholders par les valeurs réelles
+        body_text = template.body_text
+        body_text = body_text.replace("{student_name}", f"{certificate.student.first_name} {certificate.student.last_name}")
+        body_text = body_text.replace("{course_title}", certificate.course.title)
+    else:
+        body_text = f"Ce certificat est décerné à {certificate.student.first_name} {certificate.student.last_name} pour avoir complété avec succès le cours {certificate.course.title}."
+    
+    # Ajouter des sauts de ligne pour le texte long
+    lines = [body_text[i:i+70] for i in range(0, len(body_text), 70)]
+    y_pos = height/2
+    for line in lines:
+        p.drawCentredString(width/2, y_pos, line)
+        y_pos -= cm
+    
+    # Date
+    p.setFont("Helvetica-Oblique", 12)
+    date_str = certificate.issued_date.strftime("%d %B %Y")
+    p.drawCentredString(width/2, y_pos-2*cm, f"Date d'émission: {date_str}")
+    
+    # Identifiant unique du certificat
+    p.setFont("Helvetica", 10)
+    p.drawCentredString(width/2, 2*cm, f"Identifiant: {certificate.certificate_id}")
+    
+    # Signature si disponible
+    if template and template.signature_image:
+        p.drawImage(_image(template.signature_image), width/2-2.5*cm, 3*cm, 5*cm, 2*cm)
+    
+    # QR code pour la vérification
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    
+    # Utilisez l'URL complète pour la vérification
+    verification_url = f"{settings.BASE_URL}/certificates/verify/{certificate.certificate_id}/"
+    qr.add_data(verification_url)
+    qr.make(fit=True)
+    
+    img = qr.make_image(fill_color="black", back_color="white")
+    qr_buffer = BytesIO()
+    img.save(qr_buffer)
+    qr_buffer.seek(0)
+    
+    p.drawImage(ImageReader(qr_buffer), 5*cm, 2*cm, 3*cm, 3*cm)
+    
+    p.save()
+    return buffer.getvalue()
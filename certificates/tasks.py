@@ -0,0 +1,54 @@
+"""
+Émission des certificats.
+
+Lorsqu'une inscription est complétée, `issue_certificate` est appelée après
+la validation de la transaction (voir courses.completion). Émettre un
+certificat se limite à une insertion, le PDF n'étant rendu qu'au premier
+téléchargement (voir certificates.pdfcache) : l'émission se fait donc dans la
+requête, sans file en mémoire qu'un redémarrage de worker ferait perdre.
+
+L'état durable est l'inscription elle-même : une inscription complétée sans
+certificat est une émission en attente. `issue_pending_certificates`
+(commande `issue_certificates`, à lancer via cron) rattrape celles dont
+l'émission a échoué.
+"""
+import logging
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+
+from courses.models import Enrollment
+
+from .models import Certificate
+
+logger = logging.getLogger(__name__)
+
+# Nombre de certificats insérés par lot par la commande de rattrapage
+CERTIFICATE_BATCH_SIZE = getattr(settings, 'CERTIFICATE_BATCH_SIZE', 500)
+
+
+def issue_certificate(student_id, course_id):
+    """Crée le certificat d'une inscription complétée"""
+    certificate, created = Certificate.objects.get_or_create(student_id=student_id, course_id=course_id)
+    return certificate
+
+
+def pending_enrollments():
+    """Inscriptions complétées dont le certificat n'a pas été émis"""
+    issued = Certificate.objects.filter(student_id=OuterRef('student_id'), course_id=OuterRef('course_id'))
+    return Enrollment.objects.filter(completed=True).filter(~Exists(issued))
+
+
+def issue_pending_certificates(batch_size=CERTIFICATE_BATCH_SIZE, dry_run=False):
+    """Émet les certificats en attente, lot par lot. Retourne leur nombre"""
+    pending = pending_enrollments().values_list('student_id', 'course_id')
+    if dry_run:
+        return pending.count()
+    count = 0
+    while batch := list(pending[:batch_size]):
+        Certificate.objects.bulk_create(
+            [Certificate(student_id=student_id, course_id=course_id) for student_id, course_id in batch],
+            ignore_conflicts=True,
+        )
+        count += len(batch)
+    return count
@@ -1,3 +1,132 @@
-from django.test import TestCase
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from courses.models import Enrollment
+from courses.tests import CacheTestCase, make_course
+from . import pdfcache
+from .models import Certificate
+from .tasks import issue_pending_certificates
+
+User = get_user_model()
+
+# Dépendances du rendu PDF, chargées seulement au premier téléchargement d'un certificat
+HEAVY_PACKAGES = ('reportlab', 'qrcode', 'PIL')
+
+
+class ImportTimeTests(SimpleTestCase):
+    """Le démarrage WSGI ne doit pas importer les bibliothèques du rendu des certificats"""
+
+    def test_importtime_within_budget(self):
+        out = StringIO()
+        # Budgets de IMPORT_TIME_BUDGET ; CommandError en cas de dépassement ou d'import interdit
+        call_command('importtime', 'check', 'wsgi', stdout=out)
+        self.assertIn("check :", out.getvalue())
+        self.assertIn("wsgi :", out.getvalue())
+
+    def test_wsgi_import_leaves_heavy_packages_unloaded(self):
+        script = ('import sys, elearning_platform.wsgi; from django.urls import get_resolver; '
+                  'get_resolver().url_patterns; '
+                  f'print(",".join(name for name in {HEAVY_PACKAGES!r} if name in sys.modules))')
+        result = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '')
+
+
+class CertificateTestCase(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.instructor = User.objects.create_user('prof', password='x', is_instructor=True)
+        self.course = make_course(self.instructor)
+        self.students = [User.objects.create_user(f'etudiant{number}', password='x', is_student=True,
+                                                  first_name='Alice', last_name=f'Martin {number}')
+                         for number in range(3)]
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course, completed=True)
+
+
+class PendingCertificateTests(CertificateTestCase):
+
+    def test_pending_certificates_are_issued_once(self):
+        Certificate.objects.create(student=self.students[0], course=self.course)
+        self.assertEqual(issue_pending_certificates(dry_run=True), 2)
+        self.assertEqual(Certificate.objects.count(), 1)
+        self.assertEqual(issue_pending_certificates(batch_size=1), 2)
+        self.assertEqual(Certificate.objects.count(), 3)
+        self.assertEqual(issue_pending_certificates(), 0)
+
+    def test_incomplete_enrollments_are_not_pending(self):
+        Enrollment.objects.filter(student=self.students[0]).update(completed=False)
+        self.assertEqual(issue_pending_certificates(), 2)
+        self.assertFalse(Certificate.objects.filter(student=self.students[0]).exists())
+
+
+class VerifyPageCacheTests(CertificateTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.certificate = Certificate.objects.create(student=self.students[0], course=self.course)
+        self.urls = [
+            reverse('home'),
+            reverse('certificates:certificate_verify', args=[self.certificate.certificate_id]),
+            f"{reverse('certificates:certificate_verify_form')}?certificate_id={self.certificate.certificate_id}",
+        ]
+        for url in self.urls:
+            self.client.get(url)
+
+    def test_issuing_a_certificate_keeps_cached_pages(self):
+        Certificate.objects.create(student=self.students[1], course=self.course)
+        self.assertEqual([self.client.get(url)['X-Page-Cache'] for url in self.urls], ['hit', 'hit', 'hit'])
+
+    def test_revoking_a_certificate_refreshes_its_verify_pages(self):
+        self.certificate.is_valid = False
+        self.certificate.save()
+        home, verify, verify_form = [self.client.get(url) for url in self.urls]
+        self.assertEqual([response['X-Page-Cache'] for response in (home, verify, verify_form)],
+                         ['hit', 'miss', 'miss'])
+        self.assertFalse(verify.context['valid'])
+
+
+class PdfCacheTests(CertificateTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.certificate = Certificate.objects.create(student=self.students[0], course=self.course)
+
+    def test_pdf_is_rendered_once(self):
+        with mock.patch('certificates.rendering.render_certificate_pdf', return_value=b'%PDF-1') as render:
+            for _ in range(2):
+                with pdfcache.open_certificate_pdf(self.certificate, self.directory) as pdf:
+                    self.assertEqual(pdf.read(), b'%PDF-1')
+        self.assertEqual(render.call_count, 1)
+
+    def test_renaming_the_student_changes_the_key(self):
+        key = pdfcache.cache_key(self.certificate, None)
+        self.certificate.student.last_name = 'Durand'
+        self.assertNotEqual(pdfcache.cache_key(self.certificate, None), key)
+
+    def test_least_recently_read_pdfs_are_evicted(self):
+        for key in ('a', 'b', 'c'):
+            pdfcache.store(key, b'x' * 100, self.directory, max_size=1000)
+            os.utime(os.path.join(self.directory, f'{key}.pdf'), (0, {'a': 3, 'b': 1, 'c': 2}[key]))
+        self.assertEqual(pdfcache.evict(self.directory, max_size=250), (1, 100))
+        self.assertEqual(sorted(os.listdir(self.directory)), ['a.pdf', 'c.pdf'])
+
+    def test_default_directory_is_outside_the_file_cache(self):
+        # clear() et l'élagage du cache fichier suppriment tout le contenu de son dossier
+        cache_dir = os.path.realpath(settings.SHARED_CACHE['LOCATION'])
+        pdf_dir = os.path.realpath(pdfcache.CERTIFICATE_PDF_CACHE_DIR)
+        self.assertNotEqual(os.path.commonpath([cache_dir, pdf_dir]), cache_dir)
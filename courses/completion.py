@@ -0,0 +1,175 @@
+"""
+Complétion des modules stockée sous forme de bitmap par inscription.
+
+Chaque module reçoit à sa création un `bit_index` stable au sein de son cours ;
+`Enrollment.completion_bits` contient un bit par module (octets en petit-boutiste,
+le bit `i` est le bit `i % 8` de l'octet `i // 8`). Les tests de complétion, le
+pourcentage et le premier module non complété deviennent des opérations sur
+un entier, sans lire les lignes de `Progress`.
+
+Pendant la période de double écriture, `Progress` reste la source écrite par
+les vues ; les signaux de `courses.signals` répercutent chaque changement sur
+le bitmap. Le réglage `COMPLETION_BITMAP_READS` choisit la source lue.
+
+Le bitmap s'accompagne de compteurs tenus à jour au fil de l'eau :
+`Course.module_count` et `Enrollment.completed_modules_count`. Quand le second
+atteint le premier, l'inscription est complétée et son certificat est émis
+après la validation de la transaction (`certificates.tasks`), sans que
+l'étudiant ait à le demander.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .dashboard import invalidate_student_dashboard
+from .models import Course, Enrollment, Progress
+
+logger = logging.getLogger(__name__)
+
+# Lire la complétion depuis le bitmap (True) ou depuis les lignes Progress (False)
+COMPLETION_BITMAP_READS = getattr(settings, 'COMPLETION_BITMAP_READS', True)
+
+
+def to_int(bits):
+    return int.from_bytes(bytes(bits or b''), 'little')
+
+
+def to_bytes(value):
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def is_completed(bits, bit_index):
+    return bool(to_int(bits) >> bit_index & 1)
+
+
+def completed_module_ids(bits, modules):
+    """Identifiants des modules complétés parmi `modules`"""
+    value = to_int(bits)
+    return {module.id for module in modules if value >> module.bit_index & 1}
+
+
+def completed_count(bits, modules):
+    # Les bits des modules supprimés sont ignorés grâce au masque
+    mask = 0
+    for module in modules:
+        mask |= 1 << module.bit_index
+    return (to_int(bits) & mask).bit_count()
+
+
+def first_incomplete(bits, modules):
+    """Premier module non complété dans l'ordre d'affichage, ou None"""
+    value = to_int(bits)
+    for module in modules:
+        if not value >> module.bit_index & 1:
+            return module
+    return None
+
+
+def set_completed(student_id, course_id, bit_index, completed=True):
+    """
+    Met à jour un bit du bitmap de l'inscription et son compteur de modules
+    complétés, sous verrou. L'inscription est marquée complétée dès que le
+    compteur atteint le nombre de modules du cours.
+    """
+    if bit_index is None:
+        return
+    with transaction.atomic():
+        enrollment = (
+            Enrollment.objects.select_for_update()
+            .filter(student_id=student_id, course_id=course_id)
+            .only('id', 'completion_bits', 'completed_modules_count', 'completed')
+            .first()
+        )
+        if enrollment is None:
+            return
+        value = to_int(enrollment.completion_bits)
+        updated = value | (1 << bit_index) if completed else value & ~(1 << bit_index)
+        if updated == value:
+            return
+        count = enrollment.completed_modules_count + (1 if completed else -1)
+        Enrollment.objects.filter(id=enrollment.id).update(
+            completion_bits=to_bytes(updated), completed_modules_count=max(count, 0)
+        )
+        transaction.on_commit(lambda: invalidate_student_dashboard(student_id))
+        if completed and not enrollment.completed:
+            module_count = Course.objects.filter(id=course_id).values_list('module_count', flat=True).first()
+            if module_count and count >= module_count:
+                _complete(enrollment.id, student_id, course_id)
+
+
+def _complete(enrollment_id, student_id, course_id):
+    """Marque l'inscription complétée et planifie son certificat après validation"""
+    Enrollment.objects.filter(id=enrollment_id).update(completed=True)
+    transaction.on_commit(lambda: _completed(student_id, course_id))
+
+
+def _completed(student_id, course_id):
+    from certificates.tasks import issue_certificate
+
+    invalidate_student_dashboard(student_id)
+    try:
+        issue_certificate(student_id, course_id)
+    except Exception:
+        # L'inscription complétée reste en attente : la commande issue_certificates la rattrapera
+        logger.exception("Échec de l'émission du certificat (étudiant %s, cours %s)", student_id, course_id)
+
+
+def module_added(course_id):
+    Course.objects.filter(id=course_id).update(module_count=F('module_count') + 1)
+
+
+def module_removed(course_id, bit_index):
+    """
+    Retire un module supprimé des compteurs du cours et de ses inscriptions.
+    Les inscriptions dont il était le dernier module restant sont complétées.
+    """
+    with transaction.atomic():
+        Course.objects.filter(id=course_id, module_count__gt=0).update(module_count=F('module_count') - 1)
+        module_count = Course.objects.filter(id=course_id).values_list('module_count', flat=True).first()
+        if bit_index is None or module_count is None:
+            return
+        enrollments = (
+            Enrollment.objects.select_for_update()
+            .filter(course_id=course_id, completed_modules_count__gt=0)
+            .only('id', 'student_id', 'completion_bits', 'completed_modules_count', 'completed')
+        )
+        for enrollment in enrollments:
+            value = to_int(enrollment.completion_bits)
+            if not value >> bit_index & 1:
+                continue
+            count = max(enrollment.completed_modules_count - 1, 0)
+            Enrollment.objects.filter(id=enrollment.id).update(
+                completion_bits=to_bytes(value & ~(1 << bit_index)), completed_modules_count=count
+            )
+        if module_count:
+            # Le module supprimé était peut-être le seul qui manquait
+            for enrollment_id, student_id in Enrollment.objects.filter(
+                course_id=course_id, completed=False, completed_modules_count__gte=module_count
+            ).values_list('id', 'student_id'):
+                _complete(enrollment_id, student_id, course_id)
+
+
+def is_course_completed(enrollment, course):
+    """Vérification en temps constant de la complétion d'un cours"""
+    return enrollment.completed or (
+        course.module_count > 0 and enrollment.completed_modules_count >= course.module_count
+    )
+
+
+def completion_state(enrollment, modules):
+    """
+    Retourne `(ids des modules complétés, premier module non complété)` pour
+    une inscription, depuis le bitmap ou depuis les lignes de progression.
+    """
+    modules = list(modules)
+    if COMPLETION_BITMAP_READS:
+        return (completed_module_ids(enrollment.completion_bits, modules),
+                first_incomplete(enrollment.completion_bits, modules))
+
+    completed_ids = set(Progress.objects.filter(
+        student_id=enrollment.student_id, course_id=enrollment.course_id, completed=True
+    ).values_list('module_id', flat=True))
+    current = next((module for module in modules if module.id not in completed_ids), None)
+    return completed_ids, current
@@ -0,0 +1,106 @@
+"""
+Tableau de bord d'un étudiant, construit en deux requêtes et gardé en cache.
+
+Chaque inscription est retournée avec son cours, le pourcentage de
+progression, la dernière activité et le certificat éventuel. La progression
+vient des compteurs `Course.module_count` et `Enrollment.completed_modules_count`
+et la dernière activité du point de reprise, si bien que le coût ne dépend
+pas du nombre de lignes de progression. Le résultat, une structure
+sérialisable, est mis en cache par étudiant, reconstruit une seule fois en cas
+d'absence (`single_flight`) et invalidé par les signaux de `courses.signals`.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from certificates.models import Certificate
+from elearning_platform.cache import single_flight
+from .models import Enrollment
+
+# Durée de vie d'un tableau de bord en cache (secondes)
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60 * 60)
+
+
+def dashboard_key(student_id):
+    return f'dashboard:student:{student_id}'
+
+
+def build_student_dashboard(student_id):
+    """Construit le tableau de bord d'un étudiant en deux requêtes"""
+    enrollments = (
+        Enrollment.objects.filter(student_id=student_id)
+        .select_related('course__instructor')
+        .order_by('-enrolled_at')
+    )
+    certificates = (
+        Certificate.objects.filter(student_id=student_id)
+        .select_related('course')
+        .order_by('-issued_date')
+    )
+
+    certificate_entries = [
+        {
+            'certificate_id': certificate.certificate_id,
+            'issued_date': certificate.issued_date,
+            'course_id': certificate.course_id,
+            'course_title': certificate.course.title,
+        }
+        for certificate in certificates
+    ]
+    by_course = {entry['course_id']: entry for entry in certificate_entries}
+
+    enrollment_entries = []
+    for enrollment in enrollments:
+        course = enrollment.course
+        if enrollment.completed:
+            percentage = 100
+        elif course.module_count:
+            percentage = round(enrollment.completed_modules_count * 100 / course.module_count)
+        else:
+            percentage = 0
+        enrollment_entries.append({
+            'id': enrollment.id,
+            'completed': enrollment.completed,
+            'enrolled_at': enrollment.enrolled_at,
+            'last_activity': enrollment.last_accessed or enrollment.enrolled_at,
+            'module_total': course.module_count,
+            'completed_modules': enrollment.completed_modules_count,
+            'percentage': percentage,
+            'course': {
+                'id': course.id,
+                'slug': course.slug,
+                'title': course.title,
+                'thumbnail_url': course.thumbnail.url if course.thumbnail else '',
+                'instructor_name': course.instructor.get_full_name(),
+            },
+            'certificate': by_course.get(course.id),
+        })
+
+    return {'enrollments': enrollment_entries, 'certificates': certificate_entries}
+
+
+def get_student_dashboard(student_id):
+    """Retourne le tableau de bord depuis le cache, en le reconstruisant si besoin"""
+    return single_flight(dashboard_key(student_id), lambda: build_student_dashboard(student_id),
+                         DASHBOARD_CACHE_TIMEOUT)
+
+
+def invalidate_student_dashboard(student_id):
+    cache.delete(dashboard_key(student_id))
+
+
+def course_dashboard_keys(course_id):
+    """Clés des tableaux de bord de tous les inscrits d'un cours"""
+    student_ids = Enrollment.objects.filter(course_id=course_id).values_list('student_id', flat=True)
+    return [dashboard_key(student_id) for student_id in student_ids]
+
+
+def instructor_dashboard_keys(instructor_id):
+    """Clés des tableaux de bord des inscrits aux cours d'un instructeur, qui affichent son nom"""
+    student_ids = (Enrollment.objects.filter(course__instructor_id=instructor_id)
+                   .values_list('student_id', flat=True).distinct())
+    return [dashboard_key(student_id) for student_id in student_ids]
+
+
+def invalidate_course_dashboards(course_id):
+    """Invalide le tableau de bord de tous les inscrits d'un cours"""
+    cache.delete_many(course_dashboard_keys(course_id))
@@ -0,0 +1,60 @@
+"""
+Valeurs dérivées des contenus, calculées à l'enregistrement.
+
+Le HTML d'un texte, son temps de lecture, l'URL d'intégration et le
+fournisseur d'une vidéo, ainsi que les listes de prérequis et d'objectifs
+d'un cours ne changent qu'avec leur source : les méthodes `save()` des
+modèles les calculent une fois et les stockent, au lieu de les recalculer à
+chaque affichage. `backfill_derived` remplit les lignes existantes.
+"""
+import math
+import re
+
+from django.conf import settings
+from django.utils.html import linebreaks
+
+# Vitesse de lecture retenue pour le temps de lecture (mots par minute)
+READING_WORDS_PER_MINUTE = getattr(settings, 'READING_WORDS_PER_MINUTE', 200)
+
+VIDEO_PROVIDERS = (
+    ('youtube', re.compile(r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]+)'),
+     'https://www.youtube.com/embed/{}'),
+    ('youtube', re.compile(r'(?:https?://)?(?:www\.)?youtu\.be/([a-zA-Z0-9_-]+)'),
+     'https://www.youtube.com/embed/{}'),
+    ('vimeo', re.compile(r'(?:https?://)?(?:www\.)?vimeo\.com/(\d+)'),
+     'https://player.vimeo.com/video/{}'),
+)
+
+
+def render_text(text):
+    """HTML d'un texte, identique au filtre `linebreaks` (texte échappé)"""
+    return linebreaks(text, autoescape=True) if text else ''
+
+
+def reading_minutes(text):
+    """Temps de lecture estimé en minutes, au moins 1 pour un texte non vide"""
+    words = len(text.split()) if text else 0
+    return math.ceil(words / READING_WORDS_PER_MINUTE) if words else 0
+
+
+def video_embed(url):
+    """Retourne `(fournisseur, URL d'intégration)` ; une URL inconnue est intégrée telle quelle"""
+    if not url:
+        return '', url
+    for provider, pattern, embed in VIDEO_PROVIDERS:
+        match = pattern.search(url)
+        if match:
+            return provider, embed.format(match.group(1))
+    return 'other', url
+
+
+def split_lines(text):
+    """Lignes non vides d'un texte saisi à raison d'un élément par ligne"""
+    return [line.strip() for line in text.split('\n') if line.strip()] if text else []
+
+
+def with_derived_fields(update_fields, source, derived):
+    """Ajoute les champs dérivés à `update_fields` quand leur source est enregistrée"""
+    if update_fields is None or source not in update_fields:
+        return update_fields
+    return {*update_fields, *derived}
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses.derived import render_text, reading_minutes, video_embed, split_lines
+from courses.models import Course, TextContent, VideoContent
+
+
+def _course(course):
+    course.requirement_items = split_lines(course.requirements)
+    course.objective_items = split_lines(course.objectives)
+
+
+def _text(content):
+    content.content_html = render_text(content.content)
+    content.reading_minutes = reading_minutes(content.content)
+
+
+def _video(content):
+    content.provider, content.embed_url = video_embed(content.url)
+
+
+# Modèle, champs sources lus, champs dérivés écrits, fonction de calcul
+DERIVED = [
+    (Course, ['requirements', 'objectives'], ['requirement_items', 'objective_items'], _course),
+    (TextContent, ['content'], ['content_html', 'reading_minutes'], _text),
+    (VideoContent, ['url'], ['provider', 'embed_url'], _video),
+]
+
+
+class Command(BaseCommand):
+    help = ("Calcule les champs dérivés des cours, textes et vidéos existants "
+            "(HTML, temps de lecture, URL d'intégration, listes de prérequis et d'objectifs)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, sources, derived, compute in DERIVED:
+            updated = 0
+            last_id = 0
+            while True:
+                # Par lots, dans l'ordre des clés : la mémoire ne dépend pas du nombre de lignes
+                batch = list(model.objects.filter(id__gt=last_id).order_by('id').only('id', *sources)[:batch_size])
+                if not batch:
+                    break
+                for instance in batch:
+                    compute(instance)
+                with transaction.atomic():
+                    model.objects.bulk_update(batch, derived)
+                updated += len(batch)
+                last_id = batch[-1].id
+            self.stdout.write(f"{model.__name__} : {updated} ligne(s) mise(s) à jour")
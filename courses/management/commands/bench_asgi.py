@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from certificates.models import Certificate
+from courses.models import Category, Course, Module, Enrollment
+from elearning_platform.benchmarks import scratch_database, summarize, format_summary, timer
+from quizzes.models import Quiz, QuizAttempt
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Compare le débit des pages de lecture (liste et détail des cours, vérification "
+            "de certificat, résultat de quiz) via le gestionnaire ASGI et via WSGI (base jetable)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+        parser.add_argument('--courses', type=int, default=50)
+
+    def handle(self, *args, **options):
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with scratch_database(), override_settings(ALLOWED_HOSTS=hosts):
+            student, urls = self._seed(options['courses'])
+            for concurrency in options['concurrency']:
+                for label, runner in (('WSGI', self._run_wsgi), ('ASGI', self._run_asgi)):
+                    with timer() as elapsed:
+                        latencies, errors = runner(student, urls, options['requests'], concurrency)
+                    total = elapsed()
+                    self.stdout.write(
+                        f"{label} concurrence={concurrency:<4} {len(latencies) / total:8.1f} req/s "
+                        f"erreurs={errors} {format_summary(summarize(latencies))}"
+                    )
+
+    def _run_wsgi(self, student, urls, total, concurrency):
+        local = threading.local()
+
+        def one(index):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client()
+                client.force_login(student)
+            began = time.perf_counter()
+            response = client.get(urls[index % len(urls)])
+            return time.perf_counter() - began, response.status_code != 200
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(total)))
+        return [latency for latency, _ in results], sum(error for _, error in results)
+
+    def _run_asgi(self, student, urls, total, concurrency):
+        async def run():
+            client = AsyncClient()
+            await client.aforce_login(student)
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(index):
+                async with semaphore:
+                    began = time.perf_counter()
+                    response = await client.get(urls[index % len(urls)])
+                    return time.perf_counter() - began, response.status_code != 200
+
+            return await asyncio.gather(*(one(i) for i in range(total)))
+
+        results = asyncio.run(run())
+        return [latency for latency, _ in results], sum(error for _, error in results)
+
+    def _seed(self, course_count):
+        instructor = User.objects.create(username='bench_instructor', is_instructor=True)
+        student = User.objects.create(username='bench_student', is_student=True)
+        category = Category.objects.create(name='Banc', slug='banc')
+        courses = Course.objects.bulk_create(
+            Course(title=f'Cours {i}', slug=f'cours-{i}', overview='Aperçu ' * 50, status='published',
+                   category=category, instructor=instructor)
+            for i in range(course_count)
+        )
+        Module.objects.bulk_create(
+            Module(course=course, title=f'Module {n}', order=n)
+            for course in courses for n in range(1, 11)
+        )
+        course = courses[0]
+        Enrollment.objects.create(student=student, course=course)
+        certificate = Certificate.objects.create(student=student, course=course)
+        quiz = Quiz.objects.create(module=course.modules.first(), title='Quiz')
+        attempt = QuizAttempt.objects.create(student=student, quiz=quiz, score=80, passed=True)
+        QuizAttempt.objects.filter(id=attempt.id).update(end_time=attempt.start_time)
+
+        urls = [
+            reverse('courses:course_list'),
+            reverse('certificates:certificate_verify', args=[certificate.certificate_id]),
+            reverse('quiz_result', args=[attempt.id]),
+        ]
+        urls += [reverse('courses:course_detail', args=[c.slug]) for c in courses[:10]]
+        return student, urls
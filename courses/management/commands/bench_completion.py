@@ -0,0 +1,141 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from courses.completion import completed_module_ids, first_incomplete, to_bytes
+from courses.models import Category, Course, Module, Enrollment, Progress
+from elearning_platform.benchmarks import scratch_database, summarize, format_summary, timer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Compare la taille et la latence de la complétion stockée ligne par module "
+            "(Progress) et en bitmap par inscription, sur une base jetable")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enrollments', type=int, default=20000,
+                            help="Nombre d'inscriptions générées (défaut: 20000)")
+        parser.add_argument('--modules', type=int, default=50,
+                            help="Nombre de modules par cours (défaut: 50)")
+        parser.add_argument('--repeat', type=int, default=500,
+                            help="Nombre de lectures mesurées par représentation (défaut: 500)")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            enrollment_ids = self._seed(options['enrollments'], options['modules'])
+            self._report_sizes()
+            samples = random.choices(enrollment_ids, k=options['repeat'])
+            rows = self._time(samples, self._read_rows)
+            bitmap = self._time(samples, self._read_bitmap)
+            self.stdout.write("\nModules complétés + premier module non complété :")
+            self.stdout.write(f"  lignes Progress : {format_summary(rows)}")
+            self.stdout.write(f"  bitmap          : {format_summary(bitmap)}")
+
+    def _seed(self, enrollment_count, module_count):
+        self.stdout.write(f"Génération de {enrollment_count} inscriptions de {module_count} modules...")
+        with timer() as elapsed:
+            instructor = User.objects.create(username='bench_instructor', is_instructor=True)
+            category = Category.objects.create(name='Banc', slug='banc')
+            course_count = 20
+            Course.objects.bulk_create(
+                Course(title=f'Cours {i}', slug=f'cours-{i}', overview='Banc d\'essai',
+                       category=category, instructor=instructor) for i in range(course_count)
+            )
+            modules = {}
+            for course in Course.objects.all():
+                Module.objects.bulk_create(
+                    Module(course=course, title=f'Module {n}', order=n, bit_index=n)
+                    for n in range(module_count)
+                )
+            for module in Module.objects.all():
+                modules.setdefault(module.course_id, []).append(module)
+            courses = list(modules)
+
+            student_count = max(1, enrollment_count // 5)
+            User.objects.bulk_create(
+                (User(username=f'student_{i}', is_student=True) for i in range(student_count)),
+                batch_size=5000
+            )
+            students = list(User.objects.filter(is_student=True).values_list('id', flat=True))
+
+            enrollments, progress = [], []
+            for n in range(enrollment_count):
+                student_id = students[n % len(students)]
+                course_id = courses[(n // len(students)) % len(courses)]
+                done = random.randint(0, module_count)
+                value = 0
+                for module in modules[course_id]:
+                    completed = module.bit_index < done
+                    if completed:
+                        value |= 1 << module.bit_index
+                    # Même densité de lignes que course_learn avant le bitmap
+                    progress.append(Progress(student_id=student_id, course_id=course_id,
+                                             module=module, completed=completed))
+                enrollments.append(Enrollment(student_id=student_id, course_id=course_id,
+                                              completion_bits=to_bytes(value)))
+                if len(progress) >= 50000:
+                    self._flush(enrollments, progress)
+            self._flush(enrollments, progress)
+            connection.cursor().execute('ANALYZE')
+        self.stdout.write(f"Données générées en {elapsed():.1f}s")
+        return list(Enrollment.objects.values_list('id', flat=True))
+
+    def _flush(self, enrollments, progress):
+        with transaction.atomic():
+            Enrollment.objects.bulk_create(enrollments, batch_size=5000)
+            Progress.objects.bulk_create(progress, batch_size=5000)
+        enrollments.clear()
+        progress.clear()
+
+    def _report_sizes(self):
+        table = Progress._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+                rows_size = cursor.fetchone()[0]
+            else:
+                # Table et index, y compris les index automatiques des contraintes d'unicité
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                    [table, table]
+                )
+                rows_size = cursor.fetchone()[0]
+            cursor.execute(
+                f"SELECT COUNT(*), SUM(LENGTH(completion_bits)) FROM {Enrollment._meta.db_table}"
+            )
+            enrollment_count, bitmap_size = cursor.fetchone()
+        row_count = Progress.objects.count()
+
+        self.stdout.write("\nTaille de stockage :")
+        self.stdout.write(f"  lignes Progress : {row_count} lignes, {rows_size / 1024 / 1024:.1f} Mo (table + index)")
+        self.stdout.write(f"  bitmap          : {enrollment_count} inscriptions, "
+                          f"{(bitmap_size or 0) / 1024:.1f} Ko dans une colonne existante")
+
+    def _read_rows(self, enrollment_id):
+        enrollment = Enrollment.objects.only('student_id', 'course_id').get(id=enrollment_id)
+        modules = list(Module.objects.filter(course_id=enrollment.course_id))
+        completed = set(Progress.objects.filter(
+            student_id=enrollment.student_id, course_id=enrollment.course_id, completed=True
+        ).values_list('module_id', flat=True))
+        return completed, next((m for m in modules if m.id not in completed), None)
+
+    def _read_bitmap(self, enrollment_id):
+        enrollment = Enrollment.objects.only('course_id', 'completion_bits').get(id=enrollment_id)
+        modules = list(Module.objects.filter(course_id=enrollment.course_id))
+        return (completed_module_ids(enrollment.completion_bits, modules),
+                first_incomplete(enrollment.completion_bits, modules))
+
+    def _time(self, samples, read):
+        for enrollment_id in samples[:20]:
+            read(enrollment_id)
+        latencies = []
+        for enrollment_id in samples:
+            began = time.perf_counter()
+            read(enrollment_id)
+            latencies.append(time.perf_counter() - began)
+        return summarize(latencies)
@@ -0,0 +1,114 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from courses.models import Category, Course, Enrollment, Module
+from elearning_platform.benchmarks import scratch_database, summarize
+from elearning_platform.compression import COMPRESSION_LEVELS, brotli, compress_bytes
+from quizzes.models import Answer, Question, Quiz
+
+User = get_user_model()
+
+MIDDLEWARE = 'elearning_platform.compression.CompressionMiddleware'
+
+
+class Command(BaseCommand):
+    help = ("Mesure les octets gagnés et la latence ajoutée par CompressionMiddleware sur les grandes "
+            "pages (étudiants d'un cours, quiz volumineux, détail d'un cours), sur une base jetable")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=500, help="Étudiants inscrits (défaut: 500)")
+        parser.add_argument('--questions', type=int, default=200, help="Questions du quiz (défaut: 200)")
+        parser.add_argument('--requests', type=int, default=100,
+                            help="Requêtes par page et par codage (défaut: 100)")
+
+    def handle(self, *args, **options):
+        codings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['*']):
+            instructor, student, course, quiz = self._seed(options['students'], options['questions'])
+            pages = [
+                ('étudiants du cours', instructor, f'/courses/instructor/course/{course.slug}/students/'),
+                ('quiz volumineux', student, f'/quizzes/attempt/{quiz.id}/'),
+                ('détail du cours', None, f'/courses/course/{course.slug}/'),
+            ]
+            # Sans le middleware, pour isoler la latence qu'il ajoute
+            without = [name for name in settings.MIDDLEWARE if name != MIDDLEWARE]
+
+            self.stdout.write(f"{'page':<22}{'codage':>9}{'octets':>11}{'gain':>8}{'p50 ms':>9}{'ajout ms':>10}")
+            largest = b''
+            for label, user, path in pages:
+                # Le client charge les middlewares à sa première requête : un client par configuration
+                with override_settings(MIDDLEWARE=without, PAGE_CACHE_VIEWS=set()):
+                    baseline, content = self._run(self._client(user), path, 'identity', options['requests'])
+                largest = max(largest, content, key=len)
+                with override_settings(PAGE_CACHE_VIEWS=set()):
+                    client = self._client(user)
+                    for coding in codings:
+                        p50, body = self._run(client, path, coding, options['requests'])
+                        saved = 1 - len(body) / len(content) if content else 0
+                        self.stdout.write(f"{label:<22}{coding:>9}{len(body):>11}{saved:>8.0%}"
+                                          f"{p50:>9.2f}{p50 - baseline:>+10.2f}")
+
+            self.stdout.write(f"\nCompression seule de la plus grande page ({len(largest)} octets), par niveau :")
+            for coding in codings[1:]:
+                for level in sorted(set(range(1, 10 if coding == 'gzip' else 12)) | set(COMPRESSION_LEVELS[coding])):
+                    began = time.perf_counter()
+                    size = len(compress_bytes(largest, coding, level))
+                    elapsed = (time.perf_counter() - began) * 1000
+                    marker = ' ← niveau retenu' if level in COMPRESSION_LEVELS[coding] else ''
+                    self.stdout.write(f"  {coding:<5} {level:>2}  {size:>9} octets  {elapsed:7.2f} ms{marker}")
+
+    def _client(self, user):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        return client
+
+    def _run(self, client, path, coding, count):
+        headers = {} if coding == 'identity' else {'HTTP_ACCEPT_ENCODING': coding}
+        response = client.get(path, **headers)
+        latencies = []
+        for _ in range(count):
+            started = time.perf_counter()
+            response = client.get(path, **headers)
+            if response.streaming:
+                body = b''.join(response.streaming_content)
+            else:
+                body = response.content
+            latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, (path, response.status_code)
+        return summarize(latencies)['p50'], body
+
+    def _seed(self, student_count, question_count):
+        instructor = User.objects.create(username='bench_instructor', is_instructor=True,
+                                         first_name='Banc', last_name="D'essai")
+        category = Category.objects.create(name='Banc', slug='banc')
+        course = Course.objects.create(
+            title='Cours très suivi', slug='cours-suivi', overview='Présentation du cours. ' * 40,
+            category=category, instructor=instructor, status='published',
+        )
+        for m in range(20):
+            Module.objects.create(course=course, title=f'Module {m}', description='Description. ' * 10, order=m)
+        module = course.modules.first()
+        quiz = Quiz.objects.create(module=module, title='Examen final')
+        questions = Question.objects.bulk_create(
+            Question(quiz=quiz, text=f'Question {i} : ' + 'énoncé détaillé ' * 10,
+                     question_type='single_choice', order=i)
+            for i in range(1, question_count + 1)
+        )
+        Answer.objects.bulk_create(
+            Answer(question=question, text=f'Réponse {i}', is_correct=(i == 0))
+            for question in questions for i in range(4)
+        )
+        students = User.objects.bulk_create(
+            User(username=f'etudiant_{i}', first_name='Étudiant', last_name=str(i),
+                 email=f'etudiant_{i}@example.com', is_student=True)
+            for i in range(student_count)
+        )
+        Enrollment.objects.bulk_create(Enrollment(student=student, course=course) for student in students)
+        Enrolled = Course.students.through
+        Enrolled.objects.bulk_create(Enrolled(course=course, user=student) for student in students)
+        return instructor, students[0], course, quiz
@@ -0,0 +1,100 @@
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from courses.models import Category, Course, Module, Enrollment, Progress
+from elearning_platform.benchmarks import scratch_database, summarize, format_summary, timer
+from quizzes.models import Quiz, Question, QuizAttempt, QuestionResponse
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Mesure le débit des écritures concurrentes (progression et soumissions de quiz) "
+            "avec le profil de base de données configuré (base jetable)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--operations', type=int, default=2000)
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--sqlite-legacy', action='store_true',
+                            help="Ignorer les réglages SQLite durcis (journal par défaut) pour comparaison")
+
+    def handle(self, *args, **options):
+        if options['sqlite_legacy'] and connection.vendor == 'sqlite':
+            connection.settings_dict['OPTIONS'] = {}
+        profile = f"{connection.vendor} {connection.settings_dict['OPTIONS'] or 'par défaut'}"
+
+        with scratch_database():
+            students, modules, quiz, questions = self._seed(options['students'])
+
+            def operation(index):
+                student = students[index % len(students)]
+                began = time.perf_counter()
+                try:
+                    if index % 2:
+                        self._progress_write(student, random.choice(modules))
+                    else:
+                        self._quiz_write(student, quiz, questions)
+                    return 'ok', time.perf_counter() - began
+                except Exception as e:
+                    return type(e).__name__, time.perf_counter() - began
+                finally:
+                    connections.close_all()
+
+            with timer() as elapsed:
+                with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                    results = list(pool.map(operation, range(options['operations'])))
+            total = elapsed()
+
+        outcomes = Counter(outcome for outcome, _ in results)
+        latencies = [latency for outcome, latency in results if outcome == 'ok']
+        self.stdout.write(f"Profil : {profile}")
+        self.stdout.write(f"{len(results)} écritures en {total:.2f}s ({len(results) / total:.0f} op/s, "
+                          f"{options['threads']} threads)")
+        self.stdout.write(f"Latence : {format_summary(summarize(latencies))}")
+        self.stdout.write(f"Résultats : {dict(outcomes)}")
+
+    def _progress_write(self, student, module):
+        with transaction.atomic():
+            progress, created = Progress.objects.get_or_create(
+                student=student, course_id=module.course_id, module=module
+            )
+            progress.completed = True
+            progress.save()
+
+    def _quiz_write(self, student, quiz, questions):
+        with transaction.atomic():
+            attempt = QuizAttempt.objects.create(student=student, quiz=quiz)
+            QuestionResponse.objects.bulk_create(
+                QuestionResponse(attempt=attempt, question=question, is_correct=random.random() > 0.5)
+                for question in questions
+            )
+            attempt.score = 50
+            attempt.end_time = timezone.now()
+            attempt.save()
+
+    def _seed(self, student_count):
+        instructor = User.objects.create(username='bench_instructor', is_instructor=True)
+        category = Category.objects.create(name='Banc', slug='banc')
+        course = Course.objects.create(title='Cours', slug='cours', overview='Banc d\'essai',
+                                       status='published', category=category, instructor=instructor)
+        modules = Module.objects.bulk_create(
+            Module(course=course, title=f'Module {n}', order=n) for n in range(1, 21)
+        )
+        quiz = Quiz.objects.create(module=modules[0], title='Quiz')
+        questions = Question.objects.bulk_create(
+            Question(quiz=quiz, text=f'Question {n}', question_type='single_choice', order=n)
+            for n in range(1, 11)
+        )
+        students = User.objects.bulk_create(
+            User(username=f'student_{i}', is_student=True) for i in range(student_count)
+        )
+        Enrollment.objects.bulk_create(Enrollment(student=s, course=course) for s in students)
+        return students, modules, quiz, questions
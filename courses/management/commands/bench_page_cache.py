@@ -0,0 +1,61 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from courses.models import Category, Course, Module, TextContent
+from elearning_platform.benchmarks import scratch_database, summarize, format_summary
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Mesure les requêtes par seconde des pages publiques pour un visiteur anonyme : "
+            "sans cache de pages, depuis le cache, et en requête conditionnelle (304), sur une base jetable")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=60, help="Cours publiés (défaut: 60)")
+        parser.add_argument('--requests', type=int, default=500,
+                            help="Requêtes par page et par mode (défaut: 500)")
+
+    def handle(self, *args, **options):
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['*']):
+            slug = self._seed(options['courses'])
+            pages = ['/', '/courses/courses/', f'/courses/course/{slug}/']
+            for path in pages:
+                self.stdout.write(f"\n{path}")
+                with override_settings(PAGE_CACHE_VIEWS=set()):
+                    self._run("sans cache", path, options['requests'])
+                self._run("cache", path, options['requests'])
+                etag = Client().get(path)['ETag']
+                self._run("304", path, options['requests'], HTTP_IF_NONE_MATCH=etag)
+
+    def _run(self, label, path, count, **headers):
+        client = Client()
+        client.get(path, **headers)
+        latencies = []
+        began = time.perf_counter()
+        for _ in range(count):
+            started = time.perf_counter()
+            response = client.get(path, **headers)
+            latencies.append(time.perf_counter() - started)
+        total = time.perf_counter() - began
+        self.stdout.write(f"  {label:<11} {count / total:>8.0f} req/s  statut {response.status_code}  "
+                          f"{format_summary(summarize(latencies))}")
+
+    def _seed(self, course_count):
+        instructor = User.objects.create(username='bench_instructor', is_instructor=True,
+                                         first_name='Banc', last_name="D'essai")
+        category = Category.objects.create(name='Banc', slug='banc')
+        for n in range(course_count):
+            course = Course.objects.create(
+                title=f'Cours {n}', slug=f'cours-{n}', overview='Présentation du cours. ' * 20,
+                category=category, instructor=instructor, status='published',
+                objectives='\n'.join(f'Objectif {i}' for i in range(8)),
+                requirements='\n'.join(f'Prérequis {i}' for i in range(5)),
+            )
+            for m in range(8):
+                module = Module.objects.create(course=course, title=f'Module {m}', order=m)
+                TextContent.objects.create(module=module, title='Texte', order=1, content='Texte. ' * 50)
+        return 'cours-0'
@@ -0,0 +1,120 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from django.test import Client, override_settings
+
+from courses.derived import split_lines
+from courses.models import Category, Course, Module, Enrollment, TextContent, VideoContent
+from elearning_platform.benchmarks import scratch_database, summarize, format_summary
+
+User = get_user_model()
+
+# Rendu des contenus d'un module tel qu'il était fait avant les champs dérivés
+LEGACY_TEMPLATE = Template(
+    "{% load course_extras %}"
+    "{% for content in text_contents %}{{ content.content|linebreaks }}{% endfor %}"
+    "{% for content in video_contents %}{{ content.url|youtube_embed_url }}{% endfor %}"
+    "{% for item in course.legacy_objectives %}{{ item }}{% endfor %}"
+    "{% for item in course.legacy_requirements %}{{ item }}{% endfor %}"
+)
+# Même rendu à partir des valeurs calculées à l'enregistrement
+DERIVED_TEMPLATE = Template(
+    "{% for content in text_contents %}{{ content.html }}{{ content.reading_minutes }}{% endfor %}"
+    "{% for content in video_contents %}{{ content.player_url }}{% endfor %}"
+    "{% for item in course.objectives_list %}{{ item }}{% endfor %}"
+    "{% for item in course.requirements_list %}{{ item }}{% endfor %}"
+)
+
+PARAGRAPH = ("Une fonction Python reçoit des arguments, exécute son corps et retourne une valeur. "
+             "Les arguments nommés rendent les appels lisibles & les valeurs par défaut <évitent> "
+             "les répétitions.\nChaque exemple est suivi d'un exercice corrigé.\n\n")
+
+
+class LegacyCourse:
+    """Cours dont les listes sont redécoupées à chaque accès, comme avant"""
+
+    def __init__(self, course):
+        self.course = course
+
+    @property
+    def legacy_objectives(self):
+        return split_lines(self.course.objectives)
+
+    @property
+    def legacy_requirements(self):
+        return split_lines(self.course.requirements)
+
+
+class Command(BaseCommand):
+    help = ("Compare le rendu des contenus d'un module chargé en texte avec les filtres appliqués "
+            "à l'affichage et avec les champs dérivés calculés à l'enregistrement, sur une base jetable")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--texts', type=int, default=30, help="Textes dans le module (défaut: 30)")
+        parser.add_argument('--paragraphs', type=int, default=40,
+                            help="Paragraphes par texte (défaut: 40)")
+        parser.add_argument('--videos', type=int, default=10, help="Vidéos dans le module (défaut: 10)")
+        parser.add_argument('--repeat', type=int, default=200, help="Rendus mesurés (défaut: 200)")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            course, module, student = self._seed(options)
+            context = {
+                'text_contents': list(TextContent.objects.filter(module=module)),
+                'video_contents': list(VideoContent.objects.filter(module=module)),
+            }
+            legacy = self._time(LEGACY_TEMPLATE, {**context, 'course': LegacyCourse(course)}, options['repeat'])
+            derived = self._time(DERIVED_TEMPLATE, {**context, 'course': course}, options['repeat'])
+
+            size = sum(len(content.content) for content in context['text_contents'])
+            self.stdout.write(f"Module : {options['texts']} textes ({size / 1024:.0f} Ko), "
+                              f"{options['videos']} vidéos")
+            self.stdout.write("\nRendu des contenus :")
+            self.stdout.write(f"  filtres à l'affichage : {format_summary(legacy)}")
+            self.stdout.write(f"  champs dérivés        : {format_summary(derived)}")
+            if derived['p50']:
+                self.stdout.write(f"  gain (p50)            : x{legacy['p50'] / derived['p50']:.1f}")
+
+            client = Client()
+            client.force_login(student)
+            url = f'/courses/course/{course.slug}/module/{module.id}/'
+            with override_settings(ALLOWED_HOSTS=['*']):
+                latencies = []
+                for _ in range(min(options['repeat'], 50)):
+                    began = time.perf_counter()
+                    client.get(url)
+                    latencies.append(time.perf_counter() - began)
+            self.stdout.write(f"\nPage module_content complète : {format_summary(summarize(latencies))}")
+
+    def _seed(self, options):
+        instructor = User.objects.create(username='bench_instructor', is_instructor=True)
+        student = User.objects.create(username='bench_student', is_student=True)
+        category = Category.objects.create(name='Banc', slug='banc')
+        course = Course.objects.create(
+            title='Cours', slug='cours', overview='Banc d\'essai', category=category,
+            instructor=instructor, status='published',
+            requirements='\n'.join(f'Prérequis {n}' for n in range(15)),
+            objectives='\n'.join(f'Objectif {n}' for n in range(15)),
+        )
+        module = Module.objects.create(course=course, title='Module', order=1)
+        for n in range(options['texts']):
+            TextContent.objects.create(module=module, title=f'Texte {n}', order=n,
+                                       content=PARAGRAPH * options['paragraphs'])
+        for n in range(options['videos']):
+            VideoContent.objects.create(module=module, title=f'Vidéo {n}', order=n,
+                                        url=f'https://www.youtube.com/watch?v=video{n:06d}', duration=10)
+        Enrollment.objects.create(student=student, course=course)
+        return course, module, student
+
+    def _time(self, template, context, repeat):
+        context = Context(context)
+        for _ in range(10):
+            template.render(context)
+        latencies = []
+        for _ in range(repeat):
+            began = time.perf_counter()
+            template.render(context)
+            latencies.append(time.perf_counter() - began)
+        return summarize(latencies)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from elearning_platform.cache import EVENTS, shared_metrics
+
+
+class Command(BaseCommand):
+    help = ("Affiche les compteurs du cache par famille de clés (succès local, succès partagé, "
+            "absences, reconstructions, attentes), cumulés sur tous les processus")
+
+    def handle(self, *args, **options):
+        stats = shared_metrics()
+        if not stats:
+            self.stdout.write("Aucun compteur publié pour le moment.")
+            return
+        self.stdout.write(f"{'famille':<24}" + ''.join(f"{event:>12}" for event in EVENTS) + f"{'taux':>8}")
+        for name, counts in stats.items():
+            lookups = counts['local_hits'] + counts['hits'] + counts['misses']
+            ratio = (counts['local_hits'] + counts['hits']) / lookups if lookups else 0
+            self.stdout.write(f"{name:<24}" + ''.join(f"{counts[event]:>12}" for event in EVENTS)
+                              + f"{ratio:>8.1%}")
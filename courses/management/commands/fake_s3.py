@@ -0,0 +1,211 @@
+import hashlib
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape
+
+from django.core.management.base import BaseCommand, CommandError
+
+LIST_PAGE_SIZE = 1000
+
+
+class Bucket:
+    """Objets et envois multipart en mémoire, partagés par les threads du serveur"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # clé → (contenu, type, date de modification, ETag)
+        self.objects = {}
+        # identifiant d'envoi → (clé, type, {numéro: contenu})
+        self.uploads = {}
+
+    def put(self, key, data, content_type):
+        with self.lock:
+            self.objects[key] = (data, content_type, datetime.now(timezone.utc),
+                                 f'"{hashlib.md5(data).hexdigest()}"')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _parse(self):
+        url = urlsplit(self.path)
+        bucket_name, _, key = url.path.lstrip('/').partition('/')
+        self.query = dict(parse_qsl(url.query, keep_blank_values=True))
+        self.key = unquote(key)
+        self.bucket = self.server.buckets.setdefault(unquote(bucket_name), Bucket())
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else b''
+        return self._authorized()
+
+    def _authorized(self):
+        # Les signatures ne sont pas vérifiées : seule leur présence et l'expiration des URL présignées le sont
+        if 'X-Amz-Signature' in self.query:
+            issued = datetime.strptime(self.query['X-Amz-Date'], '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+            if datetime.now(timezone.utc) > issued + timedelta(seconds=int(self.query['X-Amz-Expires'])):
+                self._error(403, 'AccessDenied', 'Request has expired')
+                return False
+            return True
+        if not self.headers.get('Authorization', '').startswith('AWS4-HMAC-SHA256 '):
+            self._error(403, 'AccessDenied', 'Missing signature')
+            return False
+        return True
+
+    def _send(self, status, body=b'', headers=None, length=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body) if length is None else length))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _xml(self, status, body):
+        self._send(status, b'<?xml version="1.0" encoding="UTF-8"?>' + body.encode(),
+                   {'Content-Type': 'application/xml'})
+
+    def _error(self, status, code, message=''):
+        self._xml(status, f'<Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>')
+
+    def _object(self):
+        with self.bucket.lock:
+            found = self.bucket.objects.get(self.key)
+        if found is None:
+            if self.command == 'HEAD':
+                self._send(404)
+            else:
+                self._error(404, 'NoSuchKey', self.key)
+        return found
+
+    def do_HEAD(self):
+        if self._parse() and (found := self._object()):
+            data, content_type, modified, etag = found
+            self._send(200, headers={'Content-Type': content_type, 'ETag': etag,
+                                     'Last-Modified': format_datetime(modified, usegmt=True)}, length=len(data))
+
+    def do_GET(self):
+        if not self._parse():
+            return
+        if not self.key:
+            return self._list()
+        if found := self._object():
+            data, content_type, modified, etag = found
+            headers = {'Content-Type': content_type, 'ETag': etag,
+                       'Last-Modified': format_datetime(modified, usegmt=True)}
+            if 'response-content-disposition' in self.query:
+                headers['Content-Disposition'] = self.query['response-content-disposition']
+            self._send(200, data, headers)
+
+    def _list(self):
+        prefix, delimiter = self.query.get('prefix', ''), self.query.get('delimiter', '')
+        with self.bucket.lock:
+            items = sorted((key, value) for key, value in self.bucket.objects.items() if key.startswith(prefix))
+        # Entrées de la liste complète : objets et préfixes communs, triés, sans doublon
+        entries = {}
+        for key, (data, _, modified, etag) in items:
+            rest = key[len(prefix):]
+            if delimiter and delimiter in rest:
+                common = prefix + rest.split(delimiter, 1)[0] + delimiter
+                entries.setdefault(common, f'<CommonPrefixes><Prefix>{escape(common)}</Prefix></CommonPrefixes>')
+            else:
+                entries[key] = (f'<Contents><Key>{escape(key)}</Key><Size>{len(data)}</Size>'
+                                f'<LastModified>{modified:%Y-%m-%dT%H:%M:%S.000Z}</LastModified>'
+                                f'<ETag>{escape(etag)}</ETag></Contents>')
+        start = self.query.get('continuation-token', '')
+        remaining = [name for name in sorted(entries) if name > start]
+        page, truncated = remaining[:LIST_PAGE_SIZE], len(remaining) > LIST_PAGE_SIZE
+        self._xml(200, '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                       f'<Prefix>{escape(prefix)}</Prefix><IsTruncated>{str(truncated).lower()}</IsTruncated>'
+                       + (f'<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>' if truncated else '')
+                       + ''.join(entries[name] for name in page)
+                       + '</ListBucketResult>')
+
+    def do_PUT(self):
+        if not self._parse():
+            return
+        if not self.key:
+            return self._send(200)
+        content_type = self.headers.get('Content-Type', 'binary/octet-stream')
+        if 'uploadId' in self.query:
+            with self.bucket.lock:
+                upload = self.bucket.uploads.get(self.query['uploadId'])
+                if upload is not None:
+                    upload[2][int(self.query['partNumber'])] = self.body
+            if upload is None:
+                return self._error(404, 'NoSuchUpload')
+            return self._send(200, headers={'ETag': f'"{hashlib.md5(self.body).hexdigest()}"'})
+        self.bucket.put(self.key, self.body, content_type)
+        self._send(200, headers={'ETag': f'"{hashlib.md5(self.body).hexdigest()}"'})
+
+    def do_POST(self):
+        if not self._parse():
+            return
+        if 'uploads' in self.query:
+            upload_id = uuid.uuid4().hex
+            with self.bucket.lock:
+                self.bucket.uploads[upload_id] = (
+                    self.key, self.headers.get('Content-Type', 'binary/octet-stream'), {})
+            return self._xml(200, f'<InitiateMultipartUploadResult><Key>{escape(self.key)}</Key>'
+                                  f'<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>')
+        if 'uploadId' in self.query:
+            with self.bucket.lock:
+                upload = self.bucket.uploads.pop(self.query['uploadId'], None)
+            if upload is None:
+                return self._error(404, 'NoSuchUpload')
+            _, content_type, stored = upload
+            numbers = [int(part.findtext('PartNumber')) for part in ET.fromstring(self.body).iter('Part')]
+            if numbers != sorted(numbers) or any(number not in stored for number in numbers):
+                return self._error(400, 'InvalidPart')
+            if any(len(stored[number]) < 5 * 1024 * 1024 for number in numbers[:-1]):
+                return self._error(400, 'EntityTooSmall')
+            self.bucket.put(self.key, b''.join(stored[number] for number in numbers), content_type)
+            return self._xml(200, f'<CompleteMultipartUploadResult><Key>{escape(self.key)}</Key>'
+                                  '</CompleteMultipartUploadResult>')
+        self._error(400, 'InvalidRequest')
+
+    def do_DELETE(self):
+        if not self._parse():
+            return
+        with self.bucket.lock:
+            if 'uploadId' in self.query:
+                if self.bucket.uploads.pop(self.query['uploadId'], None) is None:
+                    return self._error(404, 'NoSuchUpload')
+            else:
+                self.bucket.objects.pop(self.key, None)
+        self._send(204)
+
+
+class Command(BaseCommand):
+    help = ("Service objet compatible S3 en mémoire, pour développer et tester S3Storage sans compte "
+            "(objets, listes, envois multipart, URL présignées). Les signatures ne sont pas vérifiées.")
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='127.0.0.1:9000',
+                            help="Adresse d'écoute hôte:port (défaut: 127.0.0.1:9000)")
+        parser.add_argument('--verbose-requests', action='store_true', help="Journaliser chaque requête")
+
+    def handle(self, *args, **options):
+        host, _, port = options['bind'].rpartition(':')
+        if not port.isdigit():
+            raise CommandError("--bind attend une adresse hôte:port")
+        server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), Handler)
+        server.daemon_threads = True
+        server.buckets = {}
+        server.verbose = options['verbose_requests']
+        self.stdout.write(f"Service S3 factice sur http://{host or '127.0.0.1'}:{port} "
+                          f"(S3_ENDPOINT_URL), buckets créés à la première requête")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,93 @@
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Budget de temps d'import par cible (millisecondes), mesuré par `python -X importtime`
+IMPORT_TIME_BUDGET = getattr(settings, 'IMPORT_TIME_BUDGET', {'check': 800, 'wsgi': 800})
+
+# Cibles mesurées : commande lancée et paquets qui ne doivent pas être importés.
+# L'application WSGI est mesurée avec ses URLs chargées, comme à la première requête.
+# Le contrôle des ImageField de `check` importe Pillow : il n'est interdit qu'au démarrage WSGI.
+TARGETS = {
+    'check': (['manage.py', 'check'], ('reportlab', 'qrcode')),
+    'wsgi': (['-c', 'import elearning_platform.wsgi; from django.urls import get_resolver; '
+                    'get_resolver().url_patterns'], ('reportlab', 'qrcode', 'PIL')),
+}
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(output):
+    """Lignes de `-X importtime` en `(module, temps propre µs, temps cumulé µs, profondeur)`"""
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            imports.append((module, int(own), int(cumulative), len(indent) // 2))
+    return imports
+
+
+class Command(BaseCommand):
+    help = ("Mesure le temps d'import au démarrage de `manage.py check` et de l'application WSGI "
+            "avec `python -X importtime`, et échoue si le budget est dépassé ou si une "
+            "dépendance lourde (ReportLab, Pillow, qrcode) est importée")
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', metavar='cible',
+                            help=f"Cibles à mesurer parmi {', '.join(TARGETS)} (défaut : toutes)")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Nombre de lancements par cible, le plus rapide est retenu (défaut: 3)")
+        parser.add_argument('--top', type=int, default=10,
+                            help="Nombre de paquets les plus coûteux affichés (défaut: 10)")
+        parser.add_argument('--budget', type=int,
+                            help="Budget en millisecondes, pour toutes les cibles (défaut: IMPORT_TIME_BUDGET)")
+
+    def handle(self, *args, **options):
+        unknown = set(options['targets']) - set(TARGETS)
+        if unknown:
+            raise CommandError(f"Cible inconnue : {', '.join(sorted(unknown))}")
+        failures = []
+        for target in options['targets'] or TARGETS:
+            failures += self._measure(target, options)
+        if failures:
+            raise CommandError('\n'.join(failures))
+
+    def _run(self, target):
+        arguments, _ = TARGETS[target]
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE',
+                                                                      'elearning_platform.settings')}
+        result = subprocess.run([sys.executable, '-X', 'importtime', *arguments], cwd=settings.BASE_DIR,
+                                env=env, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f"{target} a échoué :\n{result.stderr[-2000:]}")
+        return parse_importtime(result.stderr)
+
+    def _measure(self, target, options):
+        runs = [self._run(target) for _ in range(max(1, options['repeat']))]
+        # Le lancement le plus rapide est le moins perturbé par le reste de la machine
+        imports = min(runs, key=lambda run: sum(cumulative for _, _, cumulative, depth in run if depth == 0))
+        total = sum(cumulative for _, _, cumulative, depth in imports if depth == 0) / 1000
+        budget = options['budget'] or IMPORT_TIME_BUDGET.get(target)
+
+        self.stdout.write(f"{target} : {total:.0f} ms d'import, {len(imports)} modules"
+                          + (f" (budget {budget} ms)" if budget else ''))
+        packages = {}
+        for module, own, _, _ in imports:
+            package = module.split('.')[0]
+            packages[package] = packages.get(package, 0) + own
+        for package, own in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"  {package:<28} {own / 1000:8.1f} ms")
+
+        failures = []
+        if budget and total > budget:
+            failures.append(f"{target} : {total:.0f} ms d'import, budget {budget} ms")
+        _, forbidden = TARGETS[target]
+        loaded = sorted({module.split('.')[0] for module, _, _, _ in imports} & set(forbidden))
+        if loaded:
+            failures.append(f"{target} importe {', '.join(loaded)} au démarrage")
+        return failures
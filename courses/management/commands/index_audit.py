@@ -0,0 +1,262 @@
+import random
+import re
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from certificates.models import Certificate
+from courses.models import Category, Course, Module, Enrollment, Progress
+from elearning_platform.benchmarks import scratch_database, timer
+from quizzes.models import Quiz, QuizAttempt
+
+User = get_user_model()
+
+# Requêtes émises par les vues sur les chemins les plus fréquentés.
+# Chaque entrée reçoit des identifiants d'exemple et retourne le queryset.
+AUDITED_QUERIES = [
+    ('course_learn: modules complétés', lambda ids: Progress.objects.filter(
+        student_id=ids['student'], course_id=ids['course'], completed=True
+    ).values_list('module_id', flat=True)),
+    ('course_enroll: inscription existante', lambda ids: Enrollment.objects.filter(
+        student_id=ids['student'], course_id=ids['course'])),
+    ('student_profile: inscriptions', lambda ids: Enrollment.objects.filter(
+        student_id=ids['student']).select_related('course')),
+    ('module_content: tentatives du quiz', lambda ids: QuizAttempt.objects.filter(
+        student_id=ids['student'], quiz_id=ids['quiz'], end_time__isnull=False
+    ).order_by('-start_time')),
+    ('take_quiz: quiz déjà réussi', lambda ids: QuizAttempt.objects.filter(
+        student_id=ids['student'], quiz_id=ids['quiz'], passed=True)),
+    ('take_quiz: tentative en cours', lambda ids: QuizAttempt.objects.filter(
+        student_id=ids['student'], quiz_id=ids['quiz'], end_time__isnull=True
+    ).order_by('-start_time')),
+    ('student_quiz_attempts', lambda ids: QuizAttempt.objects.filter(
+        student_id=ids['student'], end_time__isnull=False).order_by('-start_time')),
+    ('quiz_results', lambda ids: QuizAttempt.objects.filter(
+        quiz_id=ids['quiz'], end_time__isnull=False).order_by('-start_time')),
+    ('home: cours récents', lambda ids: Course.objects.filter(
+        status='published').order_by('-created')[:6]),
+    ('course_list: cours publiés', lambda ids: Course.objects.filter(status='published')[:50]),
+    ('instructor_courses', lambda ids: Course.objects.filter(instructor_id=ids['instructor'])),
+    ('student_certificates', lambda ids: Certificate.objects.filter(
+        student_id=ids['student']).order_by('-issued_date')),
+    ('course_students', lambda ids: Enrollment.objects.filter(course_id=ids['course'])[:100]),
+    ('continue_learning', lambda ids: Enrollment.objects.filter(
+        student_id=ids['student'], completed=False, last_accessed__isnull=False
+    ).order_by('-last_accessed')[:6]),
+]
+
+# Index ajoutés pour ces requêtes, retirés temporairement pour la mesure « avant »
+HOT_PATH_INDEXES = [
+    (Course, 'course_status_created_idx'),
+    (Course, 'course_instructor_created_idx'),
+    (Progress, 'progress_student_course_idx'),
+    (Enrollment, 'enrollment_resume_idx'),
+    (QuizAttempt, 'attempt_student_quiz_idx'),
+    (QuizAttempt, 'attempt_student_start_idx'),
+    (QuizAttempt, 'attempt_quiz_start_idx'),
+    (QuizAttempt, 'attempt_passed_idx'),
+    (QuizAttempt, 'attempt_in_progress_idx'),
+    (Certificate, 'certificate_student_date_idx'),
+]
+
+
+def plan_problems(vendor, plan):
+    """Repère les parcours complets et les tris temporaires dans un plan d'exécution"""
+    problems = []
+    for line in plan.splitlines():
+        if vendor == 'sqlite':
+            match = re.search(r'\bSCAN (\w+)', line)
+            if match and 'USING' not in line:
+                problems.append(f'parcours complet de {match.group(1)}')
+            if 'USE TEMP B-TREE' in line:
+                problems.append('tri par B-tree temporaire')
+        elif vendor == 'postgresql':
+            match = re.search(r'Seq Scan on (\w+)', line)
+            if match:
+                problems.append(f'parcours complet de {match.group(1)}')
+            if re.search(r'(^|->\s*)Sort\b', line.strip()):
+                problems.append('tri en mémoire')
+    return problems
+
+
+class Command(BaseCommand):
+    help = ("Rejoue les requêtes des vues principales, affiche leur plan d'exécution "
+            "et signale les parcours complets et les tris temporaires")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-problems', action='store_true',
+                            help="Échouer si une requête fait un parcours complet ou un tri temporaire")
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help="Afficher les plans d'exécution complets")
+        parser.add_argument('--benchmark', action='store_true',
+                            help="Mesurer les requêtes avant/après les index sur une base jetable peuplée")
+        parser.add_argument('--rows', type=int, default=100000,
+                            help="Nombre de lignes de progression générées pour --benchmark (défaut: 100000)")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            with scratch_database():
+                ids = self._seed(options['rows'])
+                self._benchmark(ids, options['repeat'])
+            return
+
+        problems = self._audit(self._sample_ids(), options['verbose_plans'])
+        if problems and options['fail_on_problems']:
+            raise CommandError(f"{problems} requête(s) sans index adapté")
+
+    def _audit(self, ids, verbose):
+        flagged = 0
+        for label, build in AUDITED_QUERIES:
+            plan = build(ids).explain()
+            problems = plan_problems(connection.vendor, plan)
+            if problems:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"✗ {label} : {', '.join(problems)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"✓ {label}"))
+            if verbose or problems:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+        return flagged
+
+    def _sample_ids(self):
+        """Identifiants réels si la base contient des données, sinon des valeurs arbitraires"""
+        attempt = QuizAttempt.objects.order_by('-id').first()
+        enrollment = Enrollment.objects.order_by('-id').first()
+        course = Course.objects.order_by('-id').first()
+        return {
+            'student': attempt.student_id if attempt else (enrollment.student_id if enrollment else 1),
+            'quiz': attempt.quiz_id if attempt else 1,
+            'course': enrollment.course_id if enrollment else (course.id if course else 1),
+            'instructor': course.instructor_id if course else 1,
+        }
+
+    def _time_queries(self, ids_list, repeat):
+        """Médiane du temps d'exécution SQL seul (sans construction des objets)"""
+        timings = {}
+        with connection.cursor() as cursor:
+            for label, build in AUDITED_QUERIES:
+                statements = [build(ids).query.sql_with_params() for ids in ids_list[:repeat]]
+                # Premier passage à blanc pour charger les pages en cache
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                samples = []
+                for sql, params in statements:
+                    began = time.perf_counter()
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                    samples.append(time.perf_counter() - began)
+                timings[label] = statistics.median(samples) * 1000
+        return timings
+
+    def _benchmark(self, ids, repeat):
+        samples = [ids[i] for i in range(min(repeat, len(ids)))]
+        self.stdout.write("Plans avec les index :")
+        self._audit(samples[0], verbose=False)
+        after = self._time_queries(samples, repeat)
+
+        with connection.schema_editor() as editor:
+            for model, name in HOT_PATH_INDEXES:
+                index = next(i for i in model._meta.indexes if i.name == name)
+                editor.remove_index(model, index)
+        if connection.vendor == 'sqlite':
+            connection.cursor().execute('ANALYZE')
+        before = self._time_queries(samples, repeat)
+
+        self.stdout.write("\nMédiane par requête (ms) : sans les index → avec les index")
+        for label, _ in AUDITED_QUERIES:
+            speedup = before[label] / after[label] if after[label] else 0
+            self.stdout.write(f"  {label:<40} {before[label]:9.3f} → {after[label]:9.3f}  (x{speedup:.1f})")
+
+    def _seed(self, rows):
+        """Génère environ `rows` lignes de progression et des données proportionnelles"""
+        batch = 10000
+        self.stdout.write(f"Génération de {rows} lignes de progression...")
+        with timer() as elapsed:
+            instructor = User.objects.create(username='bench_instructor', is_instructor=True)
+            category = Category.objects.create(name='Banc', slug='banc')
+            course_count = max(200, rows // 1000)
+            now = timezone.now()
+            Course.objects.bulk_create(
+                (Course(title=f'Cours {i}', slug=f'cours-{i}', overview='Banc d\'essai',
+                        status=random.choice(['published', 'draft', 'archived']),
+                        category=category, instructor=instructor) for i in range(course_count)),
+                batch_size=batch
+            )
+            courses = list(Course.objects.values_list('id', flat=True))
+            # Les dates de création doivent être dispersées pour que le tri ait un sens
+            for course_id in random.sample(courses, min(len(courses), 1000)):
+                Course.objects.filter(id=course_id).update(
+                    created=now - timezone.timedelta(days=random.randint(0, 1000)))
+
+            catalog = courses[:200]
+            Module.objects.bulk_create(
+                (Module(course_id=course_id, title=f'Module {n}', order=n)
+                 for course_id in catalog for n in range(1, 51)),
+                batch_size=batch
+            )
+            modules = {}
+            for module_id, course_id in Module.objects.values_list('id', 'course_id'):
+                modules.setdefault(course_id, []).append(module_id)
+            Quiz.objects.bulk_create(Quiz(module_id=modules[c][0], title='Quiz') for c in catalog)
+            quizzes = list(Quiz.objects.values_list('id', flat=True))
+
+            # Chaque étudiant suit 5 cours de 50 modules : 250 lignes de progression
+            student_count = max(1, rows // 250)
+            User.objects.bulk_create(
+                (User(username=f'student_{i}', is_student=True) for i in range(student_count)),
+                batch_size=batch
+            )
+            students = list(User.objects.filter(is_student=True).values_list('id', flat=True))
+
+            enrollments, progress = [], []
+            for student_id in students:
+                for course_id in random.sample(catalog, 5):
+                    enrollments.append(Enrollment(student_id=student_id, course_id=course_id))
+                    progress.extend(
+                        Progress(student_id=student_id, course_id=course_id, module_id=module_id,
+                                 completed=random.random() < 0.5)
+                        for module_id in modules[course_id]
+                    )
+                if len(progress) >= batch * 5:
+                    self._flush(enrollments, progress, batch)
+            self._flush(enrollments, progress, batch)
+
+            attempt_count = rows // 10
+            for start in range(0, attempt_count, batch):
+                with transaction.atomic():
+                    QuizAttempt.objects.bulk_create(
+                        QuizAttempt(student_id=random.choice(students), quiz_id=random.choice(quizzes),
+                                    score=random.uniform(0, 100), passed=random.random() < 0.3,
+                                    end_time=now)
+                        for _ in range(min(batch, attempt_count - start))
+                    )
+            certificate_pairs = {
+                (random.choice(students), random.choice(catalog)) for _ in range(rows // 100)
+            }
+            Certificate.objects.bulk_create(
+                (Certificate(student_id=s, course_id=c) for s, c in certificate_pairs),
+                batch_size=batch
+            )
+            # Statistiques à jour pour le planificateur
+            connection.cursor().execute('ANALYZE')
+        self.stdout.write(f"Données générées en {elapsed():.1f}s")
+
+        return [
+            {'student': random.choice(students), 'quiz': random.choice(quizzes),
+             'course': random.choice(catalog), 'instructor': instructor.id}
+            for _ in range(100)
+        ]
+
+    def _flush(self, enrollments, progress, batch):
+        with transaction.atomic():
+            Enrollment.objects.bulk_create(enrollments, batch_size=batch)
+            Progress.objects.bulk_create(progress, batch_size=batch)
+        enrollments.clear()
+        progress.clear()
@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from elearning_platform.cache import atomic_shared_cache
+from elearning_platform.server import SERVE_GRACEFUL_TIMEOUT, SERVE_WORKERS, Arbiter, load_application
+
+
+class Command(BaseCommand):
+    help = ("Serveur de production à processus préforkés : charge et chauffe l'application une fois, "
+            "puis crée les workers. SIGHUP recharge le code sans coupure, SIGTERM arrête proprement.")
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='127.0.0.1:8000',
+                            help="Adresse d'écoute hôte:port (défaut: 127.0.0.1:8000)")
+        parser.add_argument('--workers', type=int, default=SERVE_WORKERS,
+                            help=f"Nombre de workers (défaut: {SERVE_WORKERS})")
+        parser.add_argument('--graceful-timeout', type=int, default=SERVE_GRACEFUL_TIMEOUT,
+                            help=f"Temps laissé aux requêtes en cours à l'arrêt, en secondes "
+                                 f"(défaut: {SERVE_GRACEFUL_TIMEOUT})")
+        parser.add_argument('--pidfile', help="Fichier où écrire le PID du maître")
+        parser.add_argument('--no-warmup', action='store_true',
+                            help="Ne pas chauffer les caches avant d'accepter des requêtes")
+        parser.add_argument('--check', action='store_true',
+                            help="Charger l'application puis quitter (utilisé avant un rechargement)")
+
+    def handle(self, *args, **options):
+        if options['check']:
+            load_application()
+            return
+
+        host, _, port = options['bind'].rpartition(':')
+        if not port.isdigit():
+            raise CommandError("--bind attend une adresse hôte:port")
+        if options['workers'] < 1:
+            raise CommandError("--workers doit être au moins 1")
+        if options['workers'] > 1 and not atomic_shared_cache():
+            self.stderr.write(self.style.WARNING(
+                "Le cache partagé n'est pas atomique entre processus : définissez REDIS_URL "
+                "pour que les workers ne reconstruisent pas les mêmes valeurs en parallèle."
+            ))
+        Arbiter(
+            (host.strip('[]') or '127.0.0.1', int(port)),
+            workers=options['workers'],
+            graceful_timeout=options['graceful_timeout'],
+            warmup=not options['no_warmup'],
+            pidfile=options['pidfile'],
+            stdout=sys.stdout,
+        ).run()
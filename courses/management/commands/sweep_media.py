@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.media_gc import MEDIA_GC_BATCH_SIZE, MEDIA_GC_GRACE_SECONDS, reconcile, sweep_tombstones
+from courses.uploads import expire_upload_sessions
+
+
+class Command(BaseCommand):
+    help = ("Supprime par lots les fichiers médias des objets supprimés et, avec --reconcile, "
+            "les fichiers du stockage qu'aucun champ ne référence")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true',
+                            help="Parcourir aussi le stockage à la recherche de fichiers orphelins")
+        parser.add_argument('--batch-size', type=int, default=MEDIA_GC_BATCH_SIZE)
+        parser.add_argument('--grace', type=int, default=MEDIA_GC_GRACE_SECONDS,
+                            help="Âge minimal (secondes) d'un fichier orphelin avant sa suppression")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Lister le nombre de fichiers à supprimer sans rien supprimer")
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Répéter le balayage toutes les N secondes (0 : un seul passage)")
+
+    def handle(self, *args, **options):
+        verb = "à supprimer" if options['dry_run'] else "supprimé(s)"
+        while True:
+            began = time.perf_counter()
+            if not options['dry_run']:
+                expired = expire_upload_sessions()
+                self.stdout.write(f"Envois abandonnés expirés : {expired}")
+            removed = sweep_tombstones(options['batch_size'], options['dry_run'])
+            self.stdout.write(f"Pierres tombales : {removed} fichier(s) {verb}")
+            if options['reconcile']:
+                orphans = reconcile(options['batch_size'], options['grace'], options['dry_run'])
+                self.stdout.write(f"Réconciliation : {orphans} fichier(s) orphelin(s) {verb}")
+            self.stdout.write(f"Balayage terminé en {(time.perf_counter() - began) * 1000:.1f}ms")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,41 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ("Recopie la base SQLite principale vers les réplicas locaux "
+            "(remplace la réplication de PostgreSQL en développement)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Répéter la copie toutes les N secondes (0 : une seule copie)")
+
+    def handle(self, *args, **options):
+        primary = connections['default'].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("La réplication des bases PostgreSQL est assurée par le serveur de base de données.")
+        if not settings.REPLICA_DATABASES:
+            raise CommandError("Aucun réplica configuré (voir SQLITE_REPLICA_PATH).")
+
+        while True:
+            for alias in settings.REPLICA_DATABASES:
+                began = time.perf_counter()
+                self._copy(str(primary['NAME']), str(connections[alias].settings_dict['NAME']))
+                self.stdout.write(f"{alias} synchronisé en {(time.perf_counter() - began) * 1000:.1f}ms")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def _copy(self, source_path, target_path):
+        # L'API de sauvegarde de SQLite produit une copie cohérente même pendant des écritures
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
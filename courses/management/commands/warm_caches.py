@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.warmup import WARM_CACHES_CONCURRENCY, WARM_CACHES_TOP_COURSES, warm_caches
+
+
+class Command(BaseCommand):
+    help = ("Préchauffe les caches après un déploiement : gabarits compilés, plans et quiz des cours "
+            "les plus suivis, pages publiques de l'accueil, du catalogue et de ces cours")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=WARM_CACHES_TOP_COURSES,
+                            help=f"Nombre de cours les plus suivis à préchauffer (défaut: {WARM_CACHES_TOP_COURSES})")
+        parser.add_argument('--concurrency', type=int, default=WARM_CACHES_CONCURRENCY,
+                            help=f"Nombre de threads par étape (défaut: {WARM_CACHES_CONCURRENCY})")
+
+    def handle(self, *args, **options):
+        if options['top'] < 0 or options['concurrency'] < 1:
+            raise CommandError("--top doit être positif et --concurrency au moins 1")
+
+        def report(name, count, seconds):
+            self.stdout.write(f"  {name:<26} {count:>6}  {seconds * 1000:9.0f} ms")
+
+        stages = warm_caches(options['top'], options['concurrency'], report)
+        total = sum(seconds for _, _, seconds in stages)
+        self.stdout.write(self.style.SUCCESS(f"Caches préchauffés en {total * 1000:.0f} ms"))
@@ -0,0 +1,141 @@
+"""
+Suppression différée des fichiers médias.
+
+Supprimer un objet qui porte un `FileField` ou un `ImageField` (contenu de
+module, miniature de cours, certificat, photo de profil...) ne touche pas au
+disque : le signal `post_delete` enregistre une `MediaTombstone` dans la même
+transaction que la suppression. Un module ou un cours entier est donc supprimé
+sans attendre le système de fichiers, et si la transaction est annulée, les
+pierres tombales le sont aussi.
+
+La commande `sweep_media` supprime ensuite les fichiers par lots, en
+épargnant ceux qui sont de nouveau référencés. Avec `--reconcile`, elle
+parcourt aussi le stockage répertoire par répertoire et supprime les
+fichiers qu'aucun champ ne référence (fichiers remplacés, suppressions
+antérieures à ce mécanisme), passé un délai de grâce qui protège les envois
+en cours.
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import FileField
+from django.utils import timezone
+
+from .models import MediaTombstone
+
+# Nombre de fichiers supprimés par lot
+MEDIA_GC_BATCH_SIZE = getattr(settings, 'MEDIA_GC_BATCH_SIZE', 500)
+# Âge minimal d'un fichier non référencé avant sa suppression par la réconciliation (secondes)
+MEDIA_GC_GRACE_SECONDS = getattr(settings, 'MEDIA_GC_GRACE_SECONDS', 60 * 60 * 24)
+# Préfixes du stockage jamais parcourus par la réconciliation
+MEDIA_GC_EXCLUDE = tuple(getattr(settings, 'MEDIA_GC_EXCLUDE', ()))
+
+
+def file_fields():
+    """Couples `(modèle, nom du champ)` de tous les champs fichier du projet"""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, FileField)
+    ]
+
+
+def record_tombstones(instance):
+    """Enregistre une pierre tombale pour chaque fichier de `instance`"""
+    names = [
+        getattr(instance, field.name).name
+        for field in instance._meta.get_fields()
+        if isinstance(field, FileField) and getattr(instance, field.name)
+    ]
+    if names:
+        MediaTombstone.objects.bulk_create([MediaTombstone(name=name) for name in names])
+
+
+def referenced(names):
+    """Parmi `names`, ceux qui sont encore référencés par un champ fichier"""
+    found = set()
+    for model, field_name in file_fields():
+        found.update(
+            model._default_manager.filter(**{f'{field_name}__in': names}).values_list(field_name, flat=True)
+        )
+    return found
+
+
+def _delete(storage, name):
+    try:
+        storage.delete(name)
+    except OSError:
+        # Le fichier sera retrouvé par la prochaine réconciliation
+        return False
+    return True
+
+
+def sweep_tombstones(batch_size=MEDIA_GC_BATCH_SIZE, dry_run=False, storage=default_storage):
+    """
+    Supprime les fichiers des pierres tombales, lot par lot, puis les pierres
+    tombales elles-mêmes. Retourne le nombre de fichiers supprimés.
+    """
+    removed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            MediaTombstone.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'name')[:batch_size]
+        )
+        if not batch:
+            return removed
+        last_id = batch[-1][0]
+        names = {name for _, name in batch}
+        kept = referenced(names)
+        for name in names - kept:
+            if dry_run or _delete(storage, name):
+                removed += 1
+        if not dry_run:
+            MediaTombstone.objects.filter(id__in=[pk for pk, _ in batch]).delete()
+
+
+def walk_storage(storage=default_storage, path=''):
+    """Parcourt le stockage répertoire par répertoire et produit le nom de chaque fichier"""
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield f'{path}{name}'
+    for directory in directories:
+        yield from walk_storage(storage, f'{path}{directory}/')
+
+
+def orphans(storage=default_storage, grace=MEDIA_GC_GRACE_SECONDS):
+    """Fichiers du stockage qu'aucun champ ne référence, plus anciens que `grace` secondes"""
+    names = set()
+    for model, field_name in file_fields():
+        names.update(
+            model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            .values_list(field_name, flat=True).iterator()
+        )
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    for name in walk_storage(storage):
+        if name in names or name.startswith(MEDIA_GC_EXCLUDE):
+            continue
+        if storage.get_modified_time(name) < cutoff:
+            yield name
+
+
+def reconcile(batch_size=MEDIA_GC_BATCH_SIZE, grace=MEDIA_GC_GRACE_SECONDS, dry_run=False, storage=default_storage):
+    """Supprime les fichiers orphelins du stockage. Retourne le nombre de fichiers supprimés."""
+    removed = 0
+    batch = []
+    for name in orphans(storage, grace):
+        batch.append(name)
+        if len(batch) >= batch_size:
+            removed += _remove_orphans(storage, batch, dry_run)
+            batch = []
+    if batch:
+        removed += _remove_orphans(storage, batch, dry_run)
+    return removed
+
+
+def _remove_orphans(storage, names, dry_run):
+    # Un fichier attaché depuis la lecture des références est épargné
+    kept = referenced(names)
+    return sum(1 for name in names if name not in kept and (dry_run or _delete(storage, name)))
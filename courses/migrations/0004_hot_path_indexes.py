@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 15:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_alter_course_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', '-created'], name='course_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['instructor', '-created'], name='course_instructor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progress',
+            index=models.Index(fields=['student', 'course', 'completed'], name='progress_student_course_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2 on 2026-10-19 15:49
+
+from django.db import migrations, models
+
+
+def backfill_completion_bits(apps, schema_editor):
+    """Numérote les modules existants puis reporte les lignes de progression dans les bitmaps"""
+    Module = apps.get_model('courses', 'Module')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Progress = apps.get_model('courses', 'Progress')
+
+    bit_indexes = {}
+    modules = []
+    next_index = {}
+    for module in Module.objects.order_by('course_id', 'order', 'id'):
+        module.bit_index = next_index.get(module.course_id, 0)
+        next_index[module.course_id] = module.bit_index + 1
+        bit_indexes[module.id] = module.bit_index
+        modules.append(module)
+    Module.objects.bulk_update(modules, ['bit_index'], batch_size=1000)
+
+    bitmaps = {}
+    completed = Progress.objects.filter(completed=True).values_list('student_id', 'course_id', 'module_id')
+    for student_id, course_id, module_id in completed.iterator(chunk_size=10000):
+        if module_id in bit_indexes:
+            bitmaps[student_id, course_id] = bitmaps.get((student_id, course_id), 0) | (1 << bit_indexes[module_id])
+
+    enrollments = []
+    for enrollment in Enrollment.objects.only('id', 'student_id', 'course_id').iterator(chunk_size=10000):
+        value = bitmaps.get((enrollment.student_id, enrollment.course_id))
+        if value:
+            enrollment.completion_bits = value.to_bytes((value.bit_length() + 7) // 8, 'little')
+            enrollments.append(enrollment)
+    Enrollment.objects.bulk_update(enrollments, ['completion_bits'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completion_bits',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='bit_index',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_completion_bits, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='module',
+            constraint=models.UniqueConstraint(fields=('course', 'bit_index'), name='module_course_bit_index_uniq'),
+        ),
+    ]
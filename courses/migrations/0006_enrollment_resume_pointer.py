@@ -0,0 +1,56 @@
+# Generated by Django 5.2 on 2026-10-19 15:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_resume_pointer(apps, schema_editor):
+    """Initialise le point de reprise avec la dernière progression consultée"""
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Progress = apps.get_model('courses', 'Progress')
+
+    latest = {}
+    rows = Progress.objects.order_by('last_accessed').values_list(
+        'student_id', 'course_id', 'module_id', 'last_accessed')
+    for student_id, course_id, module_id, last_accessed in rows.iterator(chunk_size=10000):
+        latest[student_id, course_id] = (module_id, last_accessed)
+
+    enrollments = []
+    for enrollment in Enrollment.objects.only('id', 'student_id', 'course_id').iterator(chunk_size=10000):
+        pointer = latest.get((enrollment.student_id, enrollment.course_id))
+        if pointer:
+            enrollment.last_module_id, enrollment.last_accessed = pointer
+            enrollments.append(enrollment)
+    Enrollment.objects.bulk_update(enrollments, ['last_module', 'last_accessed'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_completion_bitmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='last_accessed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='last_item',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='last_module',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='courses.module'),
+        ),
+        migrations.RunPython(backfill_resume_pointer, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['student', '-last_accessed'], name='enrollment_resume_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-19 15:53
+
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    """Calcule le nombre de modules des cours et le nombre de modules complétés des inscriptions"""
+    Course = apps.get_model('courses', 'Course')
+    Module = apps.get_model('courses', 'Module')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+
+    masks = {}
+    counts = {}
+    for course_id, bit_index in Module.objects.values_list('course_id', 'bit_index'):
+        counts[course_id] = counts.get(course_id, 0) + 1
+        if bit_index is not None:
+            masks[course_id] = masks.get(course_id, 0) | (1 << bit_index)
+    courses = []
+    for course in Course.objects.only('id'):
+        course.module_count = counts.get(course.id, 0)
+        courses.append(course)
+    Course.objects.bulk_update(courses, ['module_count'], batch_size=1000)
+
+    enrollments = []
+    for enrollment in Enrollment.objects.only('id', 'course_id', 'completion_bits').iterator(chunk_size=10000):
+        value = int.from_bytes(bytes(enrollment.completion_bits or b''), 'little')
+        enrollment.completed_modules_count = (value & masks.get(enrollment.course_id, 0)).bit_count()
+        if enrollment.completed_modules_count:
+            enrollments.append(enrollment)
+    Enrollment.objects.bulk_update(enrollments, ['completed_modules_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_enrollment_resume_pointer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='module_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_modules_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
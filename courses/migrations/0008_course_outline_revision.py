@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_incremental_completion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='outline_revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-19 15:57
+
+from django.db import migrations
+
+ORDER_GAP = 1024
+
+
+def _renumber(model, parent):
+    """Réattribue des clés espacées dans l'ordre actuel de chaque parent, par lots"""
+    items = []
+    position = {}
+    for item in model.objects.order_by(parent, 'order', 'id').only('id', parent, 'order'):
+        key = getattr(item, parent)
+        position[key] = position.get(key, 0) + 1
+        item.order = position[key] * ORDER_GAP
+        items.append(item)
+    model.objects.bulk_update(items, ['order'], batch_size=1000)
+
+
+def renumber_with_gaps(apps, schema_editor):
+    for model_name, parent in (('Module', 'course_id'), ('TextContent', 'module_id'), ('FileContent', 'module_id'),
+                               ('ImageContent', 'module_id'), ('VideoContent', 'module_id')):
+        _renumber(apps.get_model('courses', model_name), parent)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_course_outline_revision'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='filecontent',
+            options={'ordering': ['order', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='imagecontent',
+            options={'ordering': ['order', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='module',
+            options={'ordering': ['order', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='textcontent',
+            options={'ordering': ['order', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='videocontent',
+            options={'ordering': ['order', 'id']},
+        ),
+        migrations.RunPython(renumber_with_gaps, migrations.RunPython.noop),
+    ]
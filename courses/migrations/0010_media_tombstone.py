@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_sparse_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
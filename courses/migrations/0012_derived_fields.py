@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='objective_items',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='requirement_items',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='textcontent',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='textcontent',
+            name='reading_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='videocontent',
+            name='embed_url',
+            field=models.URLField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='videocontent',
+            name='provider',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_derived_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='multipart_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='parts',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
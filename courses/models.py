@@ -1,8 +1,13 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.conf import settings
 from django.urls import reverse
+from django.utils.safestring import mark_safe
 from django.utils.text import slugify
 
+from .derived import render_text, reading_minutes, video_embed, split_lines, with_derived_fields
+
 User = settings.AUTH_USER_MODEL
 
 class Category(models.Model):
@@ -51,6 +56,13 @@ class Course(models.Model):
     requirements = models.TextField(blank=True, help_text="Connaissances préalables nécessaires pour ce cours")
     objectives = models.TextField(blank=True, help_text="Objectifs d'apprentissage pour ce cours")
     duration = models.PositiveIntegerField(default=0, help_text="Durée estimée du cours en heures")
+    # Nombre de modules, tenu à jour par les signaux de courses.signals
+    module_count = models.PositiveIntegerField(default=0, editable=False)
+    # Révision du plan du cours, incrémentée à chaque changement de structure (voir courses.outline)
+    outline_revision = models.PositiveIntegerField(default=0, editable=False)
+    # Listes dérivées de requirements et objectives, calculées à l'enregistrement (voir courses.derived)
+    requirement_items = models.JSONField(default=list, blank=True, editable=False)
+    objective_items = models.JSONField(default=list, blank=True, editable=False)
     
     def __str__(self):
         return self.title
@@ -58,6 +70,10 @@ class Course(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        self.requirement_items = split_lines(self.requirements)
+        self.objective_items = split_lines(self.objectives)
+        update_fields = with_derived_fields(kwargs.get('update_fields'), 'requirements', ['requirement_items'])
+        kwargs['update_fields'] = with_derived_fields(update_fields, 'objectives', ['objective_items'])
         super().save(*args, **kwargs)
     
     def get_absolute_url(self):
@@ -66,19 +82,26 @@ class Course(models.Model):
     @property
     def requirements_list(self):
         """Retourne une liste des prérequis du cours"""
-        if self.requirements:
-            return [req.strip() for req in self.requirements.split('\n') if req.strip()]
-        return []
+        if self.requirements and not self.requirement_items:
+            # Ligne antérieure aux champs dérivés (voir backfill_derived)
+            return split_lines(self.requirements)
+        return self.requirement_items
     
     @property
     def objectives_list(self):
         """Retourne une liste des objectifs d'apprentissage du cours"""
-        if self.objectives:
-            return [obj.strip() for obj in self.objectives.split('\n') if obj.strip()]
-        return []
+        if self.objectives and not self.objective_items:
+            return split_lines(self.objectives)
+        return self.objective_items
     
     class Meta:
         ordering = ['-created']
+        indexes = [
+            # Catalogue : cours publiés triés par date de création
+            models.Index(fields=['status', '-created'], name='course_status_created_idx'),
+            # Cours d'un instructeur, dans l'ordre par défaut
+            models.Index(fields=['instructor', '-created'], name='course_instructor_created_idx'),
+        ]
 
 class Module(models.Model):
     """Modules qui composent un cours"""
@@ -86,10 +109,24 @@ class Module(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     order = models.PositiveIntegerField(default=0)
+    # Position du module dans le bitmap de complétion des inscriptions.
+    # Attribuée à la création et jamais modifiée, même si les modules sont réordonnés.
+    bit_index = models.PositiveIntegerField(null=True, blank=True, editable=False)
     
     def __str__(self):
         return f"{self.order}. {self.title}"
     
+    def save(self, *args, **kwargs):
+        if self.bit_index is not None:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Verrou sur le cours : deux modules créés en même temps ne reçoivent pas le même index
+            list(Course.objects.select_for_update().filter(id=self.course_id).values_list('id', flat=True))
+            last = Module.objects.filter(course_id=self.course_id).aggregate(
+                last=models.Max('bit_index'))['last']
+            self.bit_index = 0 if last is None else last + 1
+            super().save(*args, **kwargs)
+    
     def get_next_module(self):
         """Retourne le module suivant dans le cours"""
         return Module.objects.filter(course=self.course, order__gt=self.order).order_by('order').first()
@@ -99,7 +136,11 @@ class Module(models.Model):
         return Module.objects.filter(course=self.course, order__lt=self.order).order_by('-order').first()
     
     class Meta:
-        ordering = ['order']
+        # Clés d'ordre espacées (voir courses.ordering) ; l'identifiant départage les égalités
+        ordering = ['order', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'bit_index'], name='module_course_bit_index_uniq'),
+        ]
 
 class Content(models.Model):
     """Contenu abstrait qui peut être de différents types (vidéo, texte, fichier, etc.)"""
@@ -110,7 +151,7 @@ class Content(models.Model):
     
     class Meta:
         abstract = True
-        ordering = ['order']
+        ordering = ['order', 'id']
     
     def __str__(self):
         return self.title
@@ -119,6 +160,20 @@ class TextContent(Content):
     """Contenu de type texte"""
     module = models.ForeignKey(Module, related_name='text_contents', on_delete=models.CASCADE)
     content = models.TextField()
+    # HTML et temps de lecture calculés à l'enregistrement (voir courses.derived)
+    content_html = models.TextField(blank=True, editable=False)
+    reading_minutes = models.PositiveIntegerField(default=0, editable=False)
+    
+    def save(self, *args, **kwargs):
+        self.content_html = render_text(self.content)
+        self.reading_minutes = reading_minutes(self.content)
+        kwargs['update_fields'] = with_derived_fields(
+            kwargs.get('update_fields'), 'content', ['content_html', 'reading_minutes'])
+        super().save(*args, **kwargs)
+    
+    @property
+    def html(self):
+        return mark_safe(self.content_html if self.content_html or not self.content else render_text(self.content))
 
 class FileContent(Content):
     """Contenu de type fichier (PDF, etc.)"""
@@ -136,6 +191,37 @@ class VideoContent(Content):
     module = models.ForeignKey(Module, related_name='video_contents', on_delete=models.CASCADE)
     url = models.URLField()  # URL de vidéo externe (YouTube, Vimeo, etc.)
     duration = models.PositiveIntegerField(help_text="Durée en minutes", default=0)
+    # Fournisseur et URL d'intégration calculés à l'enregistrement (voir courses.derived)
+    provider = models.CharField(max_length=20, blank=True, editable=False)
+    embed_url = models.URLField(blank=True, editable=False)
+    
+    def save(self, *args, **kwargs):
+        self.provider, self.embed_url = video_embed(self.url)
+        kwargs['update_fields'] = with_derived_fields(kwargs.get('update_fields'), 'url', ['provider', 'embed_url'])
+        super().save(*args, **kwargs)
+    
+    @property
+    def player_url(self):
+        return self.embed_url or video_embed(self.url)[1]
+
+class UploadSession(models.Model):
+    """Envoi d'un fichier par morceaux, reprenable (voir courses.uploads)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    module = models.ForeignKey(Module, related_name='upload_sessions', on_delete=models.CASCADE)
+    instructor = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    title = models.CharField(max_length=200)
+    # Fichier final, réservé dès l'ouverture de l'envoi et rempli morceau par morceau
+    file = models.FileField(upload_to='course_files/')
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    # Envoi multipart sur un stockage objet : identifiant et parties `[numéro, ETag]` déjà envoyées
+    multipart_id = models.CharField(max_length=255, blank=True)
+    parts = models.JSONField(default=list, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.file.name} ({self.offset}/{self.size})"
 
 class Enrollment(models.Model):
     """Inscription d'un étudiant à un cours"""
@@ -143,9 +229,21 @@ class Enrollment(models.Model):
     course = models.ForeignKey(Course, related_name='enrollments', on_delete=models.CASCADE)
     enrolled_at = models.DateTimeField(auto_now_add=True)
     completed = models.BooleanField(default=False)
+    # Bitmap des modules complétés, indexé par Module.bit_index (voir courses.completion)
+    completion_bits = models.BinaryField(default=b'')
+    # Nombre de modules complétés encore présents dans le cours (voir courses.completion)
+    completed_modules_count = models.PositiveIntegerField(default=0, editable=False)
+    # Point de reprise : dernier module et dernier contenu consultés (voir courses.resume)
+    last_module = models.ForeignKey(Module, related_name='+', null=True, blank=True, on_delete=models.SET_NULL)
+    last_item = models.CharField(max_length=32, blank=True)
+    last_accessed = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         unique_together = ['student', 'course']
+        indexes = [
+            models.Index(fields=['student', '-last_accessed'], name='enrollment_resume_idx',
+                         condition=models.Q(completed=False)),
+        ]
     
     def __str__(self):
         return f"{self.student.username} enrolled in {self.course.title}"
@@ -160,6 +258,17 @@ class Progress(models.Model):
     
     class Meta:
         unique_together = ['student', 'module']
+        indexes = [
+            models.Index(fields=['student', 'course', 'completed'], name='progress_student_course_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username}'s progress in {self.module.title}"
+
+class MediaTombstone(models.Model):
+    """Fichier média à supprimer du stockage, enregistré avec la suppression de son objet (voir courses.media_gc)"""
+    name = models.CharField(max_length=255)
+    created = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.name
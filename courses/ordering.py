@@ -0,0 +1,41 @@
+"""
+Ordre des éléments ordonnés : modules, contenus et questions.
+
+Les clés d'ordre sont espacées de `ORDER_GAP`. Un nouvel élément reçoit la
+plus grande clé de ses voisins plus l'écart (un MAX servi par l'index de la clé
+étrangère, au lieu d'un COUNT), une suppression laisse simplement un trou, et
+un réordonnancement complet est appliqué en un seul UPDATE. Les gabarits
+affichent la position (`forloop.counter`, `OutlineModule.position`) et jamais
+la clé elle-même.
+"""
+from django.conf import settings
+from django.db.models import Case, Max, PositiveIntegerField, Value, When
+
+# Écart entre deux clés d'ordre consécutives
+ORDER_GAP = getattr(settings, 'ORDER_GAP', 1024)
+
+
+def next_order(queryset):
+    """Clé d'ordre placée après le dernier élément de `queryset`"""
+    last = queryset.aggregate(last=Max('order'))['last']
+    return ORDER_GAP if last is None else last + ORDER_GAP
+
+
+def apply_order(queryset, ids):
+    """
+    Applique une permutation complète des éléments de `queryset` en un seul
+    UPDATE. `ids` doit contenir chaque élément exactement une fois ; lève
+    ValueError sinon. Retourne le nombre de lignes mises à jour.
+    """
+    try:
+        ids = [int(pk) for pk in ids]
+    except (TypeError, ValueError):
+        raise ValueError("Identifiants invalides")
+    if len(set(ids)) != len(ids) or set(ids) != set(queryset.values_list('id', flat=True)):
+        raise ValueError("La liste doit contenir chaque élément exactement une fois")
+    if not ids:
+        return 0
+    return queryset.filter(id__in=ids).update(order=Case(
+        *[When(id=pk, then=Value(position * ORDER_GAP)) for position, pk in enumerate(ids, start=1)],
+        output_field=PositiveIntegerField()
+    ))
@@ -0,0 +1,158 @@
+"""
+Plan de cours immuable et versionné.
+
+Le plan décrit la structure d'un cours : modules ordonnés, contenus de chaque
+module (type, titre, durée des vidéos), identifiants des quiz et durée totale
+des vidéos. Il sert à toute la navigation : sommaire de `course_detail`, barres
+latérales de `course_learn` et `module_content`, liens précédent/suivant.
+
+Chaque modification de la structure incrémente `Course.outline_revision`
+(voir `courses.signals`). Le plan est construit une fois par révision, puis
+gardé dans le cache à deux niveaux (famille `course:outline`, gardée en
+mémoire par chaque processus) sous une clé qui contient la révision : un plan
+périmé n'est jamais relu et n'a pas besoin d'être supprimé.
+"""
+from dataclasses import dataclass
+from functools import cached_property
+
+from django.conf import settings
+from django.db.models import F
+
+from elearning_platform.cache import single_flight
+from elearning_platform.pagecache import invalidate_pages
+from .models import Course, Module, TextContent, FileContent, ImageContent, VideoContent
+
+# Durée de vie d'un plan dans le cache partagé (secondes)
+COURSE_OUTLINE_TIMEOUT = getattr(settings, 'COURSE_OUTLINE_TIMEOUT', 60 * 60 * 24)
+
+CONTENT_MODELS = (
+    ('text', TextContent),
+    ('file', FileContent),
+    ('image', ImageContent),
+    ('video', VideoContent),
+)
+
+@dataclass(frozen=True)
+class OutlineItem:
+    kind: str
+    id: int
+    title: str
+    duration: int = 0
+
+
+@dataclass(frozen=True)
+class OutlineModule:
+    id: int
+    title: str
+    description: str
+    order: int
+    position: int
+    bit_index: int
+    items: tuple = ()
+    quiz_ids: tuple = ()
+
+    @property
+    def counts(self):
+        """Nombre de contenus par type, par exemple `counts['video']`"""
+        counts = {kind: 0 for kind, _ in CONTENT_MODELS}
+        for item in self.items:
+            counts[item.kind] += 1
+        return counts
+
+    @property
+    def item_count(self):
+        return len(self.items)
+
+    @property
+    def video_minutes(self):
+        return sum(item.duration for item in self.items if item.kind == 'video')
+
+
+@dataclass(frozen=True)
+class CourseOutline:
+    course_id: int
+    revision: int
+    modules: tuple = ()
+
+    @cached_property
+    def _positions(self):
+        return {module.id: index for index, module in enumerate(self.modules)}
+
+    def __iter__(self):
+        return iter(self.modules)
+
+    def __len__(self):
+        return len(self.modules)
+
+    def __bool__(self):
+        return bool(self.modules)
+
+    def module(self, module_id):
+        index = self._positions.get(module_id)
+        return None if index is None else self.modules[index]
+
+    def previous(self, module_id):
+        index = self._positions.get(module_id)
+        return self.modules[index - 1] if index else None
+
+    def next(self, module_id):
+        index = self._positions.get(module_id)
+        if index is None or index + 1 >= len(self.modules):
+            return None
+        return self.modules[index + 1]
+
+    @property
+    def total_video_minutes(self):
+        return sum(module.video_minutes for module in self.modules)
+
+
+def outline_key(course_id, revision):
+    return f'course:outline:{course_id}:{revision}'
+
+
+def build_course_outline(course_id, revision):
+    """Construit le plan d'un cours : une requête par type de contenu, plus modules et quiz"""
+    from quizzes.models import Quiz
+
+    items = {}
+    for kind, model in CONTENT_MODELS:
+        columns = ['id', 'module_id', 'title'] + (['duration'] if kind == 'video' else [])
+        rows = model.objects.filter(module__course_id=course_id).order_by('order', 'id').values_list(*columns)
+        for row in rows:
+            items.setdefault(row[1], []).append(
+                OutlineItem(kind, row[0], row[2], row[3] if kind == 'video' else 0)
+            )
+
+    quiz_ids = {}
+    for quiz_id, module_id in Quiz.objects.filter(module__course_id=course_id).order_by('id').values_list('id', 'module_id'):
+        quiz_ids.setdefault(module_id, []).append(quiz_id)
+
+    modules = Module.objects.filter(course_id=course_id).order_by('order', 'id').values_list(
+        'id', 'title', 'description', 'order', 'bit_index')
+    return CourseOutline(
+        course_id=course_id,
+        revision=revision,
+        modules=tuple(
+            OutlineModule(
+                id=module_id, title=title, description=description, order=order,
+                position=position, bit_index=bit_index,
+                items=tuple(items.get(module_id, ())), quiz_ids=tuple(quiz_ids.get(module_id, ()))
+            )
+            for position, (module_id, title, description, order, bit_index) in enumerate(modules, start=1)
+        ),
+    )
+
+
+def get_course_outline(course):
+    """Retourne le plan d'un cours pour sa révision courante"""
+    return single_flight(
+        outline_key(course.id, course.outline_revision),
+        lambda: build_course_outline(course.id, course.outline_revision),
+        COURSE_OUTLINE_TIMEOUT
+    )
+
+
+def bump_outline_revision(course_id):
+    """Rend obsolètes les plans en cache d'un cours, et les pages publiques qui les affichent"""
+    Course.objects.filter(id=course_id).update(outline_revision=F('outline_revision') + 1)
+    invalidate_pages()
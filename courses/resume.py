@@ -0,0 +1,56 @@
+"""
+Point de reprise par inscription.
+
+Chaque consultation de `module_content` et chaque complétion de module
+déplace le pointeur de l'inscription (dernier module, dernier contenu,
+horodatage) par un seul UPDATE. La liste « Continuer l'apprentissage » est
+ensuite lue en une requête servie par l'index partiel `enrollment_resume_idx`.
+"""
+import re
+
+from django.urls import reverse
+from django.utils import timezone
+
+from .dashboard import invalidate_student_dashboard
+from .models import Enrollment
+
+# Identifiant d'un contenu dans la page du module, par exemple « video-12 »
+ITEM_PATTERN = re.compile(r'^(text|file|image|video)-\d+$')
+
+
+def clean_item(item):
+    item = (item or '').strip()
+    return item if ITEM_PATTERN.match(item) else ''
+
+
+def record_visit(enrollment, module_id, item=''):
+    """Déplace le point de reprise de l'inscription vers un module et un contenu"""
+    Enrollment.objects.filter(id=enrollment.id).update(
+        last_module_id=module_id,
+        last_item=clean_item(item),
+        last_accessed=timezone.now()
+    )
+    # UPDATE ne déclenche aucun signal : le tableau de bord affiche la dernière activité
+    invalidate_student_dashboard(enrollment.student_id)
+
+
+def resume_url(enrollment):
+    """Adresse à laquelle l'étudiant reprend le cours"""
+    if enrollment.last_module_id is None:
+        return reverse('courses:course_learn', args=[enrollment.course.slug])
+    url = reverse('courses:module_content', args=[enrollment.course.slug, enrollment.last_module_id])
+    if enrollment.last_item:
+        url += f'?item={enrollment.last_item}#{enrollment.last_item}'
+    return url
+
+
+def continue_learning(student_id, limit=6):
+    """Cours en cours de l'étudiant, du plus récemment consulté au plus ancien"""
+    enrollments = list(
+        Enrollment.objects.filter(student_id=student_id, completed=False, last_accessed__isnull=False)
+        .select_related('course', 'last_module')
+        .order_by('-last_accessed')[:limit]
+    )
+    for enrollment in enrollments:
+        enrollment.resume_url = resume_url(enrollment)
+    return enrollments
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from certificates.models import Certificate
+from elearning_platform.cache import invalidate_on
+from elearning_platform.pagecache import invalidate_pages, invalidate_paths
+from .completion import set_completed, module_added, module_removed
+from .dashboard import course_dashboard_keys, dashboard_key, instructor_dashboard_keys, invalidate_course_dashboards
+from .media_gc import file_fields, record_tombstones
+from .models import (
+    Category, Course, Module, Enrollment, Progress, TextContent, FileContent, ImageContent, VideoContent
+)
+from .outline import bump_outline_revision
+
+
+# Toute écriture touchant un étudiant invalide son tableau de bord
+invalidate_on(Progress, Enrollment, Certificate, keys=lambda instance: [dashboard_key(instance.student_id)])
+# Le tableau de bord affiche le titre et la miniature du cours et le nom de l'instructeur
+invalidate_on(Course, keys=lambda course: course_dashboard_keys(course.pk))
+
+# Champs de l'instructeur affichés dans les tableaux de bord de ses étudiants
+INSTRUCTOR_DISPLAY_FIELDS = {'first_name', 'last_name'}
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def instructor_changed(sender, instance, update_fields=None, **kwargs):
+    """Invalide les tableaux de bord des étudiants quand le nom affiché de l'instructeur peut changer"""
+    # La connexion n'enregistre que last_login : les tableaux de bord restent valides
+    if not instance.is_instructor or (update_fields and INSTRUCTOR_DISPLAY_FIELDS.isdisjoint(update_fields)):
+        return
+    cache.delete_many(instructor_dashboard_keys(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Course)
+def public_page_changed(sender, **kwargs):
+    """Les pages publiques en cache affichent le catalogue"""
+    # Les changements de plan passent par bump_outline_revision, qui invalide aussi ces pages
+    invalidate_pages()
+
+
+@receiver([post_save, post_delete], sender=Certificate)
+def certificate_changed(sender, instance, **kwargs):
+    """Seules les pages de vérification du certificat l'affichent : le reste du cache est conservé"""
+    certificate_id = str(instance.certificate_id)
+    invalidate_paths(
+        reverse('certificates:certificate_verify', args=[certificate_id]),
+        f"{reverse('certificates:certificate_verify_form')}?{urlencode({'certificate_id': certificate_id})}",
+    )
+
+
+def _deleted_directly(origin, model):
+    """Vrai si la suppression vise ce modèle, et non une suppression en cascade d'un parent"""
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+@receiver(post_save, sender=Module)
+def module_changed(sender, instance, created, **kwargs):
+    bump_outline_revision(instance.course_id)
+    # Seul le nombre de modules apparaît dans le tableau de bord
+    if created:
+        module_added(instance.course_id)
+        invalidate_course_dashboards(instance.course_id)
+
+
+@receiver(post_delete, sender=Module)
+def module_deleted(sender, instance, origin=None, **kwargs):
+    # La suppression d'un cours entier n'a pas à recompter ses inscriptions
+    if _deleted_directly(origin, Module):
+        bump_outline_revision(instance.course_id)
+        module_removed(instance.course_id, instance.bit_index)
+        invalidate_course_dashboards(instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=TextContent)
+@receiver([post_save, post_delete], sender=FileContent)
+@receiver([post_save, post_delete], sender=ImageContent)
+@receiver([post_save, post_delete], sender=VideoContent)
+def content_changed(sender, instance, origin=None, **kwargs):
+    """Un contenu ajouté, modifié ou supprimé change le plan du cours"""
+    if origin is not None and not _deleted_directly(origin, sender):
+        # Suppression en cascade : le module ou le cours supprimé a déjà invalidé le plan
+        return
+    course_id = Module.objects.filter(id=instance.module_id).values_list('course_id', flat=True).first()
+    if course_id:
+        bump_outline_revision(course_id)
+
+
+@receiver(post_save, sender=Progress)
+def progress_saved(sender, instance, created, **kwargs):
+    """Double écriture : reporte la complétion dans le bitmap de l'inscription"""
+    if created and not instance.completed:
+        return
+    set_completed(instance.student_id, instance.course_id, instance.module.bit_index, instance.completed)
+
+
+@receiver(post_delete, sender=Progress)
+def progress_deleted(sender, instance, origin=None, **kwargs):
+    # Lors de la suppression d'un module, module_removed met les compteurs à jour en une passe
+    if instance.completed and _deleted_directly(origin, Progress):
+        set_completed(instance.student_id, instance.course_id, instance.module.bit_index, False)
+
+
+def media_deleted(sender, instance, **kwargs):
+    """Les fichiers d'un objet supprimé seront effacés par `sweep_media`, après validation"""
+    record_tombstones(instance)
+
+
+# Un récepteur par modèle à fichiers : les autres modèles gardent les suppressions rapides en cascade
+for model in {model for model, _ in file_fields()}:
+    post_delete.connect(media_deleted, sender=model, dispatch_uid=f'media_gc:{model._meta.label}')
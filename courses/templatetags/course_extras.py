@@ -1,6 +1,7 @@
 from django import template
 import pprint
-import re
+
+from courses.derived import video_embed
 
 register = template.Library()
 
@@ -32,30 +33,10 @@ def get_item(dictionary, key):
 @register.filter
 def youtube_embed_url(url):
     """
-    Convertit une URL YouTube normale en URL d'intégration
+    Convertit une URL YouTube (ou Vimeo) en URL d'intégration.
+    Les vidéos enregistrées exposent déjà cette URL : `content.player_url`.
     """
-    if not url:
-        return url
-    
-    # Pattern pour youtube.com/watch?v=VIDEO_ID
-    youtube_watch_pattern = r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]+)'
-    # Pattern pour youtu.be/VIDEO_ID
-    youtube_short_pattern = r'(?:https?://)?(?:www\.)?youtu\.be/([a-zA-Z0-9_-]+)'
-    
-    # Vérifier le format youtube.com/watch?v=
-    match = re.search(youtube_watch_pattern, url)
-    if match:
-        video_id = match.group(1)
-        return f'https://www.youtube.com/embed/{video_id}'
-    
-    # Vérifier le format youtu.be/
-    match = re.search(youtube_short_pattern, url)
-    if match:
-        video_id = match.group(1)
-        return f'https://www.youtube.com/embed/{video_id}'
-    
-    # Si ce n'est pas YouTube, retourner l'URL originale
-    return url
+    return video_embed(url)[1]
 
 @register.filter
 def is_youtube_url(url):
@@ -1,3 +1,262 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from certificates.models import Certificate
+from elearning_platform.benchmarks import scratch_caches
+from .completion import is_completed
+from .dashboard import dashboard_key, get_student_dashboard
+from .models import Category, Course, Enrollment, FileContent, Module, Progress, UploadSession
+from .ordering import ORDER_GAP, apply_order, next_order
+from .resume import record_visit
+from .uploads import ChecksumMismatch, OffsetMismatch, UploadError, append_chunk, start_upload
+
+User = get_user_model()
+
+
+def make_course(instructor, title='Django avancé', modules=0):
+    category = Category.objects.get_or_create(name='Programmation')[0]
+    course = Course.objects.create(title=title, overview='Présentation', category=category,
+                                   instructor=instructor, status='published')
+    for number in range(modules):
+        Module.objects.create(course=course, title=f'Module {number + 1}',
+                              order=next_order(course.modules.all()))
+    return course
+
+
+def checksum(data):
+    return f"sha256 {base64.b64encode(hashlib.sha256(data).digest()).decode()}"
+
+
+@override_settings(CACHES=scratch_caches())
+class CacheTestCase(TestCase):
+    """Caches en mémoire du processus, vidés avant chaque test"""
+
+    def setUp(self):
+        cache.clear()
+
+
+class OrderingTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        instructor = User.objects.create_user('prof', password='x', is_instructor=True)
+        self.course = make_course(instructor, modules=3)
+        self.modules = self.course.modules.all()
+
+    def test_next_order_leaves_gaps(self):
+        self.assertEqual([module.order for module in self.modules], [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP])
+        self.assertEqual(next_order(Module.objects.none()), ORDER_GAP)
+
+    def test_apply_order_renumbers_in_one_update(self):
+        first, second, third = [module.id for module in self.modules]
+        with self.assertNumQueries(2):
+            self.assertEqual(apply_order(self.modules, [third, first, str(second)]), 3)
+        self.assertEqual(list(self.course.modules.values_list('id', flat=True)), [third, first, second])
+
+    def test_apply_order_rejects_incomplete_permutations(self):
+        first, second, third = [module.id for module in self.modules]
+        for ids in ([first, second], [first, second, third, third], [first, second, third + 1000],
+                    [first, second, 'x'], None):
+            with self.subTest(ids=ids), self.assertRaises(ValueError):
+                apply_order(self.modules, ids)
+        self.assertEqual(list(self.course.modules.values_list('id', flat=True)), [first, second, third])
+
+
+class UploadTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.instructor = User.objects.create_user('prof', password='x', is_instructor=True)
+        self.module = make_course(self.instructor, modules=1).modules.get()
+        self.data = b'0123456789' * 10
+        self.session = start_upload(self.module, self.instructor, 'Support', 'support.pdf', len(self.data))
+
+    def append(self, offset, data, header=None):
+        return append_chunk(self.session.id, offset, io.BytesIO(data), len(data), header or checksum(data))
+
+    def test_chunks_are_assembled_into_a_file_content(self):
+        session, content = self.append(0, self.data[:60])
+        self.assertEqual((session.offset, content), (60, None))
+        session, content = self.append(60, self.data[60:])
+        self.assertIsInstance(content, FileContent)
+        with content.file.open('rb') as uploaded:
+            self.assertEqual(uploaded.read(), self.data)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_wrong_offset_is_refused(self):
+        self.append(0, self.data[:60])
+        with self.assertRaises(OffsetMismatch) as raised:
+            self.append(0, self.data[:60])
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(UploadSession.objects.get().offset, 60)
+
+    def test_bad_checksum_leaves_offset_unchanged(self):
+        with self.assertRaises(ChecksumMismatch) as raised:
+            self.append(0, self.data[:60], checksum(b'autre chose'))
+        self.assertEqual(raised.exception.status, 460)
+        self.assertEqual(UploadSession.objects.get().offset, 0)
+
+    def test_truncated_chunk_is_refused(self):
+        with self.assertRaises(ChecksumMismatch):
+            append_chunk(self.session.id, 0, io.BytesIO(self.data[:30]), 60, checksum(self.data[:60]))
+        self.assertEqual(UploadSession.objects.get().offset, 0)
+
+    def test_invalid_chunks_and_headers(self):
+        for offset, data, header in ((0, self.data + b'!', None), (0, self.data[:10], 'sha256 pas-du-base64'),
+                                     (0, self.data[:10], 'crc32 AAAA')):
+            with self.subTest(header=header), self.assertRaises(UploadError):
+                self.append(offset, data, header)
+        with self.assertRaises(UploadError):
+            start_upload(self.module, self.instructor, 'Vide', 'vide.pdf', 0)
+
+
+class CompletionTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.instructor = User.objects.create_user('prof', password='x', is_instructor=True)
+        self.student = User.objects.create_user('alice', password='x', is_student=True)
+        self.course = make_course(self.instructor, modules=3)
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+
+    def complete(self, module):
+        Progress.objects.update_or_create(student=self.student, course=self.course, module=module,
+                                          defaults={'completed': True})
+
+    def test_bit_indexes_are_stable(self):
+        modules = list(self.course.modules.all())
+        self.assertEqual([module.bit_index for module in modules], [0, 1, 2])
+        modules[1].delete()
+        added = Module.objects.create(course=self.course, title='Nouveau', order=next_order(self.course.modules.all()))
+        self.assertEqual(added.bit_index, 3)
+
+    def test_completing_every_module_issues_the_certificate(self):
+        modules = list(self.course.modules.all())
+        with self.captureOnCommitCallbacks(execute=True):
+            for module in modules[:2]:
+                self.complete(module)
+        self.enrollment.refresh_from_db()
+        self.assertTrue(is_completed(self.enrollment.completion_bits, modules[1].bit_index))
+        self.assertEqual((self.enrollment.completed_modules_count, self.enrollment.completed), (2, False))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.complete(modules[2])
+        self.enrollment.refresh_from_db()
+        self.assertTrue(self.enrollment.completed)
+        self.assertTrue(Certificate.objects.filter(student=self.student, course=self.course).exists())
+
+    def test_viewing_a_module_does_not_write_progress(self):
+        module = self.course.modules.first()
+        self.client.force_login(self.student)
+        url = reverse('courses:module_content', args=[self.course.slug, module.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse(Progress.objects.exists())
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.last_module_id, module.id)
+
+
+class DashboardInvalidationTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.instructor = User.objects.create_user('prof', password='x', is_instructor=True)
+        self.student = User.objects.create_user('alice', password='x', is_student=True)
+        self.course = make_course(self.instructor, modules=2)
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        get_student_dashboard(self.student.id)
+
+    def assertInvalidated(self):
+        self.assertIsNone(cache.get(dashboard_key(self.student.id)))
+
+    def test_dashboard_is_cached(self):
+        self.assertIsNotNone(cache.get(dashboard_key(self.student.id)))
+        with self.assertNumQueries(0):
+            get_student_dashboard(self.student.id)
+
+    def test_visit_invalidates(self):
+        record_visit(self.enrollment, self.course.modules.first().id, 'text-1')
+        self.assertInvalidated()
+
+    def test_progress_invalidates(self):
+        Progress.objects.create(student=self.student, course=self.course, module=self.course.modules.first(),
+                                completed=True)
+        self.assertInvalidated()
+
+    def test_course_edit_invalidates(self):
+        self.course.title = 'Django expert'
+        self.course.save()
+        self.assertInvalidated()
+        self.assertEqual(get_student_dashboard(self.student.id)['enrollments'][0]['course']['title'],
+                         'Django expert')
+
+    def test_module_added_invalidates(self):
+        Module.objects.create(course=self.course, title='Bonus', order=next_order(self.course.modules.all()))
+        self.assertInvalidated()
+        self.assertEqual(get_student_dashboard(self.student.id)['enrollments'][0]['module_total'], 3)
+
+    def test_other_course_edit_keeps_dashboard(self):
+        make_course(self.instructor, title='Autre cours')
+        self.assertIsNotNone(cache.get(dashboard_key(self.student.id)))
+
+
+@override_settings(CACHES=scratch_caches())
+class CompletionBitmapMigrationTests(TransactionTestCase):
+    """Report des lignes Progress existantes dans les bitmaps (0005_completion_bitmap)"""
+    migrate_from = [('courses', '0004_hot_path_indexes')]
+    migrate_to = [('courses', '0005_completion_bitmap')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        self.apps = executor.loader.project_state(self.migrate_from).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_backfill_completion_bits(self):
+        User = self.apps.get_model('accounts', 'User')
+        Category = self.apps.get_model('courses', 'Category')
+        Course = self.apps.get_model('courses', 'Course')
+        Module = self.apps.get_model('courses', 'Module')
+        Enrollment = self.apps.get_model('courses', 'Enrollment')
+        Progress = self.apps.get_model('courses', 'Progress')
+
+        instructor = User.objects.create(username='prof', is_instructor=True)
+        student = User.objects.create(username='alice', is_student=True)
+        category = Category.objects.create(name='Programmation', slug='programmation')
+        course = Course.objects.create(title='Django', slug='django', overview='', category=category,
+                                       instructor=instructor)
+        # Ordre d'affichage différent de l'ordre de création
+        modules = [Module.objects.create(course=course, title=f'Module {order}', order=order)
+                   for order in (2, 1, 3, 4, 5, 6, 7, 8, 9)]
+        enrollment = Enrollment.objects.create(student=student, course=course)
+        untouched = Enrollment.objects.create(student=instructor, course=course)
+        for module in (modules[0], modules[8]):
+            Progress.objects.create(student=student, course=course, module=module, completed=True)
+        Progress.objects.create(student=student, course=course, module=modules[1], completed=False)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        Module = apps.get_model('courses', 'Module')
+        Enrollment = apps.get_model('courses', 'Enrollment')
+
+        bit_indexes = dict(Module.objects.values_list('order', 'bit_index'))
+        self.assertEqual(bit_indexes, {order: order - 1 for order in range(1, 10)})
+        # Modules d'ordre 2 (bit 1) et 9 (bit 8) complétés, sur deux octets
+        self.assertEqual(bytes(Enrollment.objects.get(id=enrollment.id).completion_bits), bytes([0b10, 0b1]))
+        self.assertEqual(bytes(Enrollment.objects.get(id=untouched.id).completion_bits), b'')
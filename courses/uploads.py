@@ -0,0 +1,198 @@
+"""
+Envoi des fichiers de cours par morceaux, reprenable.
+
+Le protocole suit tus : l'envoi est ouvert avec la taille totale du fichier,
+chaque morceau est envoyé par `PATCH` avec son décalage (`Upload-Offset`) et
+son empreinte (`Upload-Checksum: sha256 <base64>`), et `HEAD` rend le
+décalage atteint pour reprendre après une coupure.
+
+Le nom définitif du fichier est réservé dans le stockage à l'ouverture.
+Chaque morceau est d'abord reçu et vérifié dans un tampon (en mémoire jusqu'à
+`BLOCK_SIZE`, sur disque au-delà), hors de toute transaction : un client lent
+ne bloque pas les autres écritures de la base. Le morceau est ensuite réservé
+en avançant le décalage par comparaison-échange (`UPDATE ... WHERE offset =`),
+puis écrit directement à sa place dans le fichier définitif, sans recopie
+finale. Si l'écriture échoue, le décalage est rétabli. Une fois le dernier
+octet reçu, le fichier est rattaché à un `FileContent` et la session est
+supprimée.
+
+Sur un stockage objet qui propose l'envoi multipart (`S3Storage`, voir
+elearning_platform/s3.py), chaque morceau est envoyé comme une partie, et
+l'objet est assemblé par le service au dernier morceau. Le service impose des
+parties d'au moins 5 Mio, sauf la dernière.
+
+Les sessions abandonnées expirent après `UPLOAD_SESSION_TTL` ; leur fichier
+partiel est alors confié à `sweep_media` (voir courses.media_gc).
+"""
+import base64
+import hashlib
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from elearning_platform.s3 import MIN_PART_SIZE
+
+from .models import FileContent, UploadSession
+from .ordering import next_order
+
+# Taille maximale d'un morceau (octets)
+UPLOAD_CHUNK_SIZE = getattr(settings, 'UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+# Taille maximale d'un fichier envoyé par morceaux (octets)
+UPLOAD_MAX_SIZE = getattr(settings, 'UPLOAD_MAX_SIZE', 20 * 1024 ** 3)
+# Durée de vie d'un envoi sans nouveau morceau (secondes)
+UPLOAD_SESSION_TTL = getattr(settings, 'UPLOAD_SESSION_TTL', 60 * 60 * 24)
+
+CHECKSUM_ALGORITHMS = ('sha256', 'sha1', 'md5')
+# Taille des blocs lus depuis la requête et écrits sur le disque
+BLOCK_SIZE = 1024 * 1024
+
+
+def multipart(storage=default_storage):
+    """Vrai si le stockage assemble les fichiers à partir de parties envoyées séparément"""
+    return hasattr(storage, 'start_multipart')
+
+
+class UploadError(Exception):
+    """Morceau refusé ; `status` est le code HTTP à renvoyer"""
+    status = 400
+
+
+class OffsetMismatch(UploadError):
+    status = 409
+
+
+class ChecksumMismatch(UploadError):
+    # Code défini par l'extension « checksum » de tus
+    status = 460
+
+
+def start_upload(module, instructor, title, filename, size):
+    """Ouvre un envoi et réserve le nom définitif du fichier dans le stockage"""
+    if not 0 < size <= UPLOAD_MAX_SIZE:
+        raise UploadError("Taille de fichier invalide")
+    field = UploadSession._meta.get_field('file')
+    name = default_storage.save(field.generate_filename(None, filename), ContentFile(b''),
+                                max_length=field.max_length)
+    multipart_id = default_storage.start_multipart(name) if multipart() else ''
+    return UploadSession.objects.create(module=module, instructor=instructor, title=title,
+                                        file=name, size=size, multipart_id=multipart_id)
+
+
+def parse_checksum(header):
+    """Décode un en-tête `Upload-Checksum` en `(algorithme, empreinte)`"""
+    try:
+        algorithm, encoded = header.split(' ', 1)
+        digest = base64.b64decode(encoded, validate=True)
+    except ValueError:
+        raise UploadError("En-tête Upload-Checksum invalide")
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise UploadError("Algorithme d'empreinte non pris en charge")
+    return algorithm, digest
+
+
+def append_chunk(upload_id, offset, stream, length, checksum):
+    """
+    Écrit un morceau de `length` octets lus depuis `stream` au décalage
+    `offset`. Retourne `(session, contenu)` ; le contenu n'est pas None quand
+    le morceau termine le fichier.
+    """
+    algorithm, expected = parse_checksum(checksum)
+    session = UploadSession.objects.get(id=upload_id)
+    if offset != session.offset:
+        raise OffsetMismatch(f"Décalage attendu : {session.offset}")
+    if not 0 < length <= UPLOAD_CHUNK_SIZE or offset + length > session.size:
+        raise UploadError("Taille de morceau invalide")
+    if session.multipart_id and length < MIN_PART_SIZE and offset + length < session.size:
+        raise UploadError(f"Les morceaux doivent faire au moins {MIN_PART_SIZE} octets, sauf le dernier")
+
+    with _receive(stream, length, algorithm, expected) as chunk:
+        # Réservation du morceau : de deux envois au même décalage, un seul avance la session
+        parts = session.parts + ([[len(session.parts) + 1, None]] if session.multipart_id else [])
+        claimed = UploadSession.objects.filter(id=upload_id, offset=offset).update(
+            offset=offset + length, parts=parts, updated=timezone.now()
+        )
+        if not claimed:
+            current = UploadSession.objects.filter(id=upload_id).values_list('offset', flat=True).first()
+            if current is None:
+                raise UploadSession.DoesNotExist
+            raise OffsetMismatch(f"Décalage attendu : {current}")
+        try:
+            if session.multipart_id:
+                parts[-1] = default_storage.upload_part(session.file.name, session.multipart_id,
+                                                        parts[-1][0], chunk.read())
+                UploadSession.objects.filter(id=upload_id, offset=offset + length).update(parts=parts)
+            else:
+                _write_chunk(session.file.name, offset, chunk)
+        except BaseException:
+            UploadSession.objects.filter(id=upload_id, offset=offset + length).update(
+                offset=offset, parts=session.parts
+            )
+            raise
+
+    session.offset, session.parts = offset + length, parts
+    if session.offset < session.size:
+        return session, None
+    return session, _finish(session)
+
+
+def _receive(stream, length, algorithm, expected):
+    """Lit et vérifie un morceau dans un tampon, rembobiné pour l'écriture"""
+    digest = hashlib.new(algorithm)
+    chunk = tempfile.SpooledTemporaryFile(max_size=BLOCK_SIZE)
+    remaining = length
+    while remaining:
+        block = stream.read(min(BLOCK_SIZE, remaining))
+        if not block:
+            break
+        digest.update(block)
+        chunk.write(block)
+        remaining -= len(block)
+    if remaining or digest.digest() != expected:
+        chunk.close()
+        raise ChecksumMismatch("Morceau incomplet ou empreinte invalide")
+    chunk.seek(0)
+    return chunk
+
+
+def _write_chunk(name, offset, chunk):
+    with default_storage.open(name, 'r+b') as destination:
+        destination.seek(offset)
+        while block := chunk.read(BLOCK_SIZE):
+            destination.write(block)
+
+
+def _finish(session):
+    if session.multipart_id:
+        default_storage.complete_multipart(session.file.name, session.multipart_id, session.parts)
+    # Le fichier est déjà à sa place : le contenu reprend simplement son nom
+    with transaction.atomic():
+        content = FileContent(module_id=session.module_id, title=session.title,
+                              order=next_order(FileContent.objects.filter(module_id=session.module_id)))
+        content.file.name = session.file.name
+        content.save()
+        # La pierre tombale de la session est ignorée : le fichier est référencé par le contenu
+        session.delete()
+    return content
+
+
+def discard_upload(session):
+    """Abandonne un envoi ; son fichier partiel est balayé par sweep_media"""
+    if session.multipart_id:
+        # Les parties déjà envoyées sont stockées (et facturées) jusqu'à l'abandon explicite
+        default_storage.abort_multipart(session.file.name, session.multipart_id)
+    session.delete()
+
+
+def expire_upload_sessions(ttl=UPLOAD_SESSION_TTL):
+    """Supprime les envois abandonnés ; leurs fichiers partiels sont balayés par sweep_media"""
+    expired = UploadSession.objects.filter(updated__lt=timezone.now() - timedelta(seconds=ttl))
+    count = 0
+    for session in expired.iterator():
+        discard_upload(session)
+        count += 1
+    return count
@@ -16,6 +16,7 @@ urlpatterns = [
     # Apprentissage et contenu du cours
     path('course/<slug:slug>/learn/', views.course_learn, name='course_learn'),
     path('course/<slug:slug>/module/<int:module_id>/', views.module_content, name='module_content'),
+    path('course/<slug:slug>/module/<int:module_id>/resume/', views.module_resume, name='module_resume'),
     path('course/<slug:slug>/complete/', views.course_complete, name='course_complete'),
     
     path('course/<int:course_id>/module/<int:module_id>/delete/', views.delete_module, name='delete_module'),
@@ -29,8 +30,12 @@ urlpatterns = [
     
     # Gestion des modules et contenus (instructeurs)
     path('instructor/course/<slug:slug>/modules/', views.course_modules, name='course_modules'),
+    path('instructor/course/<int:course_id>/modules/reorder/', views.reorder_modules, name='reorder_modules'),
     path('instructor/module/<int:module_id>/content/', views.module_content_list, name='module_content_list'),
+    path('instructor/module/<int:module_id>/content/<str:content_type>/reorder/', views.reorder_contents, name='reorder_contents'),
     path('instructor/module/<int:module_id>/content/create/<str:content_type>/', views.content_create, name='content_create'),
+    path('instructor/module/<int:module_id>/uploads/', views.upload_create, name='upload_create'),
+    path('instructor/upload/<uuid:upload_id>/', views.upload_chunk, name='upload_chunk'),
     path('instructor/content/<int:content_id>/edit/', views.content_edit, name='content_edit'),
     path('instructor/content/<int:content_id>/delete/', views.content_delete, name='content_delete'),
     
@@ -1,29 +1,36 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.http import HttpResponseForbidden
 from django.contrib import messages
 from django.db.models import Count, Avg
 from django.utils import timezone
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_http_methods
 from django.db import transaction
+from asgiref.sync import sync_to_async
 from django.http import HttpResponse
 from .models import Course, Module, Content, TextContent, FileContent, ImageContent, VideoContent
 import json
-import os
 
 from .models import (
     Category, Course, Module, TextContent, FileContent, 
-    ImageContent, VideoContent, Enrollment, Progress
+    ImageContent, VideoContent, Enrollment, Progress, UploadSession
 )
 from .forms import (
     CourseCreateForm, CourseUpdateForm, ModuleCreateForm, 
     TextContentForm, FileContentForm, ImageContentForm, VideoContentForm
 )
 from certificates.models import Certificate
+from elearning_platform.asyncutils import arender, aevaluate
+from elearning_platform.routers import replica
+from .completion import completion_state, is_course_completed
+from .resume import record_visit, continue_learning
+from .outline import get_course_outline, bump_outline_revision
+from .ordering import next_order, apply_order
+from .uploads import UPLOAD_CHUNK_SIZE, UploadError, start_upload, append_chunk, discard_upload
 
 def home(request):
     """Page d'accueil avec les cours populaires et récents"""
@@ -32,37 +39,47 @@ def home(request):
         student_count=Count('students')).order_by('-student_count')[:6]
     recent_courses = Course.objects.filter(status='published').order_by('-created')[:6]
     
+    # Cours à reprendre pour l'étudiant connecté
+    continue_courses = []
+    if request.user.is_authenticated and request.user.is_student:
+        continue_courses = continue_learning(request.user.id)
+    
     return render(request, 'courses/home.html', {
         'categories': categories,
         'popular_courses': popular_courses,
-        'recent_courses': recent_courses
+        'recent_courses': recent_courses,
+        'continue_courses': continue_courses
     })
 
-def course_list(request, category_slug=None):
+async def course_list(request, category_slug=None):
     """Liste des cours disponibles avec filtrage par catégorie"""
-    categories = Category.objects.all()
+    categories = await aevaluate(Category.objects.all())
     category = None
-    courses = Course.objects.filter(status='published')
+    courses = Course.objects.filter(status='published').select_related('instructor')
     
     if category_slug:
-        category = get_object_or_404(Category, slug=category_slug)
+        category = await aget_object_or_404(Category, slug=category_slug)
         courses = courses.filter(category=category)
     
-    return render(request, 'courses/course_list.html', {
+    return await arender(request, 'courses/course_list.html', {
         'categories': categories,
         'category': category,
-        'courses': courses
+        'courses': await aevaluate(courses)
     })
 
-def course_detail(request, slug):
+async def course_detail(request, slug):
     """Détails d'un cours spécifique"""
-    course = get_object_or_404(Course, slug=slug, status='published')
-    modules = course.modules.all()
+    course = await aget_object_or_404(
+        Course.objects.select_related('category', 'instructor'), slug=slug, status='published'
+    )
+    # Plan du cours mis en cache pour sa révision courante
+    modules = await sync_to_async(get_course_outline)(course)
     enrolled = False
-    if request.user.is_authenticated:
-        enrolled = Enrollment.objects.filter(student=request.user, course=course).exists()
+    user = await request.auser()
+    if user.is_authenticated:
+        enrolled = await Enrollment.objects.filter(student=user, course=course).aexists()
     
-    return render(request, 'courses/course_detail.html', {
+    return await arender(request, 'courses/course_detail.html', {
         'course': course,
         'modules': modules,
         'enrolled': enrolled
@@ -91,35 +108,23 @@ def course_learn(request, slug):
     # Vérifier si l'utilisateur est inscrit
     enrollment = get_object_or_404(Enrollment, student=request.user, course=course)
     
-    modules = course.modules.all()
+    modules = get_course_outline(course)
     
-    # Trouver le premier module non complété
-    current_module = None
-    for module in modules:
-        progress, created = Progress.objects.get_or_create(
-            student=request.user, 
-            course=course,
-            module=module
-        )
-        if not progress.completed:
-            current_module = module
-            break
+    # Modules complétés et premier module non complété, sans créer de lignes de progression
+    completed_module_ids, current_module = completion_state(enrollment, modules)
     
-    # Si tous les modules sont complétés ou aucun module n'existe
-    if not current_module and modules.exists():
-        current_module = modules.first()
+    # Reprendre là où l'étudiant s'est arrêté
+    if enrollment.last_module_id:
+        current_module = next((m for m in modules if m.id == enrollment.last_module_id), current_module)
     
-    # Obtenir les IDs des modules complétés
-    completed_module_ids = Progress.objects.filter(
-        student=request.user,
-        course=course,
-        completed=True
-    ).values_list('module_id', flat=True)
+    # Si tous les modules sont complétés ou aucun module n'existe
+    if not current_module and modules:
+        current_module = modules.modules[0]
     
     # Calculer la progression globale
     completed_modules_count = len(completed_module_ids)
     
-    total_modules = modules.count()
+    total_modules = len(modules)
     progress_percentage = 0
     if total_modules > 0:
         progress_percentage = (completed_modules_count / total_modules) * 100
@@ -150,6 +155,10 @@ def module_content(request, slug, module_id):
     enrollment = get_object_or_404(Enrollment, student=request.user, course=course)
     
     module = get_object_or_404(Module, id=module_id, course=course)
+    outline = get_course_outline(course)
+    
+    # Déplacer le point de reprise de l'inscription
+    record_visit(enrollment, module.id, request.GET.get('item'))
     
     # Récupérer tous les contenus différents
     text_contents = TextContent.objects.filter(module=module).order_by('order')
@@ -157,19 +166,8 @@ def module_content(request, slug, module_id):
     image_contents = ImageContent.objects.filter(module=module).order_by('order')
     video_contents = VideoContent.objects.filter(module=module).order_by('order')
     
-    # Mettre à jour la progression
-    progress, created = Progress.objects.get_or_create(
-        student=request.user,
-        course=course,
-        module=module
-    )
-    
     # Obtenir les IDs des modules complétés
-    completed_modules = Progress.objects.filter(
-        student=request.user,
-        course=course,
-        completed=True
-    ).values_list('module_id', flat=True)
+    completed_modules, _ = completion_state(enrollment, outline)
     
     # Récupérer les quiz associés au module
     from quizzes.models import Quiz, QuizAttempt
@@ -178,7 +176,7 @@ def module_content(request, slug, module_id):
     # Récupérer les informations sur les tentatives de quiz de l'étudiant
     student_quiz_attempts = {}
     for quiz in quizzes:
-        attempts = QuizAttempt.objects.filter(student=request.user, quiz=quiz).order_by('-start_time')
+        attempts = QuizAttempt.objects.filter(student=request.user, quiz=quiz, end_time__isnull=False).order_by('-start_time')
         passed = attempts.filter(passed=True).exists()
         last_attempt_id = attempts.first().id if attempts.exists() else None
         student_quiz_attempts[quiz.id] = {
@@ -190,12 +188,14 @@ def module_content(request, slug, module_id):
     # Marquer comme complété si l'utilisateur soumet le formulaire
     if request.method == 'POST':
         if 'complete_module' in request.POST:
-            progress.completed = True
-            progress.save()
+            # La ligne de progression n'est écrite qu'à la complétion ; le bitmap suit par signal
+            Progress.objects.update_or_create(
+                student=request.user, course=course, module=module, defaults={'completed': True}
+            )
             messages.success(request, f'Module {module.title} marqué comme complété!')
             
             # Rediriger vers le prochain module ou retour à la page du cours
-            next_module = Module.objects.filter(course=course, order__gt=module.order).first()
+            next_module = outline.next(module.id)
             if next_module:
                 return redirect('courses:module_content', slug=slug, module_id=next_module.id)
             else:
@@ -208,39 +208,38 @@ def module_content(request, slug, module_id):
         'file_contents': file_contents,
         'image_contents': image_contents,
         'video_contents': video_contents,
-        'progress': progress,
+        'module_completed': module.id in completed_modules,
         'enrollment': enrollment,
         'completed_modules': completed_modules,
+        'outline': outline,
+        'module_position': getattr(outline.module(module.id), 'position', ''),
+        'prev_module': outline.previous(module.id),
+        'next_module': outline.next(module.id),
         'quizzes': quizzes,
         'student_quiz_attempts': student_quiz_attempts
     })
 
+@login_required
+@require_POST
+def module_resume(request, slug, module_id):
+    """Enregistre le dernier contenu consulté dans un module (appelé en arrière-plan)"""
+    enrollment = get_object_or_404(Enrollment, student=request.user, course__slug=slug)
+    module = get_object_or_404(Module, id=module_id, course_id=enrollment.course_id)
+    record_visit(enrollment, module.id, request.POST.get('item'))
+    return JsonResponse({'success': True})
+
 @login_required
 def course_complete(request, slug):
     """Compléter un cours et générer un certificat"""
     course = get_object_or_404(Course, slug=slug)
     enrollment = get_object_or_404(Enrollment, student=request.user, course=course)
     
-    # Vérifier si tous les modules sont complétés
-    modules = course.modules.all()
-    all_completed = True
-    
-    for module in modules:
-        progress = Progress.objects.filter(
-            student=request.user,
-            course=course,
-            module=module,
-            completed=True
-        ).exists()
-        
-        if not progress:
-            all_completed = False
-            break
-    
-    if all_completed:
+    # Vérifier si tous les modules sont complétés (compteurs tenus à jour au fil de l'eau)
+    if is_course_completed(enrollment, course):
         # Marquer le cours comme complété
-        enrollment.completed = True
-        enrollment.save()
+        if not enrollment.completed:
+            enrollment.completed = True
+            enrollment.save(update_fields=['completed'])
         
         # Générer un certificat si ce n'est pas déjà fait
         certificate, created = Certificate.objects.get_or_create(
@@ -344,7 +343,7 @@ def course_modules(request, slug):
         if form.is_valid():
             module = form.save(commit=False)
             module.course = course
-            module.order = modules.count() + 1  # Placer à la fin
+            module.order = next_order(modules)  # Placer à la fin
             module.save()
             messages.success(request, f'Le module "{module.title}" a été ajouté avec succès.')
             return redirect('courses:course_modules', slug=slug)
@@ -357,6 +356,48 @@ def course_modules(request, slug):
         'form': form
     })
 
+@login_required
+@require_POST
+def reorder_modules(request, course_id):
+    """Applique l'ordre des modules issu d'un glisser-déposer, en une seule requête"""
+    if not request.user.is_instructor:
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+    
+    course = get_object_or_404(Course, id=course_id, instructor=request.user)
+    try:
+        apply_order(course.modules.all(), json.loads(request.body).get('order', []))
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Ordre invalide'}, status=400)
+    
+    # L'UPDATE groupé ne déclenche pas de signaux : invalider le plan du cours
+    bump_outline_revision(course.id)
+    return JsonResponse({'success': True})
+
+@login_required
+@require_POST
+def reorder_contents(request, module_id, content_type):
+    """Applique l'ordre des contenus d'un type donné dans un module"""
+    if not request.user.is_instructor:
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+    
+    module = get_object_or_404(Module, id=module_id, course__instructor=request.user)
+    models_by_type = {
+        'text': TextContent, 'file': FileContent, 'image': ImageContent, 'video': VideoContent
+    }
+    if content_type not in models_by_type:
+        return JsonResponse({'success': False, 'error': 'Type de contenu inconnu'}, status=404)
+    
+    try:
+        apply_order(
+            models_by_type[content_type].objects.filter(module=module),
+            json.loads(request.body).get('order', [])
+        )
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Ordre invalide'}, status=400)
+    
+    bump_outline_revision(module.course_id)
+    return JsonResponse({'success': True})
+
 @login_required
 def module_content_list(request, module_id):
     """Gérer le contenu d'un module"""
@@ -415,9 +456,8 @@ def content_create(request, module_id, content_type):
             content = form.save(commit=False)
             content.module = module
             
-            # Déterminer l'ordre
-            existing_count = model.objects.filter(module=module).count()
-            content.order = existing_count + 1
+            # Placer le contenu à la fin du module
+            content.order = next_order(model.objects.filter(module=module))
             
             content.save()
             messages.success(request, f'Le contenu "{content.title}" a été ajouté avec succès.')
@@ -431,6 +471,73 @@ def content_create(request, module_id, content_type):
         'module': module
     })
 
+@login_required
+@require_POST
+def upload_create(request, module_id):
+    """Ouvre l'envoi par morceaux d'un fichier de cours"""
+    if not request.user.is_instructor:
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+    
+    module = get_object_or_404(Module, id=module_id, course__instructor=request.user)
+    try:
+        data = json.loads(request.body)
+        title = data['title'].strip()[:200]
+        session = start_upload(module, request.user, title or data['filename'], data['filename'], int(data['size']))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Requête invalide'}, status=400)
+    except UploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=e.status)
+    
+    url = reverse('courses:upload_chunk', args=[session.id])
+    response = JsonResponse({
+        'success': True, 'url': url, 'offset': 0, 'chunk_size': UPLOAD_CHUNK_SIZE
+    }, status=201)
+    response['Location'] = url
+    return response
+
+@login_required
+@require_http_methods(['HEAD', 'PATCH', 'DELETE'])
+def upload_chunk(request, upload_id):
+    """Reprise (HEAD), envoi d'un morceau (PATCH) ou abandon (DELETE) d'un envoi par morceaux"""
+    session = get_object_or_404(UploadSession, id=upload_id, instructor=request.user)
+    
+    if request.method == 'HEAD':
+        response = HttpResponse(status=204)
+    elif request.method == 'DELETE':
+        discard_upload(session)
+        return HttpResponse(status=204)
+    else:
+        try:
+            session, content = append_chunk(
+                session.id,
+                int(request.headers.get('Upload-Offset', '')),
+                request,
+                int(request.headers.get('Content-Length', '')),
+                request.headers.get('Upload-Checksum', '')
+            )
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'En-têtes invalides'}, status=400)
+        except UploadSession.DoesNotExist:
+            return JsonResponse({'success': False, 'error': 'Envoi introuvable'}, status=404)
+        except UploadError as e:
+            response = JsonResponse({'success': False, 'error': str(e)}, status=e.status)
+            response['Upload-Offset'] = UploadSession.objects.filter(id=upload_id).values_list('offset', flat=True).first()
+            return response
+        
+        if content is not None:
+            messages.success(request, f'Le contenu "{content.title}" a été ajouté avec succès.')
+            response = JsonResponse({
+                'success': True, 'offset': session.offset, 'content_id': content.id,
+                'redirect_url': reverse('courses:module_content_list', args=[session.module_id])
+            })
+        else:
+            response = JsonResponse({'success': True, 'offset': session.offset})
+    
+    response['Upload-Offset'] = session.offset
+    response['Upload-Length'] = session.size
+    response['Cache-Control'] = 'no-store'
+    return response
+
 @login_required
 def content_edit(request, content_id):
     """Modifier un contenu existant"""
@@ -472,21 +579,7 @@ def content_delete(request, content_id):
     if request.method == 'POST':
         content_title = content.title
         
-        # Delete physical files if they exist
-        if hasattr(content, 'file') and content.file:
-            try:
-                if os.path.isfile(content.file.path):
-                    os.remove(content.file.path)
-            except OSError:
-                pass
-        
-        if hasattr(content, 'image') and content.image:
-            try:
-                if os.path.isfile(content.image.path):
-                    os.remove(content.image.path)
-            except OSError:
-                pass
-        
+        # Le fichier est supprimé plus tard par sweep_media (voir courses.media_gc)
         content.delete()
         messages.success(request, f'Le contenu "{content_title}" a été supprimé avec succès.')
         return redirect('courses:module_content_list', module_id=module.id)
@@ -506,7 +599,7 @@ def course_students(request, slug):
         return HttpResponseForbidden("Vous n'avez pas l'autorisation d'accéder à cette page.")
     
     course = get_object_or_404(Course, slug=slug, instructor=request.user)
-    enrollments = course.enrollments.all()
+    enrollments = replica(course.enrollments.select_related('student'))
     
     return render(request, 'courses/instructor/course_students.html', {
         'course': course,
@@ -562,30 +655,10 @@ def delete_module(request, course_id, module_id):
             video_count = module.video_contents.count()
             progress_count = module.student_progress.count()
             
-            # Supprimer les fichiers physiques
-            for file_content in module.file_contents.all():
-                if file_content.file and os.path.isfile(file_content.file.path):
-                    try:
-                        os.remove(file_content.file.path)
-                    except OSError:
-                        pass
-            
-            for image_content in module.image_contents.all():
-                if image_content.image and os.path.isfile(image_content.image.path):
-                    try:
-                        os.remove(image_content.image.path)
-                    except OSError:
-                        pass
-            
-            # Supprimer le module
+            # Supprimer le module (les clés d'ordre des autres modules restent valides) ;
+            # ses fichiers sont confiés à sweep_media (voir courses.media_gc)
             module.delete()
             
-            # Réorganiser l'ordre
-            remaining_modules = Module.objects.filter(course=course).order_by('order')
-            for index, mod in enumerate(remaining_modules, 1):
-                mod.order = index
-                mod.save()
-            
             total_deleted = text_count + file_count + image_count + video_count
             
             print(f"Module {module_title} deleted successfully")  # Debug
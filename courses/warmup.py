@@ -0,0 +1,117 @@
+"""
+Préchauffage des caches après un déploiement.
+
+Sans préchauffage, les premiers visiteurs après un déploiement paient en même
+temps la compilation des gabarits, la construction des plans de cours et des
+charges utiles de quiz et le rendu des pages publiques. `warm_caches` les
+prépare à l'avance par étapes : gabarits compilés, plans et quiz des cours les
+plus suivis (par nombre d'inscriptions), puis pages anonymes de l'accueil, du
+catalogue et de ces cours, rendues par la pile de middlewares pour remplir le
+cache de pages (voir elearning_platform/pagecache.py).
+
+Le serveur `serve` exécute aussi `warm_caches` avant de créer ses workers
+(`SERVE_WARMUP`) : les plans gardés en mémoire par le maître sont alors
+hérités par chaque worker.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import close_old_connections
+from django.db.models import Count
+from django.test.client import RequestFactory
+from django.urls import reverse
+
+from elearning_platform.server import compile_templates
+from quizzes.models import Quiz
+from quizzes.payload import warm_quiz_payload
+from .models import Course
+from .outline import get_course_outline
+
+# Nombre de cours les plus suivis préchauffés
+WARM_CACHES_TOP_COURSES = getattr(settings, 'WARM_CACHES_TOP_COURSES', 20)
+# Nombre de threads utilisés par étape
+WARM_CACHES_CONCURRENCY = getattr(settings, 'WARM_CACHES_CONCURRENCY', 4)
+
+
+def top_courses(limit=WARM_CACHES_TOP_COURSES):
+    """Cours publiés ayant le plus d'inscriptions"""
+    return list(
+        Course.objects.filter(status='published').annotate(enrollment_count=Count('enrollments'))
+        .order_by('-enrollment_count', '-created')[:limit]
+    )
+
+
+def _in_thread(function):
+    # Chaque thread ouvre sa propre connexion : elle est fermée à la fin de la tâche
+    def run(*args):
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+    return run
+
+
+def _map(function, items, concurrency):
+    if concurrency <= 1:
+        return [function(item) for item in items]
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='warm-caches') as executor:
+        return list(executor.map(_in_thread(function), items))
+
+
+def warm_outlines(courses, concurrency=WARM_CACHES_CONCURRENCY):
+    return len(_map(get_course_outline, courses, concurrency))
+
+
+def warm_quizzes(courses, concurrency=WARM_CACHES_CONCURRENCY):
+    quiz_ids = list(Quiz.objects.filter(module__course__in=courses).values_list('id', flat=True))
+    return sum(1 for payload in _map(warm_quiz_payload, quiz_ids, concurrency) if payload is not None)
+
+
+def public_paths(courses):
+    """Pages anonymes préchauffées : accueil, catalogue et pages des cours"""
+    return [
+        reverse('home'),
+        reverse('courses:home'),
+        reverse('courses:course_list'),
+        *(reverse('courses:course_detail', args=[course.slug]) for course in courses),
+    ]
+
+
+def warm_pages(courses, concurrency=WARM_CACHES_CONCURRENCY):
+    """Rend les pages publiques comme pour un visiteur anonyme ; retourne le nombre de pages en cache"""
+    base = urlsplit(settings.BASE_URL)
+    factory = RequestFactory(HTTP_HOST=base.netloc, secure=base.scheme == 'https')
+    handler = WSGIHandler()
+
+    def fetch(path):
+        return handler.get_response(factory.get(path))
+
+    responses = _map(fetch, public_paths(courses), concurrency)
+    return sum(1 for response in responses if response.status_code == 200)
+
+
+def warm_caches(limit=WARM_CACHES_TOP_COURSES, concurrency=WARM_CACHES_CONCURRENCY, report=None):
+    """
+    Exécute toutes les étapes ; `report(étape, nombre, secondes)` est appelée
+    après chacune. Retourne la liste de ces triplets.
+    """
+    stages = []
+
+    def stage(name, function, *args):
+        began = time.perf_counter()
+        result = function(*args)
+        stages.append((name, len(result) if isinstance(result, list) else result, time.perf_counter() - began))
+        if report:
+            report(*stages[-1])
+        return result
+
+    # Le chargeur de gabarits est partagé : la compilation reste dans un seul thread
+    stage('gabarits', compile_templates)
+    courses = stage('cours les plus suivis', lambda: top_courses(limit))
+    stage('plans de cours', warm_outlines, courses, concurrency)
+    stage('charges utiles de quiz', warm_quizzes, courses, concurrency)
+    stage('pages publiques', warm_pages, courses, concurrency)
+    return stages
@@ -0,0 +1,20 @@
+"""
+Utilitaires pour les vues asynchrones.
+
+Les gabarits accèdent encore paresseusement à certaines relations
+(`course.students.count`, `user.profile_picture`...), ce qui est interdit dans
+la boucle d'événements. Les vues asynchrones chargent donc leurs données avec
+l'ORM asynchrone puis délèguent le rendu à un thread.
+"""
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+# Le rendu s'exécute dans le thread dédié à la requête (ThreadSensitiveContext)
+arender = sync_to_async(render)
+
+
+async def aevaluate(queryset):
+    """Évalue un queryset sans bloquer la boucle et conserve son cache de résultats"""
+    async for _ in queryset:
+        pass
+    return queryset
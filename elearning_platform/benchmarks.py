@@ -0,0 +1,101 @@
+"""
+Outils communs aux commandes de banc d'essai et de test de charge.
+
+Les bancs d'essai ne touchent jamais la base configurée : ils créent une base
+de test jetable, la peuplent avec des données synthétiques et la détruisent
+à la fin.
+"""
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.test import override_settings
+
+
+@contextmanager
+def scratch_database():
+    """Crée une base de test jetable pour la durée du bloc"""
+    connection = connections['default']
+    old_name = connection.settings_dict['NAME']
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    if connection.vendor == 'sqlite' and not old_test_name:
+        # Une base SQLite en mémoire partagée échoue immédiatement sur les
+        # verrous de table : un fichier temporaire reproduit le comportement réel
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            tempfile.gettempdir(), f'elearning_bench_{os.getpid()}.sqlite3'
+        )
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    # Les réplicas deviennent des miroirs de la base jetable, comme en test
+    mirrors = {}
+    for alias in connections:
+        mirror = connections[alias].settings_dict.get('TEST', {}).get('MIRROR')
+        if alias != 'default' and mirror == 'default':
+            mirrors[alias] = dict(connections[alias].settings_dict)
+            connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        # Les caches partagés restent intacts : les données jetables n'y laissent aucune clé
+        with override_settings(CACHES=scratch_caches()):
+            yield connection
+    finally:
+        for alias, settings_dict in mirrors.items():
+            connections[alias].close()
+            connections[alias].settings_dict.update(settings_dict)
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict['TEST']['NAME'] = old_test_name
+
+
+def scratch_caches():
+    """Même configuration, avec des caches en mémoire du processus à la place des caches partagés"""
+    return {
+        alias: {
+            **config, 'LOCATION': f'scratch-{alias}'
+        } if config['BACKEND'].endswith('.TieredCache') else {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'scratch-{alias}',
+        }
+        for alias, config in settings.CACHES.items()
+    }
+
+
+@contextmanager
+def timer():
+    """Mesure la durée d'un bloc : `with timer() as elapsed: ...; elapsed()`"""
+    start = time.perf_counter()
+    end = None
+
+    def elapsed():
+        return (end if end is not None else time.perf_counter()) - start
+
+    try:
+        yield elapsed
+    finally:
+        end = time.perf_counter()
+
+
+def summarize(latencies):
+    """Résumé des latences (en millisecondes) : moyenne et percentiles"""
+    if not latencies:
+        return {'count': 0, 'mean': 0, 'p50': 0, 'p95': 0, 'p99': 0, 'max': 0}
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index] * 1000
+
+    return {
+        'count': len(ordered),
+        'mean': statistics.fmean(ordered) * 1000,
+        'p50': percentile(50),
+        'p95': percentile(95),
+        'p99': percentile(99),
+        'max': ordered[-1] * 1000,
+    }
+
+
+def format_summary(summary):
+    return ("n={count} moyenne={mean:.2f}ms p50={p50:.2f}ms p95={p95:.2f}ms "
+            "p99={p99:.2f}ms max={max:.2f}ms").format(**summary)
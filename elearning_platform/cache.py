@@ -0,0 +1,350 @@
+"""
+Cache à deux niveaux du projet.
+
+`TieredCache` est le backend du cache `default` : un LRU borné en mémoire du
+processus devant un cache partagé par tous les workers (alias `shared` :
+Redis avec `REDIS_URL`, sinon un cache fichier local). Seules les familles de
+clés listées dans `LOCAL_FAMILIES` passent par le niveau local, chacune avec
+sa propre durée de vie en mémoire : le plan d'un cours, dont la clé change à
+chaque révision, peut y rester longtemps ; une charge utile de quiz, invalidée
+par suppression, n'y reste que quelques secondes, car une suppression n'est
+vue que par le processus qui l'a faite. Les valeurs gardées en mémoire ne
+sont pas copiées et ne doivent pas être modifiées. Les compteurs, verrous et
+tampons (`add`, `incr`, familles non listées) vont directement au cache
+partagé.
+
+Une famille est formée des deux premiers segments de la clé
+(`quiz:payload:42` → `quiz:payload`). Le module tient par famille les
+compteurs de succès local, succès partagé, absence, reconstruction et
+attente, publiés périodiquement dans le cache partagé pour `cache_stats`.
+
+`single_flight` reconstruit une valeur absente au plus une fois : un seul
+thread par processus, et un seul processus grâce à un verrou posé dans le
+cache partagé, pendant que les autres attendent le résultat. L'exclusion
+entre processus demande Redis : le cache fichier n'a pas d'`add` atomique,
+deux workers peuvent alors reconstruire la même valeur en même temps
+(`atomic_shared_cache` permet de le vérifier au démarrage).
+`invalidate_on` relie les signaux d'un modèle à la suppression de clés.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.db.models.signals import post_delete, post_save
+from django.utils.functional import cached_property
+
+METRICS_PREFIX = 'cache:metrics'
+METRICS_FAMILIES_KEY = f'{METRICS_PREFIX}:families'
+EVENTS = ('local_hits', 'hits', 'misses', 'builds', 'waits')
+
+_MISSING = object()
+
+_totals = {}
+_pending = {}
+_published = [time.monotonic()]
+_metrics_guard = threading.Lock()
+
+# Niveaux locaux par cache partagé : Django crée une instance du backend par
+# thread, mais le niveau local est commun à tous les threads du processus
+_stores = {}
+_stores_guard = threading.Lock()
+
+
+def family(key):
+    parts = str(key).split(':', 2)
+    # Clés posées par Django ou des bibliothèques, sans segments : une seule famille
+    return ':'.join(parts[:2]) if len(parts) > 1 else 'other'
+
+
+def record(key, event, count=1):
+    name = family(key)
+    with _metrics_guard:
+        _totals.setdefault(name, Counter())[event] += count
+        _pending.setdefault(name, Counter())[event] += count
+
+
+def metrics(name=None):
+    """Compteurs du processus, pour une famille ou pour toutes"""
+    with _metrics_guard:
+        if name is not None:
+            return {event: _totals.get(name, Counter())[event] for event in EVENTS}
+        return {key: {event: counts[event] for event in EVENTS} for key, counts in _totals.items()}
+
+
+def reset_metrics():
+    with _metrics_guard:
+        _totals.clear()
+        _pending.clear()
+
+
+def shared_metrics():
+    """Compteurs cumulés de tous les processus, lus dans le cache partagé"""
+    shared = getattr(cache, 'shared', cache)
+    result = {}
+    for name in sorted(shared.get(METRICS_FAMILIES_KEY) or ()):
+        values = shared.get_many([f'{METRICS_PREFIX}:{name}:{event}' for event in EVENTS])
+        result[name] = {event: values.get(f'{METRICS_PREFIX}:{name}:{event}', 0) for event in EVENTS}
+    return result
+
+
+class TieredCache(BaseCache):
+    """LRU en mémoire devant le cache partagé (voir la docstring du module)"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._families = dict(options.get('LOCAL_FAMILIES', {}))
+        self._max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self._metrics_interval = options.get('METRICS_INTERVAL', 30)
+        with _stores_guard:
+            self._local, self._guard = _stores.setdefault((location, self._shared_alias),
+                                                         (OrderedDict(), threading.Lock()))
+
+    @cached_property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # Niveau local
+
+    def _local_timeout(self, key):
+        return self._families.get(family(key))
+
+    def _local_get(self, key, version):
+        if self._local_timeout(key) is None:
+            return _MISSING
+        local_key = self.make_key(key, version)
+        with self._guard:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return _MISSING
+            if entry[0] < time.monotonic():
+                del self._local[local_key]
+                return _MISSING
+            self._local.move_to_end(local_key)
+            return entry[1]
+
+    def _local_set(self, key, value, version, timeout=DEFAULT_TIMEOUT):
+        local_timeout = self._local_timeout(key)
+        if local_timeout is None:
+            return
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            if timeout <= 0:
+                self._local_drop(key, version)
+                return
+            local_timeout = min(local_timeout, timeout)
+        local_key = self.make_key(key, version)
+        with self._guard:
+            self._local[local_key] = (time.monotonic() + local_timeout, value)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def _local_drop(self, key, version):
+        with self._guard:
+            self._local.pop(self.make_key(key, version), None)
+
+    # Métriques
+
+    def _publish_metrics(self):
+        now = time.monotonic()
+        if now - _published[0] < self._metrics_interval:
+            return
+        with _metrics_guard:
+            if now - _published[0] < self._metrics_interval:
+                return
+            _published[0] = now
+            pending = {name: counts for name, counts in _pending.items() if counts}
+            _pending.clear()
+        if not pending:
+            return
+        known = set(self.shared.get(METRICS_FAMILIES_KEY) or ())
+        if not known.issuperset(pending):
+            self.shared.set(METRICS_FAMILIES_KEY, known | set(pending), None)
+        for name, counts in pending.items():
+            for event, count in counts.items():
+                key = f'{METRICS_PREFIX}:{name}:{event}'
+                self.shared.add(key, 0, None)
+                try:
+                    self.shared.incr(key, count)
+                except ValueError:
+                    pass
+
+    # API du cache
+
+    def get(self, key, default=None, version=None):
+        value = self._local_get(key, version)
+        if value is not _MISSING:
+            record(key, 'local_hits')
+            self._publish_metrics()
+            return value
+        value = self.shared.get(key, _MISSING, version)
+        if value is _MISSING:
+            record(key, 'misses')
+            self._publish_metrics()
+            return default
+        record(key, 'hits')
+        self._local_set(key, value, version)
+        self._publish_metrics()
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self._local_get(key, version)
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                record(key, 'local_hits')
+                found[key] = value
+        if remaining:
+            values = self.shared.get_many(remaining, version)
+            for key in remaining:
+                if key in values:
+                    record(key, 'hits')
+                    self._local_set(key, values[key], version)
+                    found[key] = values[key]
+                else:
+                    record(key, 'misses')
+        self._publish_metrics()
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._local_set(key, value, version, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            self._local_set(key, value, version, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_drop(key, version)
+        return self.shared.add(key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_drop(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local_drop(key, version)
+        return self.shared.decr(key, delta, version)
+
+    def has_key(self, key, version=None):
+        return self._local_get(key, version) is not _MISSING or self.shared.has_key(key, version)
+
+    def delete(self, key, version=None):
+        self._local_drop(key, version)
+        return self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_drop(key, version)
+        self.shared.delete_many(keys, version)
+
+    def clear(self):
+        with self._guard:
+            self._local.clear()
+        self.shared.clear()
+
+
+def _wait_for(key, wait):
+    """Attend qu'un autre processus ait publié la valeur"""
+    deadline = time.monotonic() + wait
+    delay = 0.01
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        delay = min(delay * 2, 0.2)
+    return None
+
+
+# Reconstructions en cours dans le processus : clé -> [verrou, nombre de threads]
+_flights = {}
+_flights_guard = threading.Lock()
+
+
+@contextmanager
+def _flight_lock(key):
+    """Verrou de processus propre à `key`, supprimé quand plus aucun thread ne l'utilise"""
+    with _flights_guard:
+        flight = _flights.get(key)
+        if flight is None:
+            flight = _flights[key] = [threading.Lock(), 0]
+        flight[1] += 1
+    try:
+        with flight[0]:
+            yield
+    finally:
+        with _flights_guard:
+            flight[1] -= 1
+            if not flight[1]:
+                del _flights[key]
+
+
+def atomic_shared_cache(alias='shared'):
+    """Vrai si `add` et `incr` du cache partagé sont atomiques entre processus"""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    return not backend.endswith(('.FileBasedCache', '.DummyCache'))
+
+
+def single_flight(key, build, timeout=DEFAULT_TIMEOUT, lock_timeout=10, wait=2.0):
+    """
+    Retourne la valeur en cache de `key`, en appelant `build()` au plus une
+    fois en cas d'absence. `timeout` peut être une fonction de la valeur
+    construite. Une valeur None n'est pas mise en cache. Entre processus, la
+    garantie ne tient qu'avec un cache partagé atomique (Redis).
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    with _flight_lock(key):
+        # Un autre thread du processus a peut-être déjà reconstruit
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, lock_timeout):
+            try:
+                record(key, 'builds')
+                value = build()
+                if value is not None:
+                    cache.set(key, value, timeout(value) if callable(timeout) else timeout)
+            finally:
+                cache.delete(lock_key)
+            return value
+
+        record(key, 'waits')
+        value = _wait_for(key, wait)
+        if value is None:
+            # Le processus détenteur du verrou est trop lent : on reconstruit
+            record(key, 'builds')
+            value = build()
+        return value
+
+
+def invalidate_on(*models, keys, cache_alias=DEFAULT_CACHE_ALIAS):
+    """
+    Supprime du cache `cache_alias` les clés `keys(instance)` à chaque
+    enregistrement ou suppression d'une instance de `models`.
+    """
+    def receiver(sender, instance, **kwargs):
+        caches[cache_alias].delete_many([key for key in keys(instance) if key])
+
+    for model in models:
+        for signal in (post_save, post_delete):
+            signal.connect(receiver, sender=model, weak=False)
+    return receiver
@@ -0,0 +1,179 @@
+"""
+Compression gzip et brotli des réponses HTML et JSON.
+
+`CompressionMiddleware` remplace `GZipMiddleware` : il choisit brotli (si le
+paquet `brotli` est installé) ou gzip selon `Accept-Encoding` et compresse
+aussi bien les réponses ordinaires que les `StreamingHttpResponse`, morceau
+par morceau, synchrones ou asynchrones. Les réponses de moins de
+`COMPRESSION_MIN_SIZE` octets, les types non textuels et les réponses déjà
+compressées (fichiers statiques précompressés) sont laissés tels quels.
+
+Le niveau suit le coût CPU : niveau normal pour une page ordinaire, niveau
+rapide pour une grande réponse (`COMPRESSION_LARGE_SIZE`), un flux, ou quand
+la charge de la machine dépasse `COMPRESSION_BUSY_LOAD` par cœur. Comme
+`GZipMiddleware`, un nom de fichier aléatoire est ajouté à l'en-tête gzip
+pour atténuer BREACH. `bench_compression` mesure les octets gagnés et la
+latence ajoutée.
+"""
+import gzip
+import io
+import os
+import random
+import string
+import time
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .staticfiles import accepts, brotli
+
+# Taille minimale d'une réponse compressée (octets)
+COMPRESSION_MIN_SIZE = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+# Taille à partir de laquelle le niveau rapide est utilisé (octets)
+COMPRESSION_LARGE_SIZE = getattr(settings, 'COMPRESSION_LARGE_SIZE', 256 * 1024)
+# Niveaux par codage : (normal, rapide)
+COMPRESSION_LEVELS = getattr(settings, 'COMPRESSION_LEVELS', {'br': (5, 3), 'gzip': (6, 3)})
+# Charge moyenne par cœur au-delà de laquelle le niveau rapide est toujours utilisé
+COMPRESSION_BUSY_LOAD = getattr(settings, 'COMPRESSION_BUSY_LOAD', 1.0)
+# Types de contenu compressés
+COMPRESSION_CONTENT_TYPES = getattr(settings, 'COMPRESSION_CONTENT_TYPES', (
+    'text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+))
+
+# Longueur maximale du nom de fichier aléatoire de l'en-tête gzip (voir GZipMiddleware)
+MAX_RANDOM_BYTES = 100
+
+_load = [0.0, False]
+
+
+def busy():
+    """Vrai si la machine est chargée ; la charge est relue au plus une fois par seconde"""
+    now = time.monotonic()
+    if now - _load[0] > 1:
+        try:
+            _load[1] = os.getloadavg()[0] / (os.cpu_count() or 1) > COMPRESSION_BUSY_LOAD
+        except OSError:
+            _load[1] = False
+        _load[0] = now
+    return _load[1]
+
+
+def negotiate(accept_encoding):
+    """Codage retenu pour un en-tête `Accept-Encoding`, ou None"""
+    if brotli is not None and accepts(accept_encoding, 'br'):
+        return 'br'
+    if accepts(accept_encoding, 'gzip'):
+        return 'gzip'
+    return None
+
+
+def level(coding, size=None):
+    """Niveau de compression : rapide pour un flux (`size` None), une grande réponse ou une machine chargée"""
+    normal, fast = COMPRESSION_LEVELS[coding]
+    return fast if size is None or size >= COMPRESSION_LARGE_SIZE or busy() else normal
+
+
+class Compressor:
+    """Compresse une suite de morceaux ; `flush()` rend la sortie disponible sans terminer le flux"""
+
+    def __init__(self, coding, compression_level):
+        if coding == 'br':
+            self._brotli = brotli.Compressor(quality=compression_level)
+        else:
+            self._brotli = None
+            self._buffer = io.BytesIO()
+            filename = ''.join(random.choices(string.ascii_letters, k=random.randint(1, MAX_RANDOM_BYTES)))
+            self._gzip = gzip.GzipFile(filename=filename, mode='wb', compresslevel=compression_level,
+                                       fileobj=self._buffer, mtime=0)
+
+    def _drain(self):
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def compress(self, data):
+        if self._brotli is not None:
+            return self._brotli.process(data)
+        self._gzip.write(data)
+        return self._drain()
+
+    def flush(self):
+        if self._brotli is not None:
+            return self._brotli.flush()
+        self._gzip.flush()
+        return self._drain()
+
+    def finish(self):
+        if self._brotli is not None:
+            return self._brotli.finish()
+        self._gzip.close()
+        return self._drain()
+
+
+def compress_bytes(content, coding, compression_level):
+    compressor = Compressor(coding, compression_level)
+    return compressor.compress(content) + compressor.finish()
+
+
+def compress_stream(chunks, coding):
+    compressor = Compressor(coding, level(coding))
+    for chunk in chunks:
+        # Chaque morceau est envoyé dès qu'il est produit
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, coding):
+    compressor = Compressor(coding, level(coding))
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def _compressible(response):
+    if response.has_header('Content-Encoding') or 'no-transform' in response.get('Cache-Control', ''):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type.startswith(COMPRESSION_CONTENT_TYPES)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compresse les réponses textuelles en brotli ou gzip (voir la docstring du module)"""
+
+    def process_response(self, request, response):
+        if not _compressible(response):
+            return response
+        # La réponse varie selon l'en-tête, même quand elle n'est pas compressée
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = negotiate(request.headers.get('Accept-Encoding', ''))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, coding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, coding)
+            del response['Content-Length']
+        else:
+            size = len(response.content)
+            if size < COMPRESSION_MIN_SIZE:
+                return response
+            compressed = compress_bytes(response.content, coding, level(coding, size))
+            if len(compressed) >= size:
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # Le contenu change : un ETag fort devient faible (comparaison faible de If-None-Match)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        response['Content-Encoding'] = coding
+        return response
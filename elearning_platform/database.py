@@ -0,0 +1,101 @@
+"""
+Configuration de la base de données pilotée par l'environnement.
+
+Deux profils sont disponibles via `DB_PROFILE` :
+
+- `sqlite` (défaut) : SQLite durci, avec journal WAL, `synchronous=NORMAL`,
+  `busy_timeout` et mmap appliqués à chaque connexion, et des transactions
+  `IMMEDIATE` pour que les écritures concurrentes attendent le verrou au lieu
+  d'échouer ;
+- `postgres` : PostgreSQL avec connexions persistantes (`CONN_MAX_AGE`,
+  vérification de l'état des connexions) ou, avec `DB_POOL=1`, le pool de
+  connexions intégré de psycopg.
+
+Des réplicas en lecture peuvent être déclarés : `DB_REPLICA_HOSTS` (liste
+d'hôtes séparés par des virgules) pour PostgreSQL, ou `SQLITE_REPLICA_PATH`
+pour un réplica SQLite local tenu à jour par la commande `sync_replicas`.
+Le routage des lectures est décrit dans elearning_platform/routers.py.
+"""
+import os
+import tempfile
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default=False):
+    return os.environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
+
+def sqlite_config(base_dir):
+    busy_timeout = _env_int('SQLITE_BUSY_TIMEOUT', 20000)  # millisecondes
+    mmap_size = _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)  # octets
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', base_dir / 'db.sqlite3'),
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f'PRAGMA busy_timeout={busy_timeout};'
+                f'PRAGMA mmap_size={mmap_size};'
+            ),
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Base de test dans un fichier plutôt qu'en mémoire partagée, où les
+        # écritures concurrentes échouent au lieu d'attendre le verrou
+        'TEST': {
+            'NAME': os.environ.get('SQLITE_TEST_PATH')
+            or os.path.join(tempfile.gettempdir(), f'elearning_test_{os.getpid()}.sqlite3'),
+        },
+    }
+
+
+def postgres_config():
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'elearning'),
+        'USER': os.environ.get('DB_USER', 'elearning'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': _env_int('DB_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if _env_bool('DB_POOL'):
+        # Le pool gère lui-même la durée de vie des connexions
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS']['pool'] = {
+            'min_size': _env_int('DB_POOL_MIN_SIZE', 2),
+            'max_size': _env_int('DB_POOL_MAX_SIZE', 10),
+            'timeout': _env_int('DB_POOL_TIMEOUT', 10),
+        }
+    return config
+
+
+def database_config(base_dir):
+    """Construit `DATABASES['default']` selon `DB_PROFILE`"""
+    profile = os.environ.get('DB_PROFILE', 'sqlite')
+    if profile == 'postgres':
+        return postgres_config()
+    if profile == 'sqlite':
+        return sqlite_config(base_dir)
+    raise ValueError(f"DB_PROFILE inconnu : {profile!r} (valeurs possibles : sqlite, postgres)")
+
+
+def replica_configs(base_dir, primary):
+    """Construit les alias `replica1`, `replica2`... à partir de l'environnement"""
+    replicas = {}
+    if primary['ENGINE'] == 'django.db.backends.postgresql':
+        hosts = [h.strip() for h in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if h.strip()]
+        for index, host in enumerate(hosts, 1):
+            replicas[f'replica{index}'] = {**primary, 'HOST': host}
+    elif os.environ.get('SQLITE_REPLICA_PATH'):
+        replicas['replica1'] = {**sqlite_config(base_dir), 'NAME': os.environ['SQLITE_REPLICA_PATH']}
+
+    for config in replicas.values():
+        # En test, les réplicas pointent sur la base principale
+        config['TEST'] = {'MIRROR': 'default'}
+    return replicas
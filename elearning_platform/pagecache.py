@@ -0,0 +1,136 @@
+"""
+Cache de pages complètes pour les visiteurs anonymes.
+
+Les pages publiques du catalogue (`PAGE_CACHE_VIEWS` dans settings.py) sont
+surtout vues par des visiteurs non connectés. Pour une requête GET sans
+cookie de session ni de messages, le middleware sert la page depuis le cache
+avant les sessions, la protection CSRF et le rendu des gabarits, avec un
+ETag et une réponse 304 quand le navigateur a déjà la page.
+
+La clé dépend du chemin avec sa chaîne de requête, de la langue et d'une
+génération : toute modification d'un cours, d'une catégorie ou du plan d'un
+cours (voir `courses.signals` et `bump_outline_revision`) remplace la
+génération, ce qui rend d'un coup toutes les pages en cache obsolètes sans
+avoir à les énumérer. Un certificat n'apparaît que sur ses pages de
+vérification : `invalidate_paths` supprime seulement celles-ci. Une réponse
+qui pose un cookie n'est jamais mise en cache.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.urls import Resolver404, resolve
+from django.utils import translation
+from django.utils.deprecation import MiddlewareMixin
+
+from .routers import PIN_COOKIE
+
+# Durée de vie d'une page en cache (secondes) ; 0 désactive le cache de pages
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 5)
+
+GENERATION_KEY = 'page:generation'
+# En-têtes jamais rejoués depuis le cache
+SKIPPED_HEADERS = {'set-cookie', 'vary'}
+
+
+def current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Génération perdue (éviction) : en prendre une nouvelle plutôt que de ressusciter l'ancienne
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def invalidate_pages():
+    """Rend obsolètes toutes les pages anonymes en cache"""
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def _localized():
+    return 'django.middleware.locale.LocaleMiddleware' in settings.MIDDLEWARE
+
+
+def _page_key(full_path, generation, language):
+    path = hashlib.md5(full_path.encode()).hexdigest()
+    return f'page:anon:{generation}:{language}:{path}'
+
+
+def page_key(request, generation):
+    language = translation.get_language_from_request(request) if _localized() else settings.LANGUAGE_CODE
+    return _page_key(request.get_full_path(), generation, language)
+
+
+def invalidate_paths(*full_paths):
+    """Rend obsolètes les pages en cache de ces chemins (avec leur chaîne de requête), dans toutes les langues"""
+    generation = current_generation()
+    languages = [code for code, _ in settings.LANGUAGES] if _localized() else [settings.LANGUAGE_CODE]
+    cache.delete_many([_page_key(path, generation, language) for path in full_paths for language in languages])
+
+
+def _cacheable(request):
+    if not PAGE_CACHE_TIMEOUT or request.method not in ('GET', 'HEAD'):
+        return False
+    cookies = request.COOKIES
+    if settings.SESSION_COOKIE_NAME in cookies or 'messages' in cookies or PIN_COOKIE in cookies:
+        return False
+    try:
+        return resolve(request.path_info).view_name in settings.PAGE_CACHE_VIEWS
+    except Resolver404:
+        return False
+
+
+def _etag(content):
+    return f'"{hashlib.md5(content).hexdigest()}"'
+
+
+def _not_modified(request, etag):
+    # Comparaison faible : CompressionMiddleware rend faible l'ETag des pages compressées
+    return etag in [tag.strip().removeprefix('W/') for tag in request.headers.get('If-None-Match', '').split(',')]
+
+
+class AnonymousPageCacheMiddleware(MiddlewareMixin):
+    """Sert et enregistre les pages publiques des visiteurs anonymes"""
+
+    def process_request(self, request):
+        if not _cacheable(request):
+            return None
+        key = page_key(request, current_generation())
+        entry = cache.get(key)
+        if entry is None:
+            # Page à enregistrer par process_response
+            request._page_cache_key = key
+            return None
+        if _not_modified(request, entry['etag']):
+            response = HttpResponseNotModified()
+            response['ETag'] = entry['etag']
+        else:
+            response = HttpResponse(entry['content'], status=200)
+            for header, value in entry['headers']:
+                response[header] = value
+        response['X-Page-Cache'] = 'hit'
+        return response
+
+    def process_response(self, request, response):
+        key = getattr(request, '_page_cache_key', None)
+        if (key is None or request.method != 'GET' or response.status_code != 200
+                or response.streaming or response.cookies):
+            return response
+        etag = _etag(response.content)
+        response['ETag'] = etag
+        response['X-Page-Cache'] = 'miss'
+        cache.set(key, {
+            'etag': etag,
+            'content': response.content,
+            'headers': [
+                (header, value) for header, value in response.items()
+                if header.lower() not in SKIPPED_HEADERS and header != 'X-Page-Cache'
+            ],
+        }, PAGE_CACHE_TIMEOUT)
+        if _not_modified(request, etag):
+            not_modified = HttpResponseNotModified()
+            not_modified['ETag'] = etag
+            return not_modified
+        return response
@@ -0,0 +1,107 @@
+"""
+Routage des lectures vers les réplicas.
+
+Les lectures ne partent vers un réplica que dans trois cas :
+
+- pendant une requête GET/HEAD vers une vue listée dans `REPLICA_VIEWS`
+  (catalogue public) ;
+- pour un queryset explicitement passé à `replica()` (inscrits d'un cours,
+  résultats d'un quiz) ;
+- dans un bloc `with use_replica():` (statistiques du profil instructeur).
+
+Seuls les modèles des applications de `REPLICA_APPS` sont routés ; les
+sessions et l'authentification restent sur la base principale. Après une
+requête d'écriture (POST...), l'utilisateur est épinglé sur la base
+principale pendant `REPLICA_STICKY_SECONDS` grâce à un cookie signé, pour
+qu'il relise toujours ses propres écritures malgré le retard de réplication.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.deprecation import MiddlewareMixin
+
+PIN_COOKIE = 'db_primary_pin'
+PIN_SALT = 'elearning.routers.pin'
+
+_replica_alias = ContextVar('replica_alias', default=None)
+_pinned = ContextVar('replica_pinned', default=False)
+
+
+def choose_replica():
+    """Choisit un réplica au hasard, ou la base principale s'il n'y en a pas"""
+    aliases = getattr(settings, 'REPLICA_DATABASES', [])
+    return random.choice(aliases) if aliases else DEFAULT_DB_ALIAS
+
+
+def replica(queryset):
+    """Exécute un queryset en lecture seule sur un réplica, sauf si l'utilisateur est épinglé"""
+    if _pinned.get():
+        return queryset
+    return queryset.using(choose_replica())
+
+
+@contextmanager
+def use_replica():
+    """Route toutes les lectures du bloc vers un réplica"""
+    token = _replica_alias.set(None if _pinned.get() else choose_replica())
+    try:
+        yield
+    finally:
+        _replica_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Envoie les lectures du contexte courant vers le réplica choisi"""
+
+    def db_for_read(self, model, **hints):
+        alias = _replica_alias.get()
+        if alias and model._meta.app_label in settings.REPLICA_APPS:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas et base principale contiennent les mêmes données
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Les réplicas reçoivent le schéma par réplication
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """Active le routage vers les réplicas pour les vues en lecture configurées"""
+
+    def process_request(self, request):
+        _replica_alias.set(None)
+        _pinned.set(self._is_pinned(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD') and not _pinned.get()
+                and request.resolver_match.view_name in settings.REPLICA_VIEWS):
+            _replica_alias.set(choose_replica())
+
+    def process_response(self, request, response):
+        _replica_alias.set(None)
+        _pinned.set(False)
+        user = getattr(request, 'user', None)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and user is not None and user.is_authenticated:
+            # Lire ses propres écritures : rester sur la base principale quelque temps
+            response.set_signed_cookie(
+                PIN_COOKIE, str(user.pk), salt=PIN_SALT,
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def _is_pinned(self, request):
+        if PIN_COOKIE not in request.COOKIES:
+            return False
+        pinned_user = request.get_signed_cookie(
+            PIN_COOKIE, default=None, salt=PIN_SALT, max_age=settings.REPLICA_STICKY_SECONDS
+        )
+        return pinned_user is not None and pinned_user == str(request.user.pk)
@@ -0,0 +1,409 @@
+"""
+Stockage des fichiers médias dans un service objet compatible S3.
+
+Avec `S3_BUCKET` défini, `S3Storage` devient le stockage `default` de
+settings.py (options lues dans les variables `S3_*`) : les fichiers de cours,
+images et modèles de certificats ne dépendent plus du disque d'un serveur, et
+plusieurs nœuds d'application peuvent partager les mêmes médias. Le client
+est écrit avec la bibliothèque standard :
+
+- signature AWS Signature V4, en-têtes pour les requêtes de l'application et
+  paramètres de requête pour les URL présignées ;
+- connexions HTTP persistantes réutilisées par un pool par processus
+  (`S3_MAX_POOL_CONNECTIONS`) ;
+- envoi en plusieurs parties (multipart) au-delà de
+  `S3_MULTIPART_THRESHOLD`, aussi utilisé par l'envoi par morceaux des
+  fichiers de cours (voir courses.uploads) ;
+- URL de téléchargement présignées : les navigateurs téléchargent les médias
+  directement depuis le service objet, sans passer par l'application.
+
+L'adressage est de type « chemin » (`endpoint/bucket/clé`), accepté par AWS,
+MinIO, Ceph ou Garage. `python manage.py fake_s3` lance un faux service local
+pour le développement.
+"""
+import hashlib
+import hmac
+import http.client
+import queue
+import tempfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote, urlencode, urlsplit
+
+from django.core.files.base import File
+from django.core.files.storage import Storage
+from django.utils.deconstruct import deconstructible
+
+# Taille d'une partie d'envoi multipart (octets), 5 Mio au minimum sauf pour la dernière
+MIN_PART_SIZE = 5 * 1024 * 1024
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+XML_NAMESPACE = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+
+class S3Error(OSError):
+    """Erreur renvoyée par le service ; une `OSError`, comme les erreurs du stockage sur disque"""
+
+    def __init__(self, status, code, message=''):
+        super().__init__(f'{status} {code} {message}'.strip())
+        self.status = status
+        self.code = code
+
+
+def _quote(value, safe='~'):
+    return quote(value, safe=safe)
+
+
+def _sign(key, message):
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+def _find(element, tag):
+    """Texte d'un élément XML, avec ou sans l'espace de noms S3"""
+    found = element.find(XML_NAMESPACE + tag)
+    if found is None:
+        found = element.find(tag)
+    return None if found is None else found.text
+
+
+def _findall(element, tag):
+    return element.findall(XML_NAMESPACE + tag) or element.findall(tag)
+
+
+class ConnectionPool:
+    """Connexions HTTP persistantes vers un hôte, partagées entre les threads du processus"""
+
+    def __init__(self, scheme, netloc, size, timeout):
+        self.connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        self.netloc = netloc
+        self.timeout = timeout
+        self.idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return self.connection_class(self.netloc, timeout=self.timeout)
+
+    def release(self, connection):
+        try:
+            self.idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+
+class S3Client:
+    """Client S3 minimal : objets, listes, envois multipart et URL présignées"""
+
+    def __init__(self, endpoint_url, bucket, access_key, secret_key, region='us-east-1',
+                 max_pool_connections=10, timeout=60):
+        endpoint = urlsplit(endpoint_url)
+        self.scheme, self.host = endpoint.scheme, endpoint.netloc
+        self.endpoint_url = endpoint_url.rstrip('/')
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.pool = ConnectionPool(endpoint.scheme, endpoint.netloc, max_pool_connections, timeout)
+
+    def _path(self, key=''):
+        return f'/{self.bucket}/{_quote(key, safe="/~")}' if key else f'/{self.bucket}'
+
+    def _scope(self, now):
+        return f'{now:%Y%m%d}/{self.region}/s3/aws4_request'
+
+    def _signature(self, now, method, path, query, headers, payload_hash):
+        canonical_query = '&'.join(
+            f'{_quote(key)}={_quote(value)}' for key, value in sorted(query.items())
+        )
+        signed_headers = ';'.join(sorted(headers))
+        canonical_headers = ''.join(f'{name}:{headers[name].strip()}\n' for name in sorted(headers))
+        canonical_request = '\n'.join([
+            method, path, canonical_query, canonical_headers, signed_headers, payload_hash,
+        ])
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256', f'{now:%Y%m%dT%H%M%SZ}', self._scope(now),
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        key = _sign(('AWS4' + self.secret_key).encode(), f'{now:%Y%m%d}')
+        for part in (self.region, 's3', 'aws4_request'):
+            key = _sign(key, part)
+        return signed_headers, hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    def request(self, method, key='', query=None, body=b'', headers=None, stream=False):
+        """
+        Envoie une requête signée. Retourne `(statut, en-têtes, corps)` ; avec
+        `stream`, le corps est la réponse HTTP à lire puis à passer à `release()`.
+        """
+        query = {name: str(value) for name, value in (query or {}).items()}
+        now = datetime.now(timezone.utc)
+        payload_hash = hashlib.sha256(body).hexdigest()
+        signed = {
+            'host': self.host,
+            'x-amz-content-sha256': payload_hash,
+            'x-amz-date': f'{now:%Y%m%dT%H%M%SZ}',
+            **{name.lower(): value for name, value in (headers or {}).items()},
+        }
+        path = self._path(key)
+        signed_headers, signature = self._signature(now, method, path, query, signed, payload_hash)
+        signed['authorization'] = (
+            f'AWS4-HMAC-SHA256 Credential={self.access_key}/{self._scope(now)}, '
+            f'SignedHeaders={signed_headers}, Signature={signature}'
+        )
+        url = path + ('?' + urlencode(query, quote_via=quote) if query else '')
+
+        # Une connexion réutilisée peut avoir été fermée par le serveur : un nouvel essai sur une neuve
+        for attempt in range(2):
+            connection = self.pool.acquire() if attempt == 0 else self.pool.connection_class(
+                self.pool.netloc, timeout=self.pool.timeout)
+            try:
+                connection.request(method, url, body=body, headers=signed)
+                response = connection.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionError, http.client.BadStatusLine):
+                connection.close()
+                if attempt:
+                    raise
+        if response.status >= 300:
+            data = response.read()
+            self.pool.release(connection)
+            self._raise(response.status, data)
+        if stream:
+            response.pool_connection = connection
+            return response.status, response.headers, response
+        data = response.read()
+        self.pool.release(connection)
+        return response.status, response.headers, data
+
+    def release(self, response):
+        response.read()
+        self.pool.release(response.pool_connection)
+
+    def _raise(self, status, data):
+        code, message = str(status), ''
+        try:
+            error = ET.fromstring(data)
+            code, message = _find(error, 'Code') or code, _find(error, 'Message') or ''
+        except ET.ParseError:
+            pass
+        raise S3Error(status, code, message)
+
+    # Objets
+
+    def put_object(self, key, data, content_type=None):
+        headers = {'content-type': content_type} if content_type else {}
+        self.request('PUT', key, body=data, headers=headers)
+
+    def get_object(self, key):
+        """Réponse HTTP en flux ; à passer à `release()` une fois lue"""
+        return self.request('GET', key, stream=True)[2]
+
+    def head_object(self, key):
+        return self.request('HEAD', key)[1]
+
+    def delete_object(self, key):
+        self.request('DELETE', key)
+
+    def list_objects(self, prefix='', delimiter='/'):
+        """Produit `(préfixes communs, objets)` page par page ; un objet est `(clé, taille, date)`"""
+        token = None
+        while True:
+            query = {'list-type': '2', 'prefix': prefix, 'delimiter': delimiter}
+            if token:
+                query['continuation-token'] = token
+            root = ET.fromstring(self.request('GET', query=query)[2])
+            prefixes = [_find(item, 'Prefix') for item in _findall(root, 'CommonPrefixes')]
+            objects = [
+                (_find(item, 'Key'), int(_find(item, 'Size')),
+                 datetime.fromisoformat(_find(item, 'LastModified').replace('Z', '+00:00')))
+                for item in _findall(root, 'Contents')
+            ]
+            yield prefixes, objects
+            token = _find(root, 'NextContinuationToken')
+            if _find(root, 'IsTruncated') != 'true' or not token:
+                return
+
+    # Envois multipart
+
+    def create_multipart_upload(self, key, content_type=None):
+        headers = {'content-type': content_type} if content_type else {}
+        root = ET.fromstring(self.request('POST', key, query={'uploads': ''}, headers=headers)[2])
+        return _find(root, 'UploadId')
+
+    def upload_part(self, key, upload_id, part_number, data):
+        headers = self.request('PUT', key, query={'partNumber': part_number, 'uploadId': upload_id}, body=data)[1]
+        return headers['ETag']
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        body = ''.join(
+            f'<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>' for number, etag in parts
+        )
+        self.request('POST', key, query={'uploadId': upload_id},
+                     body=f'<CompleteMultipartUpload>{body}</CompleteMultipartUpload>'.encode())
+
+    def abort_multipart_upload(self, key, upload_id):
+        try:
+            self.request('DELETE', key, query={'uploadId': upload_id})
+        except S3Error as error:
+            if error.status != 404:
+                raise
+
+    # URL présignées
+
+    def presigned_url(self, key, expires, parameters=None):
+        """URL de lecture d'un objet valable `expires` secondes, sans identifiants pour le navigateur"""
+        now = datetime.now(timezone.utc)
+        query = {
+            'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+            'X-Amz-Credential': f'{self.access_key}/{self._scope(now)}',
+            'X-Amz-Date': f'{now:%Y%m%dT%H%M%SZ}',
+            'X-Amz-Expires': str(expires),
+            'X-Amz-SignedHeaders': 'host',
+            **(parameters or {}),
+        }
+        path = self._path(key)
+        _, signature = self._signature(now, 'GET', path, query, {'host': self.host}, UNSIGNED_PAYLOAD)
+        query['X-Amz-Signature'] = signature
+        return f'{self.endpoint_url}{path}?{urlencode(query, quote_via=quote)}'
+
+
+_clients = {}
+
+
+@deconstructible
+class S3Storage(Storage):
+    """Stockage Django sur un bucket S3 (voir la docstring du module)"""
+
+    def __init__(self, bucket, endpoint_url='https://s3.amazonaws.com', access_key='', secret_key='',
+                 region='us-east-1', location='', max_pool_connections=10, multipart_threshold=16 * 1024 * 1024,
+                 multipart_chunk_size=8 * 1024 * 1024, url_expire=60 * 60, public_url=''):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.location = location.strip('/')
+        self.max_pool_connections = max_pool_connections
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunk_size = max(MIN_PART_SIZE, multipart_chunk_size)
+        # Durée de validité des URL présignées (secondes)
+        self.url_expire = url_expire
+        # Base publique (CDN, bucket public) : URL non signées
+        self.public_url = public_url
+
+    @property
+    def client(self):
+        # Un client (et son pool) par bucket pour tout le processus, quelle que soit l'instance du stockage
+        key = (self.endpoint_url, self.bucket, self.access_key)
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = S3Client(self.endpoint_url, self.bucket, self.access_key, self.secret_key,
+                                              self.region, self.max_pool_connections)
+        return client
+
+    def _key(self, name):
+        name = name.replace('\\', '/').lstrip('/')
+        return f'{self.location}/{name}' if self.location else name
+
+    # Lecture et écriture
+
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            raise ValueError("S3Storage n'ouvre les fichiers qu'en lecture")
+        try:
+            response = self.client.get_object(self._key(name))
+        except S3Error as error:
+            if error.status == 404:
+                raise FileNotFoundError(name)
+            raise
+        local = tempfile.SpooledTemporaryFile(max_size=self.multipart_chunk_size)
+        try:
+            while block := response.read(1024 * 1024):
+                local.write(block)
+        finally:
+            self.client.release(response)
+        local.seek(0)
+        return File(local, name)
+
+    def _save(self, name, content):
+        key = self._key(name)
+        content_type = getattr(content, 'content_type', None)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        if content.size is not None and content.size <= self.multipart_threshold:
+            self.client.put_object(key, content.read(), content_type)
+            return name
+        upload_id = self.start_multipart(name, content_type)
+        parts = []
+        try:
+            while data := content.read(self.multipart_chunk_size):
+                parts.append(self.upload_part(name, upload_id, len(parts) + 1, data))
+            self.complete_multipart(name, upload_id, parts)
+        except BaseException:
+            self.abort_multipart(name, upload_id)
+            raise
+        return name
+
+    def delete(self, name):
+        self.client.delete_object(self._key(name))
+
+    # Métadonnées
+
+    def _head(self, name):
+        try:
+            return self.client.head_object(self._key(name))
+        except S3Error as error:
+            if error.status == 404:
+                raise FileNotFoundError(name)
+            raise
+
+    def exists(self, name):
+        try:
+            self._head(name)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def size(self, name):
+        return int(self._head(name)['Content-Length'])
+
+    def get_modified_time(self, name):
+        return parsedate_to_datetime(self._head(name)['Last-Modified'])
+
+    def get_created_time(self, name):
+        return self.get_modified_time(name)
+
+    def get_accessed_time(self, name):
+        return self.get_modified_time(name)
+
+    def listdir(self, path):
+        prefix = self._key(path)
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        directories, files = [], []
+        for prefixes, objects in self.client.list_objects(prefix):
+            directories += [item[len(prefix):].rstrip('/') for item in prefixes]
+            files += [key[len(prefix):] for key, _, _ in objects]
+        return directories, files
+
+    # URL
+
+    def url(self, name):
+        key = self._key(name)
+        if self.public_url:
+            return f"{self.public_url.rstrip('/')}/{_quote(key, safe='/~')}"
+        return self.client.presigned_url(key, self.url_expire)
+
+    # Envois multipart (voir courses.uploads)
+
+    def start_multipart(self, name, content_type=None):
+        return self.client.create_multipart_upload(self._key(name), content_type)
+
+    def upload_part(self, name, upload_id, part_number, data):
+        return [part_number, self.client.upload_part(self._key(name), upload_id, part_number, data)]
+
+    def complete_multipart(self, name, upload_id, parts):
+        self.client.complete_multipart_upload(self._key(name), upload_id, parts)
+
+    def abort_multipart(self, name, upload_id):
+        self.client.abort_multipart_upload(self._key(name), upload_id)
@@ -0,0 +1,338 @@
+"""
+Serveur d'application de production, à processus préforkés.
+
+Le processus maître ouvre la socket d'écoute, charge l'application (modèles,
+URLs, vues, gabarits compilés) et chauffe les caches avant de créer les
+workers par `fork` : le code chargé est partagé en copie sur écriture au lieu
+d'être importé par chaque worker, et un worker accepte des requêtes dès sa
+création. Chaque worker sert les requêtes de la socket commune dans des
+threads, avec le serveur WSGI de la bibliothèque standard (`wsgiref`).
+
+Signaux du maître :
+
+- `SIGHUP` : rechargement sans coupure. Le nouveau code est d'abord vérifié
+  dans un processus à part ; s'il se charge, le maître se ré-exécute en
+  gardant la socket et son PID, charge et chauffe le nouveau code pendant que
+  les anciens workers continuent de servir, puis remplace les workers un par
+  un. Un code qui ne se charge pas laisse les anciens workers en place.
+- `SIGTERM`, `SIGINT` : arrêt ; les workers finissent les requêtes en cours
+  (au plus `graceful_timeout` secondes).
+
+Les fichiers de bytecode (`__pycache__`) sont conservés d'un déploiement à
+l'autre : Python ne recompile que les modules modifiés.
+"""
+import logging
+import os
+import select
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Nombre de workers par défaut
+SERVE_WORKERS = getattr(settings, 'SERVE_WORKERS', os.cpu_count() or 2)
+# Temps laissé aux workers pour finir leurs requêtes à l'arrêt (secondes)
+SERVE_GRACEFUL_TIMEOUT = getattr(settings, 'SERVE_GRACEFUL_TIMEOUT', 30)
+# Fonctions appelées par le maître après le chargement de l'application, avant le fork
+SERVE_WARMUP = getattr(settings, 'SERVE_WARMUP', ['courses.warmup.warm_caches'])
+
+# Signaux d'arrêt d'un worker, bloqués entre le fork et l'installation de ses gestionnaires
+WORKER_SIGNALS = {signal.SIGTERM, signal.SIGINT, signal.SIGHUP}
+
+# Variables d'environnement transmises au maître ré-exécuté par un rechargement
+LISTEN_FD_ENV = 'SERVE_LISTEN_FD'
+RETIRING_ENV = 'SERVE_RETIRING_WORKERS'
+
+
+def compile_templates():
+    """Compile tous les gabarits dans le cache du chargeur, partagé ensuite par les workers"""
+    from django.template import TemplateSyntaxError, engines
+
+    compiled = 0
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if not name.endswith(('.html', '.txt')):
+                        continue
+                    template_name = os.path.relpath(os.path.join(root, name), directory)
+                    try:
+                        engine.get_template(template_name)
+                    except TemplateSyntaxError:
+                        logger.warning("Gabarit non compilé : %s", template_name)
+                        continue
+                    compiled += 1
+    return compiled
+
+
+def load_application():
+    """Charge l'application WSGI et ses URLs"""
+    from django.core.wsgi import get_wsgi_application
+    from django.urls import get_resolver
+
+    application = get_wsgi_application()
+    get_resolver().url_patterns
+    return application
+
+
+def warm_up():
+    for path in SERVE_WARMUP:
+        began = time.perf_counter()
+        try:
+            import_string(path)()
+        except Exception:
+            # Des caches froids ralentissent les premières requêtes mais n'empêchent pas de servir
+            logger.exception("Échec du préchauffage %s", path)
+            continue
+        logger.info("%s : %.0f ms", path, (time.perf_counter() - began) * 1000)
+
+
+def release_connections():
+    """Ferme les connexions ouvertes par le maître, qui ne doivent pas être partagées avec les workers"""
+    from django.core.cache import caches
+
+    connections.close_all()
+    for cache in caches.all(initialized_only=True):
+        cache.close()
+
+
+class WorkerRequestHandler(WSGIRequestHandler):
+    """Gestionnaire d'une requête : une connexion, une requête"""
+
+    def get_environ(self):
+        # Comme Django : X_Forwarded_For ne doit pas pouvoir se faire passer pour X-Forwarded-For
+        for header in [header for header in self.headers if '_' in header]:
+            del self.headers[header]
+        return super().get_environ()
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+
+class WorkerServer(ThreadingMixIn, WSGIServer):
+    """Serveur d'un worker, sur la socket d'écoute héritée du maître"""
+    # À l'arrêt, server_close() attend la fin des requêtes en cours
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, listener, application):
+        super().__init__(listener.getsockname()[:2], WorkerRequestHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = listener
+        self.server_address = listener.getsockname()
+        host, port = self.server_address[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+        self.set_app(application)
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            # Client parti avant la fin de la réponse
+            return
+        logger.exception("Erreur en servant %s", client_address[0])
+
+
+def run_worker(listener, application):
+    """Boucle d'un worker ; retourne quand le maître demande l'arrêt"""
+    server = WorkerServer(listener, application)
+
+    def stop(signum, frame):
+        # shutdown() attend la fin de serve_forever : il doit être appelé depuis un autre thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, WORKER_SIGNALS)
+    server.serve_forever(poll_interval=0.5)
+    server.server_close()
+    connections.close_all()
+
+
+class Arbiter:
+    """Processus maître : crée, surveille et remplace les workers"""
+
+    def __init__(self, address, workers=SERVE_WORKERS, graceful_timeout=SERVE_GRACEFUL_TIMEOUT,
+                 warmup=True, pidfile=None, stdout=sys.stdout):
+        self.address = address
+        self.worker_count = workers
+        self.graceful_timeout = graceful_timeout
+        self.warmup = warmup
+        self.pidfile = pidfile
+        self.stdout = stdout
+        self.workers = set()
+        self.retiring = {}
+        self.signals = []
+        self.stopping = False
+
+    def log(self, message):
+        self.stdout.write(f"[{os.getpid()}] {message}\n")
+        self.stdout.flush()
+
+    # Démarrage
+
+    def listen(self):
+        inherited = os.environ.pop(LISTEN_FD_ENV, None)
+        if inherited is not None:
+            listener = socket.socket(fileno=int(inherited))
+        else:
+            host, port = self.address
+            family = socket.AF_INET6 if ':' in host else socket.AF_INET
+            listener = socket.socket(family, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind(self.address)
+            listener.listen(socket.SOMAXCONN)
+        # Non bloquante : un worker devancé par un autre sur accept() retourne à sa boucle
+        listener.setblocking(False)
+        listener.set_inheritable(True)
+        return listener
+
+    def run(self):
+        self.listener = self.listen()
+        # Dès maintenant : un signal reçu pendant le chargement est traité ensuite par la boucle
+        self.install_signals()
+        retiring = [int(pid) for pid in os.environ.pop(RETIRING_ENV, '').split(',') if pid]
+
+        began = time.perf_counter()
+        self.application = load_application()
+        if self.warmup:
+            warm_up()
+        release_connections()
+        self.log(f"Application chargée en {(time.perf_counter() - began) * 1000:.0f} ms")
+
+        if self.pidfile:
+            with open(self.pidfile, 'w') as pidfile:
+                pidfile.write(f'{os.getpid()}\n')
+
+        host, port = self.listener.getsockname()[:2]
+        self.log(f"Écoute sur http://{host}:{port} avec {self.worker_count} workers")
+        # Remplacement progressif des workers du code précédent, un par un
+        for index in range(self.worker_count):
+            self.spawn_worker()
+            if index < len(retiring):
+                self.retire(retiring[index])
+        for pid in retiring[self.worker_count:]:
+            self.retire(pid)
+
+        try:
+            self.loop()
+        finally:
+            if self.pidfile and os.path.exists(self.pidfile):
+                os.remove(self.pidfile)
+
+    def install_signals(self):
+        self.wakeup_read, wakeup_write = os.pipe()
+        os.set_blocking(wakeup_write, False)
+        signal.set_wakeup_fd(wakeup_write)
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, self.queue_signal)
+
+    def queue_signal(self, signum, frame):
+        self.signals.append(signum)
+
+    # Workers
+
+    def spawn_worker(self):
+        # Un SIGTERM envoyé au worker avant qu'il n'installe ses gestionnaires serait
+        # traité par ceux du maître, hérités du fork, et perdu : il reste en attente
+        signal.pthread_sigmask(signal.SIG_BLOCK, WORKER_SIGNALS)
+        pid = os.fork()
+        if pid:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, WORKER_SIGNALS)
+            self.workers.add(pid)
+            return pid
+        # Dans le worker
+        code = 0
+        try:
+            signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            os.close(self.wakeup_read)
+            run_worker(self.listener, self.application)
+        except BaseException:
+            logger.exception("Arrêt anormal du worker")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def retire(self, pid):
+        """Demande à un worker de finir ses requêtes en cours puis de s'arrêter"""
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        self.workers.discard(pid)
+        self.retiring[pid] = time.monotonic() + self.graceful_timeout
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if self.retiring.pop(pid, None) is not None:
+                continue
+            if pid in self.workers:
+                self.workers.discard(pid)
+                if not self.stopping:
+                    self.log(f"Worker {pid} arrêté (statut {status}), remplacement")
+                    self.spawn_worker()
+
+    def kill_stragglers(self):
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if deadline < now:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    self.retiring.pop(pid)
+
+    # Boucle du maître
+
+    def loop(self):
+        while True:
+            # Réveillé par un signal (voir signal.set_wakeup_fd) ou au bout d'une seconde
+            readable, _, _ = select.select([self.wakeup_read], [], [], 1.0)
+            if readable:
+                os.read(self.wakeup_read, 512)
+            while self.signals:
+                signum = self.signals.pop(0)
+                if signum == signal.SIGHUP and not self.stopping:
+                    self.reload()
+                elif signum in (signal.SIGTERM, signal.SIGINT) and not self.stopping:
+                    self.log("Arrêt demandé, fin des requêtes en cours")
+                    self.stopping = True
+                    for pid in list(self.workers):
+                        self.retire(pid)
+            self.reap()
+            self.kill_stragglers()
+            if self.stopping and not self.workers and not self.retiring:
+                self.log("Arrêt terminé")
+                return
+
+    def reload(self):
+        self.log("Rechargement : vérification du nouveau code")
+        check = subprocess.run([sys.executable, *sys.argv, '--check'], capture_output=True, text=True)
+        if check.returncode:
+            self.log(f"Nouveau code invalide, les workers actuels sont conservés :\n{check.stderr[-2000:]}")
+            return
+        self.log("Rechargement : ré-exécution du maître")
+        signal.set_wakeup_fd(-1)
+        # Ignoré jusqu'à l'installation des gestionnaires du nouveau maître (l'ignorance survit à exec)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        os.environ[LISTEN_FD_ENV] = str(self.listener.fileno())
+        os.environ[RETIRING_ENV] = ','.join(str(pid) for pid in [*self.workers, *self.retiring])
+        # Les workers en cours d'arrêt restent des enfants du maître ré-exécuté, qui les récupère
+        os.execv(sys.executable, [sys.executable, *sys.argv])
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 
+from .database import database_config, replica_configs
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,10 +50,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'elearning_platform.compression.CompressionMiddleware',
+    'elearning_platform.staticfiles.StaticFilesMiddleware',
+    'elearning_platform.pagecache.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'elearning_platform.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,13 +85,76 @@ WSGI_APPLICATION = 'elearning_platform.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Profil choisi par la variable d'environnement DB_PROFILE (sqlite ou postgres),
+# voir elearning_platform/database.py
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+    'default': database_config(BASE_DIR),
+}
+DATABASES.update(replica_configs(BASE_DIR, DATABASES['default']))
+
+# Réplicas en lecture, voir elearning_platform/routers.py
+DATABASE_ROUTERS = ['elearning_platform.routers.ReplicaRouter']
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+REPLICA_APPS = {'courses', 'quizzes', 'certificates'}
+REPLICA_VIEWS = {
+    'home',
+    'courses:home',
+    'courses:course_list',
+    'courses:course_list_by_category',
+    'courses:course_detail',
+}
+# Durée pendant laquelle un utilisateur qui vient d'écrire lit la base principale
+REPLICA_STICKY_SECONDS = 30
+
+
+# Cache
+# Cache à deux niveaux, voir elearning_platform/cache.py : LRU en mémoire du
+# processus devant un cache partagé par les workers (Redis si REDIS_URL est
+# défini, sinon un cache fichier local). Avec plusieurs workers, Redis est
+# requis : le cache fichier n'a pas d'`add` atomique, et les verrous de
+# single_flight n'empêchent plus deux reconstructions simultanées
+if os.environ.get('REDIS_URL'):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, '.cache')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
     }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'elearning_platform.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', 1000)),
+            # Familles de clés gardées en mémoire et leur durée de vie locale (secondes)
+            'LOCAL_FAMILIES': {
+                'course:outline': 300,
+                'quiz:payload': 5,
+                'page:anon': 60,
+            },
+        },
+    },
+    'shared': SHARED_CACHE,
+}
+
+# Pages publiques servies depuis le cache aux visiteurs anonymes, voir
+# elearning_platform/pagecache.py
+PAGE_CACHE_VIEWS = {
+    'home',
+    'courses:home',
+    'courses:course_list',
+    'courses:course_list_by_category',
+    'courses:course_detail',
+    'certificates:certificate_verify',
+    'certificates:certificate_verify_form',
 }
+PAGE_CACHE_TIMEOUT = 60 * 5
 
 
 # Password validation
@@ -126,10 +195,39 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Noms avec empreinte, collecte incrémentale et variantes gzip/brotli ; servis
+# par StaticFilesMiddleware avec un cache d'un an (elearning_platform/staticfiles.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'elearning_platform.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files (uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Médias dans un stockage objet compatible S3 si S3_BUCKET est défini, pour
+# que plusieurs nœuds partagent les mêmes fichiers (elearning_platform/s3.py)
+if os.environ.get('S3_BUCKET'):
+    STORAGES['default'] = {
+        'BACKEND': 'elearning_platform.s3.S3Storage',
+        'OPTIONS': {
+            'bucket': os.environ['S3_BUCKET'],
+            'endpoint_url': os.environ.get('S3_ENDPOINT_URL', 'https://s3.amazonaws.com'),
+            'access_key': os.environ.get('S3_ACCESS_KEY_ID', ''),
+            'secret_key': os.environ.get('S3_SECRET_ACCESS_KEY', ''),
+            'region': os.environ.get('S3_REGION', 'us-east-1'),
+            'location': os.environ.get('S3_LOCATION', ''),
+            'max_pool_connections': int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 10)),
+            'url_expire': int(os.environ.get('S3_URL_EXPIRE', 60 * 60)),
+            'public_url': os.environ.get('S3_PUBLIC_URL', ''),
+        },
+    }
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -143,5 +241,17 @@ LOGIN_URL = 'login'
 # Modèle utilisateur personnalisé
 AUTH_USER_MODEL = 'accounts.User'
 
+# Utilisateur connecté rechargé depuis un instantané en cache, voir
+# accounts/backends.py. ModelBackend reste listé pour les sessions ouvertes
+# avant ce changement ; il pourra être retiré après SESSION_COOKIE_AGE.
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Sessions lues dans le cache partagé, et en base seulement en cas d'absence
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'shared'
+
 # URL de base pour les liens absolus (par exemple, dans les certificats)
 BASE_URL = 'http://127.0.0.1:8000'
@@ -0,0 +1,245 @@
+"""
+Fichiers statiques : noms avec empreinte, variantes compressées et service en processus.
+
+`CompressedManifestStaticFilesStorage` (stockage `staticfiles` de settings.py)
+est le `ManifestStaticFilesStorage` de Django : chaque fichier collecté est
+copié sous un nom qui contient l'empreinte de son contenu
+(`css/site.3f2a9c.css`), et `{% static %}` renvoie ce nom. La collecte est
+incrémentale : le manifeste garde l'empreinte de la source de chaque fichier,
+et un fichier inchangé dont la copie existe déjà n'est ni relu par le
+post-traitement ni réécrit. Les CSS et JS, dont les URL internes dépendent
+des autres fichiers, sont retraités dès qu'un fichier a changé. Les fichiers texte reçoivent
+une variante gzip et, si le paquet `brotli` est installé, brotli, écrites une
+fois pour toutes puisque leur nom change avec leur contenu.
+
+`StaticFilesMiddleware` sert ces fichiers depuis le processus, sans serveur
+web devant : index des fichiers construit au démarrage, variante compressée
+choisie selon `Accept-Encoding`, cache d'un an (`immutable`) pour les noms
+avec empreinte, ETag et réponses 304.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.contrib.staticfiles.utils import matches_patterns
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Extensions compressées à la collecte
+STATIC_COMPRESS_EXTENSIONS = getattr(settings, 'STATIC_COMPRESS_EXTENSIONS', (
+    'css', 'js', 'mjs', 'map', 'json', 'svg', 'txt', 'html', 'xml', 'ico', 'ttf', 'otf', 'eot',
+))
+# Taille minimale d'un fichier compressé à la collecte (octets)
+STATIC_COMPRESS_MIN_SIZE = getattr(settings, 'STATIC_COMPRESS_MIN_SIZE', 256)
+# Durée de cache des fichiers avec empreinte (secondes)
+STATIC_MAX_AGE = getattr(settings, 'STATIC_MAX_AGE', 60 * 60 * 24 * 365)
+# Durée de cache des fichiers sans empreinte (secondes)
+STATIC_UNHASHED_MAX_AGE = getattr(settings, 'STATIC_UNHASHED_MAX_AGE', 60)
+# Cherche les fichiers sur le disque à chaque requête au lieu de l'index construit au démarrage
+STATIC_AUTOREFRESH = getattr(settings, 'STATIC_AUTOREFRESH', settings.DEBUG)
+
+# Variantes compressées, par ordre de préférence : (codage, suffixe)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress(content):
+    """Variantes compressées d'un contenu : `{suffixe: octets}`, sans celles qui ne font rien gagner"""
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content, quality=11)
+    return {suffix: data for suffix, data in variants.items() if len(data) < len(content) * 0.95}
+
+
+def accepts(header, coding):
+    """Vrai si l'en-tête `Accept-Encoding` accepte `coding` (q non nul)"""
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if name.strip().lower() in (coding, '*'):
+            match = re.search(r'q\s*=\s*([0-9.]+)', params)
+            return not match or float(match.group(1)) > 0
+    return False
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Stockage avec empreintes, collecte incrémentale et variantes compressées"""
+    # Un fichier absent du manifeste est servi sous son nom d'origine plutôt que de faire échouer la page
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def load_sources(self):
+        content = self.read_manifest()
+        return json.loads(content).get('sources', {}) if content else {}
+
+    def save_manifest(self):
+        # Entrées des fichiers inchangés, ignorés par le post-traitement
+        self.hashed_files.update(getattr(self, '_kept', {}))
+        self.manifest_hash = self.file_hash(
+            None, ContentFile(json.dumps(sorted(self.hashed_files.items())).encode())
+        )
+        payload = {
+            'paths': self.hashed_files,
+            'version': self.manifest_version,
+            'hash': self.manifest_hash,
+            'sources': getattr(self, '_sources', {}),
+        }
+        if self.manifest_storage.exists(self.manifest_name):
+            self.manifest_storage.delete(self.manifest_name)
+        self.manifest_storage._save(self.manifest_name, ContentFile(json.dumps(payload).encode()))
+
+    def post_process(self, paths, dry_run=False, **options):
+        previous, previous_sources = dict(self.hashed_files), self.load_sources()
+        self._sources, self._kept, changed = {}, {}, {}
+        unchanged = {}
+        for name, (storage, path) in paths.items():
+            digest = hashlib.md5()
+            with storage.open(path) as source:
+                for chunk in source.chunks():
+                    digest.update(chunk)
+            self._sources[name] = digest.hexdigest()
+            hash_key = self.hash_key(self.clean_name(name))
+            hashed_name = previous.get(hash_key)
+            if previous_sources.get(name) == self._sources[name] and hashed_name and self.exists(hashed_name):
+                unchanged[name] = (hash_key, hashed_name)
+            else:
+                changed[name] = (storage, path)
+        # Les CSS et JS contiennent les noms avec empreinte des autres fichiers :
+        # ils ne sont gardés tels quels que si aucun fichier n'a changé
+        stable = not changed and set(previous_sources) == set(self._sources)
+        for name, (hash_key, hashed_name) in unchanged.items():
+            if stable or not matches_patterns(paths[name][1], self._patterns):
+                self._kept[hash_key] = hashed_name
+            else:
+                changed[name] = paths[name]
+
+        final = {}
+        for name, hashed_name, processed, *rest in super().post_process(changed, dry_run=dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                final[name] = hashed_name
+            yield (name, hashed_name, processed, *rest)
+        if not dry_run:
+            for hashed_name in final.values():
+                self.write_variants(hashed_name)
+
+    def write_variants(self, name):
+        """Écrit les variantes compressées d'un fichier avec empreinte, si elles n'existent pas déjà"""
+        if name.rsplit('.', 1)[-1].lower() not in STATIC_COMPRESS_EXTENSIONS:
+            return
+        missing = [suffix for _, suffix in ENCODINGS if not self.exists(name + suffix)]
+        if not missing or self.size(name) < STATIC_COMPRESS_MIN_SIZE:
+            return
+        with self.open(name) as original:
+            content = original.read()
+        for suffix, data in compress(content).items():
+            if suffix in missing:
+                self._save(name + suffix, ContentFile(data))
+
+
+class StaticFile:
+    """Fichier statique servi et ses variantes compressées"""
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.last_modified = http_date(stat.st_mtime)
+        self.etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.max_age = STATIC_MAX_AGE if immutable else STATIC_UNHASHED_MAX_AGE
+        self.immutable = immutable
+        self.variants = [
+            (coding, path + suffix, os.path.getsize(path + suffix))
+            for coding, suffix in ENCODINGS if os.path.isfile(path + suffix)
+        ]
+
+    def serve(self, request):
+        if self.etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            response = HttpResponseNotModified()
+        else:
+            path, size, coding = self.path, self.size, None
+            accept_encoding = request.headers.get('Accept-Encoding', '')
+            for variant_coding, variant_path, variant_size in self.variants:
+                if accepts(accept_encoding, variant_coding):
+                    path, size, coding = variant_path, variant_size, variant_coding
+                    break
+            if request.method == 'HEAD':
+                response = HttpResponse(content_type=self.content_type)
+            else:
+                response = FileResponse(open(path, 'rb'), content_type=self.content_type)
+            response['Content-Length'] = size
+            response['Last-Modified'] = self.last_modified
+            if coding:
+                response['Content-Encoding'] = coding
+        response['ETag'] = self.etag
+        response['Cache-Control'] = f'public, max-age={self.max_age}' + (', immutable' if self.immutable else '')
+        if self.variants:
+            response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class StaticFilesMiddleware:
+    """Sert `STATIC_ROOT` sous `STATIC_URL` (voir la docstring du module)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else f'/{settings.STATIC_URL}'
+        self.root = settings.STATIC_ROOT
+        self.files = None if STATIC_AUTOREFRESH else self.scan()
+
+    def hashed_names(self):
+        try:
+            with open(os.path.join(self.root, ManifestStaticFilesStorage.manifest_name)) as manifest:
+                return set(json.load(manifest).get('paths', {}).values())
+        except (OSError, ValueError):
+            return set()
+
+    def scan(self):
+        """Index `nom → StaticFile` de tous les fichiers de `STATIC_ROOT`"""
+        files = {}
+        if not self.root:
+            return files
+        hashed = self.hashed_names()
+        suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        for directory, _, names in os.walk(self.root):
+            for filename in names:
+                if filename.endswith(suffixes):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                files[name] = StaticFile(path, name in hashed)
+        return files
+
+    def find(self, name):
+        if self.files is not None:
+            return self.files.get(name)
+        try:
+            path = safe_join(self.root, name)
+        except (SuspiciousFileOperation, ValueError):
+            return None
+        if not os.path.isfile(path) or path.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+            return None
+        return StaticFile(path, name in self.hashed_names())
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            static_file = self.find(request.path_info[len(self.prefix):])
+            if static_file is not None:
+                return static_file.serve(request)
+        return self.get_response(request)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Quiz, Question, Answer, QuizAttempt, QuestionResponse
+from .models import Quiz, Question, Answer, QuizAttempt, QuestionResponse, SavedAnswer
 
 class AnswerInline(admin.TabularInline):
     model = Answer
@@ -31,7 +31,7 @@ class AnswerAdmin(admin.ModelAdmin):
 
 @admin.register(QuizAttempt)
 class QuizAttemptAdmin(admin.ModelAdmin):
-    list_display = ['student', 'quiz', 'start_time', 'end_time', 'score', 'passed']
+    list_display = ['student', 'quiz', 'start_time', 'deadline', 'end_time', 'score', 'passed']
     list_filter = ['quiz', 'passed', 'start_time']
     search_fields = ['student__username', 'quiz__title']
 
@@ -40,3 +40,8 @@ class QuestionResponseAdmin(admin.ModelAdmin):
     list_display = ['attempt', 'question', 'is_correct']
     list_filter = ['attempt__quiz', 'is_correct']
     search_fields = ['text_response']
+
+@admin.register(SavedAnswer)
+class SavedAnswerAdmin(admin.ModelAdmin):
+    list_display = ['attempt', 'question', 'updated']
+    list_filter = ['attempt__quiz']
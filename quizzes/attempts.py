@@ -0,0 +1,263 @@
+"""
+Sessions de tentative de quiz suivies par le serveur.
+
+Une tentative est créée à l'ouverture du quiz avec une heure limite calculée
+à partir de `Quiz.time_limit`. Pendant la tentative, le navigateur envoie les
+réponses modifiées (deltas) au point d'enregistrement automatique. Les deltas
+sont ajoutés à un tampon append-only dans le cache, puis écrits en base par
+lots : lorsque le tampon dépasse `QUIZ_AUTOSAVE_BATCH_SIZE` deltas, lorsque le
+dernier vidage date de plus de `QUIZ_AUTOSAVE_FLUSH_INTERVAL` secondes, à la
+soumission, ou par la commande `flush_quiz_autosaves`.
+
+Les numéros de séquence des deltas et le verrou de vidage sont tenus par la
+ligne de la tentative (`autosave_seq`, `autosave_flushed`) et non par le
+cache : `add` et `incr` ne sont pas atomiques entre processus avec le cache
+fichier, et deux enregistrements simultanés pourraient recevoir le même
+numéro. Le cache ne contient que les deltas eux-mêmes, chacun sous sa propre
+clé.
+
+La soumission finale ne corrige que les réponses déjà enregistrées.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Question, QuizAttempt, QuestionResponse, SavedAnswer
+
+# Nombre de deltas en attente déclenchant un vidage
+QUIZ_AUTOSAVE_BATCH_SIZE = getattr(settings, 'QUIZ_AUTOSAVE_BATCH_SIZE', 20)
+# Délai maximal (secondes) entre deux vidages pendant une tentative active
+QUIZ_AUTOSAVE_FLUSH_INTERVAL = getattr(settings, 'QUIZ_AUTOSAVE_FLUSH_INTERVAL', 30)
+# Tolérance (secondes) accordée après l'heure limite pour la latence réseau
+QUIZ_ATTEMPT_GRACE = getattr(settings, 'QUIZ_ATTEMPT_GRACE', 30)
+
+
+def _key(attempt_id, suffix):
+    return f'quiz:attempt:{attempt_id}:{suffix}'
+
+
+def _buffer_timeout(attempt):
+    """Le tampon doit survivre jusqu'à la fin de la tentative, avec une marge"""
+    if attempt.deadline is None:
+        return 60 * 60
+    remaining = (attempt.deadline - timezone.now()).total_seconds()
+    return max(int(remaining), 0) + QUIZ_ATTEMPT_GRACE + 60 * 60
+
+
+def start_attempt(student, quiz_id, time_limit):
+    """Crée une tentative en cours dont l'heure limite est imposée par le serveur"""
+    now = timezone.now()
+    return QuizAttempt.objects.create(
+        student=student,
+        quiz_id=quiz_id,
+        deadline=now + timezone.timedelta(minutes=time_limit)
+    )
+
+
+def accepts_answers(attempt, now=None):
+    """Indique si la tentative accepte encore des réponses"""
+    if not attempt.is_in_progress:
+        return False
+    if attempt.deadline is None:
+        return True
+    now = now or timezone.now()
+    return now <= attempt.deadline + timezone.timedelta(seconds=QUIZ_ATTEMPT_GRACE)
+
+
+def remaining_seconds(attempt):
+    if attempt.deadline is None:
+        return None
+    return max(0, int((attempt.deadline - timezone.now()).total_seconds()))
+
+
+def parse_post_answers(post, questions):
+    """Convertit les champs `question_<id>` d'un formulaire en deltas"""
+    deltas = []
+    for question in questions:
+        field = f"question_{question['id']}"
+        if question['question_type'] == 'short_answer':
+            deltas.append((question['id'], [], post.get(field, '').strip()))
+        else:
+            answer_ids = [int(value) for value in post.getlist(field) if value.isdigit()]
+            deltas.append((question['id'], answer_ids, ''))
+    return deltas
+
+
+def append_answers(attempt, deltas):
+    """
+    Ajoute des deltas `(question_id, answer_ids, text)` au tampon de la tentative.
+
+    Chaque delta reçoit un numéro de séquence unique, réservé en base ; les
+    deltas ne sont jamais réécrits, le plus récent l'emporte au moment du
+    vidage. Retourne le dernier numéro réservé.
+    """
+    if not deltas:
+        return None
+    with transaction.atomic():
+        # L'UPDATE verrouille la ligne : deux enregistrements simultanés réservent des plages disjointes
+        QuizAttempt.objects.filter(id=attempt.id).update(autosave_seq=F('autosave_seq') + len(deltas))
+        last = QuizAttempt.objects.filter(id=attempt.id).values_list('autosave_seq', flat=True).get()
+    first = last - len(deltas) + 1
+    timeout = _buffer_timeout(attempt)
+    cache.add(_key(attempt.id, 'flushed_at'), time.time(), timeout)
+    cache.set_many({
+        _key(attempt.id, f'delta:{seq}'): delta
+        for seq, delta in zip(range(first, last + 1), deltas)
+    }, timeout)
+    return last
+
+
+def needs_flush(attempt, seq):
+    """Indique si le tampon doit être vidé après la réservation du numéro `seq`"""
+    if seq is None or seq <= attempt.autosave_flushed:
+        return False
+    flushed_at = cache.get(_key(attempt.id, 'flushed_at'), 0)
+    return (seq - attempt.autosave_flushed >= QUIZ_AUTOSAVE_BATCH_SIZE
+            or time.time() - flushed_at >= QUIZ_AUTOSAVE_FLUSH_INTERVAL)
+
+
+def flush_answers(attempt, final=False):
+    """
+    Écrit en base, en un seul lot, les deltas en attente de la tentative.
+
+    Un delta dont le numéro a été réservé mais pas encore écrit dans le cache
+    interrompt le vidage, sauf lors du vidage final où il est ignoré.
+    Retourne le nombre de questions mises à jour. Le vidage verrouille la
+    ligne de la tentative : un vidage ordinaire ne fait rien si un autre est
+    en cours (quand la base sait sauter les lignes verrouillées), le vidage
+    final attend la fin de l'autre.
+    """
+    with transaction.atomic():
+        locked = QuizAttempt.objects.filter(id=attempt.id)
+        if final or not connection.features.has_select_for_update_skip_locked:
+            locked = locked.select_for_update()
+        else:
+            locked = locked.select_for_update(skip_locked=True)
+        state = locked.values_list('autosave_seq', 'autosave_flushed').first()
+        if state is None:
+            return 0
+        return _flush(attempt, *state, final=final)
+
+
+def _flush(attempt, seq, flushed, final):
+    if seq <= flushed:
+        return 0
+    keys = [_key(attempt.id, f'delta:{n}') for n in range(flushed + 1, seq + 1)]
+    found = cache.get_many(keys)
+
+    latest = {}
+    last_flushed = flushed
+    for n, key in zip(range(flushed + 1, seq + 1), keys):
+        if key not in found:
+            if not final:
+                break
+            continue
+        question_id, answer_ids, text = found[key]
+        latest[question_id] = (answer_ids, text)
+        last_flushed = n
+
+    if latest:
+        valid_ids = set(Question.objects.filter(
+            quiz_id=attempt.quiz_id, id__in=latest
+        ).values_list('id', flat=True))
+        SavedAnswer.objects.bulk_create(
+            [
+                SavedAnswer(attempt_id=attempt.id, question_id=question_id,
+                            answer_ids=answer_ids, text_response=text)
+                for question_id, (answer_ids, text) in latest.items()
+                if question_id in valid_ids
+            ],
+            update_conflicts=True,
+            unique_fields=['attempt', 'question'],
+            update_fields=['answer_ids', 'text_response', 'updated'],
+        )
+
+    QuizAttempt.objects.filter(id=attempt.id).update(autosave_flushed=last_flushed)
+    attempt.autosave_seq, attempt.autosave_flushed = seq, last_flushed
+    cache.set(_key(attempt.id, 'flushed_at'), time.time(), _buffer_timeout(attempt))
+    cache.delete_many(keys[:last_flushed - flushed])
+    return len(latest)
+
+
+def saved_answers(attempt):
+    """Réponses déjà enregistrées, indexées par question"""
+    return {
+        saved.question_id: saved
+        for saved in SavedAnswer.objects.filter(attempt=attempt)
+    }
+
+
+def grade_attempt(attempt):
+    """Corrige une tentative à partir des seules réponses enregistrées"""
+    with transaction.atomic():
+        # Verrouille la tentative pour qu'une double soumission ne la corrige qu'une fois ;
+        # le vidage final se fait sous le même verrou que les vidages ordinaires
+        locked = QuizAttempt.objects.select_for_update().select_related('quiz').get(id=attempt.id)
+        if not locked.is_in_progress:
+            return locked
+        _flush(locked, locked.autosave_seq, locked.autosave_flushed, final=True)
+        return _grade(locked)
+
+
+def _grade(attempt):
+    saved = saved_answers(attempt)
+    questions = attempt.quiz.questions.order_by('order').prefetch_related('answers')
+
+    total_points = 0
+    earned_points = 0
+    responses = []
+    selections = []
+
+    for question in questions:
+        total_points += question.points
+        answers = {answer.id: answer for answer in question.answers.all()}
+        entry = saved.get(question.id)
+        answer_ids = [a for a in (entry.answer_ids if entry else []) if a in answers]
+        text_response = entry.text_response if entry else ''
+        is_correct = False
+
+        if question.question_type == 'multiple_choice':
+            correct_ids = {a.id for a in answers.values() if a.is_correct}
+            is_correct = bool(answer_ids) and set(answer_ids) == correct_ids
+        elif question.question_type in ('single_choice', 'true_false'):
+            if not answer_ids:
+                # Aucune réponse : pas d'enregistrement pour cette question
+                continue
+            answer_ids = answer_ids[:1]
+            is_correct = answers[answer_ids[0]].is_correct
+        elif question.question_type == 'short_answer':
+            # Comparer la réponse avec les réponses correctes (ignorer la casse)
+            is_correct = any(
+                text_response.lower() == a.text.lower()
+                for a in answers.values() if a.is_correct
+            )
+
+        if is_correct:
+            earned_points += question.points
+        response = QuestionResponse(
+            attempt=attempt, question=question,
+            text_response=text_response, is_correct=is_correct
+        )
+        responses.append(response)
+        selections.append(answer_ids)
+
+    score = (earned_points / total_points) * 100 if total_points > 0 else 0
+
+    QuestionResponse.objects.bulk_create(responses)
+    Selected = QuestionResponse.selected_answers.through
+    Selected.objects.bulk_create(
+        Selected(questionresponse_id=response.id, answer_id=answer_id)
+        for response, answer_ids in zip(responses, selections)
+        for answer_id in answer_ids
+    )
+    attempt.score = score
+    attempt.passed = score >= attempt.quiz.required_score_to_pass
+    attempt.end_time = timezone.now()
+    attempt.save(update_fields=['score', 'passed', 'end_time'])
+    SavedAnswer.objects.filter(attempt=attempt).delete()
+
+    return attempt
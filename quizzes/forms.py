@@ -6,13 +6,15 @@ class QuizForm(forms.ModelForm):
     
     class Meta:
         model = Quiz
-        fields = ['title', 'description', 'time_limit', 'required_score_to_pass']
+        fields = ['title', 'description', 'time_limit', 'required_score_to_pass', 'scheduled_start']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 3}),
+            'scheduled_start': forms.DateTimeInput(attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
         }
         help_texts = {
             'required_score_to_pass': 'Score minimum en pourcentage pour réussir ce quiz',
-            'time_limit': 'Temps maximum en minutes pour compléter ce quiz'
+            'time_limit': 'Temps maximum en minutes pour compléter ce quiz',
+            'scheduled_start': "Pour un examen planifié, le quiz est préchargé en cache avant cette date"
         }
 
 class QuestionForm(forms.ModelForm):
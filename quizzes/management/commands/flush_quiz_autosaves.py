@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from quizzes.attempts import accepts_answers, flush_answers, grade_attempt
+from quizzes.models import QuizAttempt
+
+
+class Command(BaseCommand):
+    help = ("Écrit en base les réponses en attente des tentatives en cours "
+            "et corrige les tentatives dont le temps est écoulé")
+
+    def handle(self, *args, **options):
+        flushed = graded = 0
+        attempts = QuizAttempt.objects.filter(end_time__isnull=True).select_related('quiz')
+        for attempt in attempts.iterator():
+            if accepts_answers(attempt):
+                if flush_answers(attempt):
+                    flushed += 1
+            else:
+                grade_attempt(attempt)
+                graded += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{flushed} tentative(s) vidée(s), {graded} tentative(s) expirée(s) corrigée(s)"))
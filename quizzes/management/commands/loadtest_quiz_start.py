@@ -0,0 +1,97 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import reverse
+
+from courses.models import Category, Course, Module
+from elearning_platform.benchmarks import scratch_database, summarize, format_summary, timer
+from elearning_platform.cache import metrics, reset_metrics
+from quizzes import payload
+from quizzes.models import Quiz, Question, Answer
+from quizzes.views import take_quiz
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Simule l'ouverture simultanée d'un quiz par une classe entière (base jetable)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--warm', action='store_true',
+                            help="Précharger le quiz avant l'ouverture (mode examen planifié)")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            quiz, students = self._seed(options['students'], options['questions'])
+            cache.clear()
+            reset_metrics()
+            if options['warm']:
+                payload.warm_quiz_payload(quiz.id)
+
+            factory = RequestFactory()
+            path = reverse('take_quiz', args=[quiz.id])
+
+            def start(student):
+                request = factory.get(path)
+                request.user = student
+                began = time.perf_counter()
+                try:
+                    response = take_quiz(request, quiz.id)
+                    return response.status_code, time.perf_counter() - began
+                except Exception as e:
+                    return type(e).__name__, time.perf_counter() - began
+                finally:
+                    connections.close_all()
+
+            with timer() as elapsed:
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    results = list(pool.map(start, students))
+
+            statuses = Counter(status for status, _ in results)
+            latencies = [latency for _, latency in results]
+            total = elapsed()
+
+        self.stdout.write(f"Démarrages : {len(results)} en {total:.2f}s "
+                          f"({len(results) / total:.0f} req/s, concurrence {options['concurrency']})")
+        self.stdout.write(f"Latence : {format_summary(summarize(latencies))}")
+        self.stdout.write(f"Statuts : {dict(statuses)}")
+        stats = metrics('quiz:payload')
+        self.stdout.write(f"Cache : {stats}")
+        if stats['builds'] > 1:
+            self.stdout.write(self.style.WARNING(
+                f"{stats['builds']} reconstructions du quiz au lieu d'une seule"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Une seule reconstruction du quiz"))
+
+    def _seed(self, student_count, question_count):
+        instructor = User.objects.create(username='loadtest_instructor', is_instructor=True)
+        category = Category.objects.create(name='Charge', slug='charge')
+        course = Course.objects.create(
+            title='Examen', slug='examen', overview='Test de charge', status='published',
+            category=category, instructor=instructor
+        )
+        module = Module.objects.create(course=course, title='Module 1', order=1)
+        quiz = Quiz.objects.create(module=module, title='Examen final')
+        questions = Question.objects.bulk_create(
+            Question(quiz=quiz, text=f'Question {i}', question_type='single_choice', order=i)
+            for i in range(1, question_count + 1)
+        )
+        Answer.objects.bulk_create(
+            Answer(question=question, text=f'Réponse {i}', is_correct=(i == 0))
+            for question in questions for i in range(4)
+        )
+        students = User.objects.bulk_create(
+            User(username=f'student_{i}', is_student=True) for i in range(student_count)
+        )
+        Enrolled = Course.students.through
+        Enrolled.objects.bulk_create(Enrolled(course=course, user=student) for student in students)
+        return quiz, students
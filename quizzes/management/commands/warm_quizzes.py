@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from quizzes.models import Quiz
+from quizzes.payload import warm_quiz_payload
+
+
+class Command(BaseCommand):
+    help = "Précharge en cache les quiz planifiés avant leur ouverture"
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int,
+                            help="Identifiants des quiz à précharger")
+        parser.add_argument('--within', type=int, default=30,
+                            help="Précharger les quiz planifiés dans les N prochaines minutes (défaut: 30)")
+
+    def handle(self, *args, **options):
+        if options['quiz_ids']:
+            quiz_ids = options['quiz_ids']
+        else:
+            now = timezone.now()
+            quiz_ids = Quiz.objects.filter(
+                scheduled_start__gte=now - timezone.timedelta(minutes=5),
+                scheduled_start__lte=now + timezone.timedelta(minutes=options['within'])
+            ).values_list('id', flat=True)
+
+        warmed = 0
+        for quiz_id in quiz_ids:
+            payload = warm_quiz_payload(quiz_id)
+            if payload is None:
+                self.stderr.write(f"Quiz {quiz_id} introuvable")
+                continue
+            warmed += 1
+            self.stdout.write(f"Quiz {quiz_id} préchargé ({len(payload['questions'])} questions)")
+
+        self.stdout.write(self.style.SUCCESS(f"{warmed} quiz préchargé(s)"))
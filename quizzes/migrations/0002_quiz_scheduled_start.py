@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='scheduled_start',
+            field=models.DateTimeField(blank=True, help_text="Début planifié de l'examen (optionnel)", null=True),
+        ),
+    ]
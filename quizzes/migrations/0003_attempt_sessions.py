@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 15:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0002_quiz_scheduled_start'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='deadline',
+            field=models.DateTimeField(blank=True, help_text='Heure limite de soumission imposée par le serveur', null=True),
+        ),
+        migrations.CreateModel(
+            name='SavedAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answer_ids', models.JSONField(blank=True, default=list)),
+                ('text_response', models.TextField(blank=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_answers', to='quizzes.quizattempt')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_answers', to='quizzes.question')),
+            ],
+            options={
+                'unique_together': {('attempt', 'question')},
+            },
+        ),
+    ]
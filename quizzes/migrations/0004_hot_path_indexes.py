@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 15:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0003_attempt_sessions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['student', 'quiz', '-start_time'], name='attempt_student_quiz_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['student', '-start_time'], name='attempt_student_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', '-start_time'], name='attempt_quiz_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(condition=models.Q(('passed', True)), fields=['student', 'quiz'], name='attempt_passed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(condition=models.Q(('end_time__isnull', True)), fields=['student', 'quiz'], name='attempt_in_progress_idx'),
+        ),
+    ]
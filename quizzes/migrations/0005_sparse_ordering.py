@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-19 15:57
+
+from django.db import migrations
+
+ORDER_GAP = 1024
+
+
+def _renumber(model, parent):
+    """Réattribue des clés espacées dans l'ordre actuel de chaque parent, par lots"""
+    items = []
+    position = {}
+    for item in model.objects.order_by(parent, 'order', 'id').only('id', parent, 'order'):
+        key = getattr(item, parent)
+        position[key] = position.get(key, 0) + 1
+        item.order = position[key] * ORDER_GAP
+        items.append(item)
+    model.objects.bulk_update(items, ['order'], batch_size=1000)
+
+
+def renumber_with_gaps(apps, schema_editor):
+    _renumber(apps.get_model('quizzes', 'Question'), 'quiz_id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='question',
+            options={'ordering': ['order', 'id']},
+        ),
+        migrations.RunPython(renumber_with_gaps, migrations.RunPython.noop),
+    ]
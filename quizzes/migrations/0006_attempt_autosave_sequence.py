@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-19 16:55
+
+from django.core.cache import cache
+from django.db import migrations, models
+
+
+def copy_cached_counters(apps, schema_editor):
+    """Reprend les compteurs du cache des tentatives en cours, pour ne pas réutiliser leurs numéros"""
+    QuizAttempt = apps.get_model('quizzes', 'QuizAttempt')
+    for attempt_id in QuizAttempt.objects.filter(end_time__isnull=True).values_list('id', flat=True).iterator():
+        prefix = f'quiz:attempt:{attempt_id}'
+        values = cache.get_many([f'{prefix}:seq', f'{prefix}:flushed'])
+        if values:
+            QuizAttempt.objects.filter(id=attempt_id).update(
+                autosave_seq=values.get(f'{prefix}:seq', 0), autosave_flushed=values.get(f'{prefix}:flushed', 0)
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0005_sparse_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='autosave_flushed',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='autosave_seq',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(copy_cached_counters, migrations.RunPython.noop),
+    ]
@@ -13,6 +13,7 @@ class Quiz(models.Model):
     updated = models.DateTimeField(auto_now=True)
     time_limit = models.PositiveIntegerField(help_text="Durée en minutes", default=30)
     required_score_to_pass = models.PositiveIntegerField(help_text="Score minimum pour réussir en %", default=70)
+    scheduled_start = models.DateTimeField(null=True, blank=True, help_text="Début planifié de l'examen (optionnel)")
     
     class Meta:
         verbose_name_plural = "Quizzes"
@@ -36,7 +37,7 @@ class Question(models.Model):
     order = models.PositiveIntegerField(default=0)
     
     class Meta:
-        ordering = ['order']
+        ordering = ['order', 'id']
     
     def __str__(self):
         return f"Question {self.order}: {self.text[:50]}..."
@@ -56,11 +57,34 @@ class QuizAttempt(models.Model):
     quiz = models.ForeignKey(Quiz, related_name='attempts', on_delete=models.CASCADE)
     start_time = models.DateTimeField(auto_now_add=True)
     end_time = models.DateTimeField(null=True, blank=True)
+    deadline = models.DateTimeField(null=True, blank=True, help_text="Heure limite de soumission imposée par le serveur")
     score = models.FloatField(null=True, blank=True)
     passed = models.BooleanField(default=False)
+    # Tampon d'enregistrement automatique (voir quizzes.attempts) : numéros réservés et numéros écrits en base
+    autosave_seq = models.PositiveIntegerField(default=0, editable=False)
+    autosave_flushed = models.PositiveIntegerField(default=0, editable=False)
+    
+    class Meta:
+        indexes = [
+            # Tentatives d'un étudiant pour un quiz, les plus récentes d'abord
+            models.Index(fields=['student', 'quiz', '-start_time'], name='attempt_student_quiz_idx'),
+            # Historique d'un étudiant et résultats d'un quiz
+            models.Index(fields=['student', '-start_time'], name='attempt_student_start_idx'),
+            models.Index(fields=['quiz', '-start_time'], name='attempt_quiz_start_idx'),
+            # Index partiels : quiz déjà réussi, tentative en cours
+            models.Index(fields=['student', 'quiz'], condition=models.Q(passed=True),
+                         name='attempt_passed_idx'),
+            models.Index(fields=['student', 'quiz'], condition=models.Q(end_time__isnull=True),
+                         name='attempt_in_progress_idx'),
+        ]
     
     def __str__(self):
         return f"Tentative de {self.student.username} pour {self.quiz.title}"
+    
+    @property
+    def is_in_progress(self):
+        """Une tentative est en cours tant qu'elle n'a pas été soumise"""
+        return self.end_time is None
 
 class QuestionResponse(models.Model):
     """Réponse d'un étudiant à une question spécifique"""
@@ -72,3 +96,17 @@ class QuestionResponse(models.Model):
     
     def __str__(self):
         return f"Réponse à {self.question}"
+
+class SavedAnswer(models.Model):
+    """Réponse enregistrée automatiquement pendant une tentative en cours"""
+    attempt = models.ForeignKey(QuizAttempt, related_name='saved_answers', on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, related_name='saved_answers', on_delete=models.CASCADE)
+    answer_ids = models.JSONField(default=list, blank=True)
+    text_response = models.TextField(blank=True)
+    updated = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['attempt', 'question']
+    
+    def __str__(self):
+        return f"Réponse enregistrée à {self.question} ({self.attempt})"
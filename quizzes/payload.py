@@ -0,0 +1,97 @@
+"""
+Charge utile pré-calculée d'un quiz, partagée par tous les étudiants.
+
+Lorsqu'une classe entière ouvre le même quiz dans la même minute, chaque
+requête `take_quiz` reconstruirait le quiz depuis la base. On construit donc
+une seule fois une structure sérialisable (quiz, questions, réponses sans les
+indications de correction) que l'on garde en cache. Les reconstructions
+concurrentes sont fusionnées par `single_flight` (voir
+elearning_platform/cache.py) ; les compteurs de la famille `quiz:payload`
+mesurent succès, absences, reconstructions et attentes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from elearning_platform.cache import single_flight
+from .models import Quiz
+
+# Durée de vie par défaut d'une charge utile en cache (secondes)
+QUIZ_PAYLOAD_TIMEOUT = getattr(settings, 'QUIZ_PAYLOAD_TIMEOUT', 60 * 15)
+# Durée maximale pendant laquelle un processus garde le verrou de reconstruction
+QUIZ_PAYLOAD_LOCK_TIMEOUT = getattr(settings, 'QUIZ_PAYLOAD_LOCK_TIMEOUT', 10)
+# Temps d'attente maximal d'un processus qui n'a pas obtenu le verrou
+QUIZ_PAYLOAD_WAIT = getattr(settings, 'QUIZ_PAYLOAD_WAIT', 2.0)
+
+
+def payload_key(quiz_id):
+    return f'quiz:payload:{quiz_id}'
+
+
+def build_quiz_payload(quiz_id):
+    """Construit la charge utile d'un quiz en deux requêtes"""
+    quiz = Quiz.objects.select_related('module__course').filter(id=quiz_id).first()
+    if quiz is None:
+        return None
+
+    module = quiz.module
+    course = module.course
+    questions = quiz.questions.order_by('order').prefetch_related('answers')
+
+    return {
+        'id': quiz.id,
+        'title': quiz.title,
+        'description': quiz.description,
+        'time_limit': quiz.time_limit,
+        'required_score_to_pass': quiz.required_score_to_pass,
+        'scheduled_start': quiz.scheduled_start,
+        'module': {'id': module.id, 'title': module.title},
+        'course': {'id': course.id, 'slug': course.slug, 'title': course.title},
+        'questions': [
+            {
+                'id': question.id,
+                'text': question.text,
+                'question_type': question.question_type,
+                'points': question.points,
+                # Les indications de correction ne quittent jamais la base
+                'answers': [
+                    {'id': answer.id, 'text': answer.text}
+                    for answer in question.answers.all()
+                ],
+            }
+            for question in questions
+        ],
+    }
+
+
+def _payload_timeout(payload):
+    """Épingle la charge utile jusqu'à la fin de la fenêtre d'examen planifiée"""
+    scheduled_start = payload.get('scheduled_start')
+    if not scheduled_start:
+        return QUIZ_PAYLOAD_TIMEOUT
+    window_end = scheduled_start + timezone.timedelta(minutes=payload['time_limit'])
+    remaining = (window_end - timezone.now()).total_seconds()
+    return max(int(remaining) + QUIZ_PAYLOAD_TIMEOUT, QUIZ_PAYLOAD_TIMEOUT)
+
+
+def get_quiz_payload(quiz_id):
+    """
+    Retourne la charge utile d'un quiz depuis le cache, en la reconstruisant
+    au plus une fois en cas d'absence. Retourne None si le quiz n'existe pas.
+    """
+    return single_flight(
+        payload_key(quiz_id), lambda: build_quiz_payload(quiz_id), _payload_timeout,
+        lock_timeout=QUIZ_PAYLOAD_LOCK_TIMEOUT, wait=QUIZ_PAYLOAD_WAIT
+    )
+
+
+def warm_quiz_payload(quiz_id):
+    """Reconstruit et épingle la charge utile d'un quiz avant son ouverture"""
+    payload = build_quiz_payload(quiz_id)
+    if payload is not None:
+        cache.set(payload_key(quiz_id), payload, _payload_timeout(payload))
+    return payload
+
+
+def invalidate_quiz_payload(quiz_id):
+    cache.delete(payload_key(quiz_id))
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from courses.models import Module
+from courses.outline import bump_outline_revision
+from .models import Quiz, Question, Answer
+from elearning_platform.cache import invalidate_on
+from .payload import invalidate_quiz_payload, payload_key
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def quiz_changed(sender, instance, **kwargs):
+    """Invalide la charge utile en cache lorsqu'un quiz est modifié"""
+    invalidate_quiz_payload(instance.id)
+    # Les identifiants des quiz font partie du plan du cours
+    course_id = Module.objects.filter(id=instance.module_id).values_list('course_id', flat=True).first()
+    if course_id:
+        bump_outline_revision(course_id)
+
+
+invalidate_on(Question, keys=lambda question: [payload_key(question.quiz_id)])
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    # La question peut déjà avoir été supprimée lors d'une suppression en cascade
+    quiz_id = Question.objects.filter(id=instance.question_id).values_list('quiz_id', flat=True).first()
+    if quiz_id:
+        invalidate_quiz_payload(quiz_id)
@@ -1,3 +1,169 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.tests import CacheTestCase, make_course
+from elearning_platform.benchmarks import scratch_caches
+from .attempts import (
+    accepts_answers, append_answers, flush_answers, grade_attempt, start_attempt, QUIZ_ATTEMPT_GRACE
+)
+from .models import Answer, Question, Quiz, QuizAttempt, SavedAnswer
+from .payload import get_quiz_payload, payload_key
+
+User = get_user_model()
+
+
+class QuizTestCase(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        instructor = User.objects.create_user('prof', password='x', is_instructor=True)
+        self.student = User.objects.create_user('alice', password='x', is_student=True)
+        course = make_course(instructor, modules=1)
+        course.students.add(self.student)
+        module = course.modules.get()
+        self.quiz = Quiz.objects.create(module=module, title='Bilan', time_limit=10, required_score_to_pass=50)
+        self.single = Question.objects.create(quiz=self.quiz, text='2 + 2 ?', question_type='single_choice',
+                                              order=1)
+        self.right = Answer.objects.create(question=self.single, text='4', is_correct=True)
+        self.wrong = Answer.objects.create(question=self.single, text='5')
+        self.short = Question.objects.create(quiz=self.quiz, text='Capitale de la France ?',
+                                             question_type='short_answer', order=2)
+        Answer.objects.create(question=self.short, text='Paris', is_correct=True)
+
+
+class PayloadTests(QuizTestCase):
+
+    def test_payload_is_built_once(self):
+        payload = get_quiz_payload(self.quiz.id)
+        self.assertEqual([question['id'] for question in payload['questions']], [self.single.id, self.short.id])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_quiz_payload(self.quiz.id), payload)
+
+    def test_payload_hides_correct_answers(self):
+        answers = get_quiz_payload(self.quiz.id)['questions'][0]['answers']
+        self.assertEqual(answers, [{'id': self.right.id, 'text': '4'}, {'id': self.wrong.id, 'text': '5'}])
+
+    def test_edits_invalidate_the_payload(self):
+        for edit in (lambda: Answer.objects.create(question=self.single, text='22'),
+                     lambda: Question.objects.filter(id=self.short.id).get().save(),
+                     lambda: Quiz.objects.get(id=self.quiz.id).save()):
+            get_quiz_payload(self.quiz.id)
+            edit()
+            self.assertIsNone(cache.get(payload_key(self.quiz.id)))
+
+    def test_missing_quiz(self):
+        self.assertIsNone(get_quiz_payload(self.quiz.id + 1000))
+
+
+class AttemptTests(QuizTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.attempt = start_attempt(self.student, self.quiz.id, self.quiz.time_limit)
+
+    def test_deadline_has_a_grace_period(self):
+        self.assertTrue(accepts_answers(self.attempt))
+        late = self.attempt.deadline + timezone.timedelta(seconds=QUIZ_ATTEMPT_GRACE)
+        self.assertTrue(accepts_answers(self.attempt, now=late))
+        self.assertFalse(accepts_answers(self.attempt, now=late + timezone.timedelta(seconds=1)))
+
+    def test_latest_delta_wins_on_flush(self):
+        self.assertEqual(append_answers(self.attempt, [(self.single.id, [self.wrong.id], ''),
+                                                       (self.short.id, [], 'Lyon')]), 2)
+        self.assertEqual(append_answers(self.attempt, [(self.short.id, [], 'Paris')]), 3)
+        self.assertEqual(flush_answers(self.attempt), 2)
+        saved = {answer.question_id: answer for answer in SavedAnswer.objects.filter(attempt=self.attempt)}
+        self.assertEqual(saved[self.single.id].answer_ids, [self.wrong.id])
+        self.assertEqual(saved[self.short.id].text_response, 'Paris')
+        # Rien de nouveau : le vidage suivant n'écrit rien
+        self.assertEqual(flush_answers(self.attempt), 0)
+        self.assertEqual(QuizAttempt.objects.values_list('autosave_seq', 'autosave_flushed').get(), (3, 3))
+
+    def test_flush_stops_at_a_missing_delta(self):
+        append_answers(self.attempt, [(self.single.id, [self.wrong.id], '')])
+        # Numéro réservé dont le delta n'est pas encore dans le cache
+        QuizAttempt.objects.filter(id=self.attempt.id).update(autosave_seq=2)
+        append_answers(self.attempt, [(self.short.id, [], 'Paris')])
+        self.assertEqual(flush_answers(self.attempt), 1)
+        self.assertEqual(QuizAttempt.objects.values_list('autosave_flushed', flat=True).get(), 1)
+
+    def test_grading_uses_buffered_answers(self):
+        append_answers(self.attempt, [(self.single.id, [self.right.id], ''), (self.short.id, [], 'paris')])
+        attempt = grade_attempt(self.attempt)
+        self.assertEqual((attempt.score, attempt.passed), (100, True))
+        self.assertFalse(SavedAnswer.objects.filter(attempt=self.attempt).exists())
+        # Une seconde soumission ne corrige pas de nouveau
+        self.assertEqual(grade_attempt(self.attempt).end_time, attempt.end_time)
+
+    def test_submit_grades_the_answers_on_screen(self):
+        self.client.force_login(self.student)
+        response = self.client.post(reverse('take_quiz', args=[self.quiz.id]), {
+            f'question_{self.single.id}': str(self.right.id), f'question_{self.short.id}': 'Marseille',
+        })
+        self.assertRedirects(response, reverse('quiz_result', args=[self.attempt.id]),
+                             fetch_redirect_response=False)
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.score, 50)
+
+
+@override_settings(CACHES=scratch_caches())
+class ConcurrentAutosaveTests(TransactionTestCase):
+    """Enregistrements automatiques simultanés d'une même tentative"""
+
+    def setUp(self):
+        cache.clear()
+        instructor = User.objects.create_user('prof', password='x', is_instructor=True)
+        student = User.objects.create_user('alice', password='x', is_student=True)
+        quiz = Quiz.objects.create(module=make_course(instructor, modules=1).modules.get(), title='Bilan')
+        self.questions = [Question.objects.create(quiz=quiz, text=f'Question {number}',
+                                                  question_type='short_answer', order=number)
+                          for number in range(8)]
+        self.attempt = start_attempt(student, quiz.id, quiz.time_limit)
+
+    def run_threads(self, target, count):
+        barrier = threading.Barrier(count)
+        errors = []
+
+        def run(number):
+            try:
+                barrier.wait()
+                target(number)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(number,)) for number in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_appends_get_distinct_sequence_numbers(self):
+        reserved = []
+
+        def autosave(number):
+            for round_ in range(5):
+                reserved.append(append_answers(self.attempt, [(self.questions[number].id, [], f'{number}-{round_}'),
+                                                              (self.questions[number].id, [], f'{number}-fin')]))
+
+        self.run_threads(autosave, len(self.questions))
+        self.assertEqual(sorted(reserved), list(range(2, 81, 2)))
+        self.assertEqual(flush_answers(self.attempt), len(self.questions))
+        self.assertEqual(dict(SavedAnswer.objects.values_list('question_id', 'text_response')),
+                         {question.id: f'{number}-fin' for number, question in enumerate(self.questions)})
+
+    def test_concurrent_flushes_write_each_delta_once(self):
+        for number, question in enumerate(self.questions):
+            append_answers(self.attempt, [(question.id, [], f'réponse {number}')])
+        flushed = []
+        self.run_threads(lambda number: flushed.append(flush_answers(self.attempt)), 4)
+        self.assertEqual(sum(flushed), len(self.questions))
+        self.assertEqual(SavedAnswer.objects.count(), len(self.questions))
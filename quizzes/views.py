@@ -1,12 +1,21 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, Http404, JsonResponse
+from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.utils import timezone
 from django.forms import inlineformset_factory
+import json
 
-from .models import Quiz, Question, Answer, QuizAttempt, QuestionResponse
+from .models import Quiz, Question, Answer, QuizAttempt
 from courses.models import Module
+from courses.ordering import next_order, apply_order
+from elearning_platform.asyncutils import arender, aevaluate
+from elearning_platform.routers import replica
+from .payload import get_quiz_payload, invalidate_quiz_payload
+from .attempts import (
+    start_attempt, accepts_answers, remaining_seconds, parse_post_answers,
+    append_answers, needs_flush, flush_answers, saved_answers, grade_attempt
+)
 from .forms import (
     QuizForm, QuestionForm, AnswerFormSet, 
     MultipleChoiceResponseForm, SingleChoiceResponseForm,
@@ -18,156 +27,121 @@ from .forms import (
 @login_required
 def take_quiz(request, quiz_id):
     """Vue pour passer un quiz"""
-    quiz = get_object_or_404(Quiz, id=quiz_id)
-    module = quiz.module
-    course = module.course
+    # La structure du quiz est partagée par tous les étudiants et servie depuis le cache
+    payload = get_quiz_payload(quiz_id)
+    if payload is None:
+        raise Http404("Quiz introuvable")
+    course_slug = payload['course']['slug']
     
     # Vérifier si l'étudiant est inscrit au cours
-    if not course.students.filter(id=request.user.id).exists():
+    if not request.user.courses_enrolled.filter(id=payload['course']['id']).exists():
         messages.error(request, "Vous devez être inscrit au cours pour passer ce quiz.")
-        return redirect('courses:course_detail', slug=course.slug)
+        return redirect('courses:course_detail', slug=course_slug)
     
     # Vérifier si l'étudiant a déjà une tentative réussie
     passed_attempt = QuizAttempt.objects.filter(
-        student=request.user, quiz=quiz, passed=True
+        student=request.user, quiz_id=quiz_id, passed=True
     ).exists()
     
     if passed_attempt:
         messages.info(request, "Vous avez déjà réussi ce quiz.")
-        return redirect('courses:module_content', slug=course.slug, module_id=module.id)
+        return redirect('courses:module_content', slug=course_slug, module_id=payload['module']['id'])
+    
+    # Reprendre la tentative en cours, ou en ouvrir une nouvelle
+    attempt = QuizAttempt.objects.filter(
+        student=request.user, quiz_id=quiz_id, end_time__isnull=True
+    ).order_by('-start_time').first()
+    
+    if attempt and not accepts_answers(attempt):
+        # Temps écoulé : seules les réponses déjà enregistrées sont corrigées
+        grade_attempt(attempt)
+        messages.warning(request, "Le temps imparti est écoulé. Vos réponses enregistrées ont été corrigées.")
+        return redirect('quiz_result', attempt_id=attempt.id)
     
-    # Créer une nouvelle tentative
     if request.method == 'POST':
-        # Créer une tentative
-        attempt = QuizAttempt.objects.create(
-            student=request.user,
-            quiz=quiz,
-            start_time=timezone.now()
-        )
-        
-        # Traiter les réponses
-        questions = quiz.questions.all().order_by('order')
-        total_points = sum(question.points for question in questions)
-        earned_points = 0
-        
-        for question in questions:
-            is_correct = False
-            
-            if question.question_type == 'multiple_choice':
-                # Gérer les questions à choix multiples
-                selected_answer_ids = request.POST.getlist(f'question_{question.id}')
-                selected_answers = Answer.objects.filter(id__in=selected_answer_ids, question=question)
-                
-                # Vérifier si toutes les bonnes réponses sont sélectionnées et aucune mauvaise réponse
-                correct_answers = question.answers.filter(is_correct=True)
-                if (set(selected_answers) == set(correct_answers)) and len(selected_answers) > 0:
-                    is_correct = True
-                    earned_points += question.points
-                
-                # Créer la réponse à la question
-                question_response = QuestionResponse.objects.create(
-                    attempt=attempt,
-                    question=question,
-                    is_correct=is_correct
-                )
-                question_response.selected_answers.set(selected_answers)
-                
-            elif question.question_type == 'single_choice':
-                # Gérer les questions à choix unique
-                selected_answer_id = request.POST.get(f'question_{question.id}')
-                if selected_answer_id:
-                    selected_answer = get_object_or_404(Answer, id=selected_answer_id, question=question)
-                    
-                    # Vérifier si la réponse est correcte
-                    if selected_answer.is_correct:
-                        is_correct = True
-                        earned_points += question.points
-                    
-                    # Créer la réponse à la question
-                    question_response = QuestionResponse.objects.create(
-                        attempt=attempt,
-                        question=question,
-                        is_correct=is_correct
-                    )
-                    question_response.selected_answers.add(selected_answer)
-                    
-            elif question.question_type == 'true_false':
-                # Gérer les questions vrai/faux
-                selected_answer_id = request.POST.get(f'question_{question.id}')
-                if selected_answer_id:
-                    selected_answer = get_object_or_404(Answer, id=selected_answer_id, question=question)
-                    
-                    # Vérifier si la réponse est correcte
-                    if selected_answer.is_correct:
-                        is_correct = True
-                        earned_points += question.points
-                    
-                    # Créer la réponse à la question
-                    question_response = QuestionResponse.objects.create(
-                        attempt=attempt,
-                        question=question,
-                        is_correct=is_correct
-                    )
-                    question_response.selected_answers.add(selected_answer)
-                    
-            elif question.question_type == 'short_answer':
-                # Gérer les questions à réponse courte
-                text_response = request.POST.get(f'question_{question.id}', '').strip()
-                
-                # Ici, on pourrait comparer avec des réponses attendues ou faire une analyse plus avancée
-                correct_answers = Answer.objects.filter(question=question, is_correct=True)
-                # Comparer la réponse avec les réponses correctes (ignorer la casse)
-                for answer in correct_answers:
-                    if text_response.lower() == answer.text.lower():
-                        is_correct = True
-                        earned_points += question.points
-                        break
-                
-                # Créer la réponse à la question
-                QuestionResponse.objects.create(
-                    attempt=attempt,
-                    question=question,
-                    text_response=text_response,
-                    is_correct=is_correct
-                )
-        
-        # Calculer le score final et déterminer si l'étudiant a réussi
-        if total_points > 0:
-            score = (earned_points / total_points) * 100
-        else:
-            score = 0
-        
-        passed = score >= quiz.required_score_to_pass
-        
-        attempt.score = score
-        attempt.passed = passed
-        attempt.end_time = timezone.now()
-        attempt.save()
+        if attempt is None:
+            return redirect('take_quiz', quiz_id=quiz_id)
         
+        # Les réponses visibles à l'écran forment le dernier delta de la tentative
+        append_answers(attempt, parse_post_answers(request.POST, payload['questions']))
+        grade_attempt(attempt)
         return redirect('quiz_result', attempt_id=attempt.id)
-        
+    
+    if attempt is None:
+        attempt = start_attempt(request.user, quiz_id, payload['time_limit'])
+        saved = {}
     else:
-        questions = quiz.questions.all().order_by('order')
-        
-        return render(request, 'quizzes/take_quiz.html', {
-            'quiz': quiz,
-            'questions': questions,
-            'course': course,
-            'module': module,
+        flush_answers(attempt)
+        saved = saved_answers(attempt)
+    
+    # Pré-remplir les réponses déjà enregistrées lors d'une reprise
+    questions = []
+    for question in payload['questions']:
+        entry = saved.get(question['id'])
+        questions.append({
+            **question,
+            'saved_answer_ids': entry.answer_ids if entry else [],
+            'saved_text': entry.text_response if entry else '',
         })
+    
+    return render(request, 'quizzes/take_quiz.html', {
+        'quiz': payload,
+        'questions': questions,
+        'course': payload['course'],
+        'module': payload['module'],
+        'attempt': attempt,
+        'remaining_seconds': remaining_seconds(attempt),
+    })
 
 @login_required
-def quiz_result(request, attempt_id):
-    """Affichage des résultats d'une tentative de quiz"""
+@require_POST
+def autosave_attempt(request, attempt_id):
+    """Enregistre les réponses modifiées d'une tentative en cours"""
     attempt = get_object_or_404(QuizAttempt, id=attempt_id, student=request.user)
+    
+    if not accepts_answers(attempt):
+        return JsonResponse({'success': False, 'error': 'Tentative terminée ou temps écoulé'}, status=409)
+    
+    try:
+        data = json.loads(request.body)
+        deltas = [
+            (int(item['question']), [int(a) for a in item.get('answers', [])], str(item.get('text', '')).strip())
+            for item in data.get('answers', [])
+        ]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Données invalides'}, status=400)
+    
+    seq = append_answers(attempt, deltas)
+    flushed = needs_flush(attempt, seq) and flush_answers(attempt) > 0
+    
+    return JsonResponse({
+        'success': True,
+        'received': len(deltas),
+        'flushed': flushed,
+        'remaining_seconds': remaining_seconds(attempt),
+    })
+
+@login_required
+async def quiz_result(request, attempt_id):
+    """Affichage des résultats d'une tentative de quiz"""
+    user = await request.auser()
+    attempt = await aget_object_or_404(
+        QuizAttempt.objects.select_related('quiz__module__course'), id=attempt_id, student=user
+    )
     quiz = attempt.quiz
     module = quiz.module
     course = module.course
     
+    # Une tentative en cours n'a pas encore de résultat
+    if attempt.is_in_progress:
+        return redirect('take_quiz', quiz_id=quiz.id)
+    
     # Récupérer les réponses données
-    responses = attempt.responses.all()
+    responses = await aevaluate(
+        attempt.responses.select_related('question').prefetch_related('selected_answers')
+    )
     
-    return render(request, 'quizzes/quiz_result.html', {
+    return await arender(request, 'quizzes/quiz_result.html', {
         'attempt': attempt,
         'quiz': quiz,
         'course': course,
@@ -178,7 +152,7 @@ def quiz_result(request, attempt_id):
 @login_required
 def student_quiz_attempts(request):
     """Affichage de l'historique des tentatives de quiz d'un étudiant"""
-    attempts = QuizAttempt.objects.filter(student=request.user).order_by('-start_time')
+    attempts = QuizAttempt.objects.filter(student=request.user, end_time__isnull=False).order_by('-start_time')
     
     return render(request, 'quizzes/student_quiz_attempts.html', {
         'attempts': attempts
@@ -287,15 +261,13 @@ def create_question(request, quiz_id):
     module = quiz.module
     course = module.course
     
-    # Déterminer l'ordre de la nouvelle question
-    next_order = quiz.questions.count() + 1
-    
     if request.method == 'POST':
         form = QuestionForm(request.POST)
         if form.is_valid():
             question = form.save(commit=False)
             question.quiz = quiz
-            question.order = next_order
+            # Placer la question à la fin du quiz
+            question.order = next_order(quiz.questions.all())
             question.save()
             
             # Rediriger pour ajouter les réponses à la question
@@ -311,6 +283,23 @@ def create_question(request, quiz_id):
         'course': course
     })
 
+@login_required
+@require_POST
+def reorder_questions(request, quiz_id):
+    """Applique l'ordre des questions issu d'un glisser-déposer, en une seule requête"""
+    if not request.user.is_instructor:
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+    
+    quiz = get_object_or_404(Quiz, id=quiz_id, module__course__instructor=request.user)
+    try:
+        apply_order(quiz.questions.all(), json.loads(request.body).get('order', []))
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Ordre invalide'}, status=400)
+    
+    # L'UPDATE groupé ne déclenche pas de signaux : invalider la charge utile du quiz
+    invalidate_quiz_payload(quiz.id)
+    return JsonResponse({'success': True})
+
 @login_required
 def edit_question(request, question_id):
     """Modification d'une question et de ses réponses"""
@@ -385,7 +374,7 @@ def quiz_results(request, quiz_id):
     module = quiz.module
     course = module.course
     
-    attempts = QuizAttempt.objects.filter(quiz=quiz).order_by('-start_time')
+    attempts = replica(QuizAttempt.objects.filter(quiz=quiz, end_time__isnull=False).order_by('-start_time'))
     
     # Calcul des statistiques
     total_attempts = attempts.count()
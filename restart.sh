@@ -1,22 +1,27 @@
 #!/bin/bash
-# Script pour redémarrer l'application e-learning
+# Script pour redéployer l'application e-learning sans coupure
 # Usage: ./restart.sh
+#
+# Le serveur (python manage.py serve) est rechargé par SIGHUP : il vérifie le
+# nouveau code, le charge puis remplace ses workers un par un. Les fichiers
+# __pycache__ sont conservés : seuls les modules modifiés sont recompilés.
 
-echo "Arrêt du serveur en cours..."
-pkill -f "python manage.py runserver"
+PIDFILE=${PIDFILE:-.serve.pid}
+BIND=${BIND:-127.0.0.1:8000}
 
-echo "Nettoyage des fichiers __pycache__..."
-find . -type d -name "__pycache__" -exec rm -rf {} +
-find . -name "*.pyc" -delete
-
-echo "Collecte des fichiers statiques..."
+echo "Collecte des fichiers statiques (seuls les fichiers modifiés sont retraités)..."
 python manage.py collectstatic --noinput
 
 echo "Application des migrations..."
 python manage.py migrate
 
-echo "Redémarrage du serveur..."
-python manage.py runserver &
-
-echo "L'application e-learning a été redémarrée avec succès!"
-echo "Accédez à http://127.0.0.1:8000 pour y accéder."
+if [ -f "$PIDFILE" ] && kill -0 "$(cat "$PIDFILE")" 2>/dev/null; then
+    echo "Rechargement du serveur..."
+    kill -HUP "$(cat "$PIDFILE")"
+    echo "L'application e-learning est en cours de rechargement, sans interruption du service."
+else
+    echo "Démarrage du serveur..."
+    nohup python manage.py serve --bind "$BIND" --pidfile "$PIDFILE" >> serve.log 2>&1 &
+    echo "L'application e-learning a été démarrée."
+    echo "Accédez à http://$BIND pour y accéder."
+fi